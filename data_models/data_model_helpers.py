@@ -109,11 +109,124 @@ def convert_configuration_from_hdf(f):
                          diameter=diameter, names=names, mount=mount)
 
 
-def convert_visibility_to_hdf(vis, f):
+def convert_visibility_data_to_hdf(data, time, f, chunk_timeslices=None, compression=None):
+    """ Write the data array of a Visibility or BlockVisibility to HDF
+
+    By default the data are written contiguously. If chunk_timeslices or compression is given, the data are
+    written in chunks holding chunk_timeslices (default 1) time slices each, optionally compressed.
+
+    :param data: Structured array
+    :param time: Time of each row
+    :param f: HDF root
+    :param chunk_timeslices: Number of time slices per chunk
+    :param compression: HDF5 compression filter e.g. 'gzip', 'lzf'
+    :return:
+    """
+    if chunk_timeslices is None and compression is None:
+        f['data'] = data
+        return f
+    
+    if chunk_timeslices is None:
+        chunk_timeslices = 1
+    _, rows_per_timeslice = numpy.unique(time, return_counts=True)
+    chunk_rows = min(len(data), chunk_timeslices * int(numpy.max(rows_per_timeslice)))
+    f.create_dataset('data', data=data, chunks=(chunk_rows,), compression=compression)
+    return f
+
+
+class HDF5VisibilityData:
+    """ Read-only data of a Visibility or BlockVisibility left in an HDF5 file
+
+    Selecting rows, e.g. data[rows], reads them into a new numpy array. Selecting a column, e.g. data['vis'],
+    reads it into a read-only numpy array, so that writes to it, which would otherwise be silently lost, raise
+    ValueError. Writing to the data directly also raises ValueError. A deep copy reads all the data into memory.
+
+    The file stays open until close() is called, or until the end of a with block::
+
+        with vis.data:
+            for rows in vis_timeslice_iter(vis):
+                visslice = create_visibility_from_rows(vis, rows)
+    """
+
+    def __init__(self, dataset):
+        """ Wrap an h5py dataset
+
+        :param dataset: h5py dataset
+        """
+        self.dataset = dataset
+
+    @property
+    def dtype(self):
+        return self.dataset.dtype
+
+    @property
+    def shape(self):
+        return self.dataset.shape
+
+    @property
+    def size(self):
+        return self.dataset.size
+
+    @property
+    def nbytes(self):
+        return self.dataset.size * self.dataset.dtype.itemsize
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __getitem__(self, key):
+        value = self.dataset[key]
+        if isinstance(key, str) and isinstance(value, numpy.ndarray):
+            value.setflags(write=False)
+        return value
+
+    def __setitem__(self, key, value):
+        raise ValueError("Visibility data imported lazily from HDF5 are read only: copy the visibility to modify it")
+
+    def __deepcopy__(self, memo):
+        return numpy.array(self.dataset)
+
+    def close(self):
+        """ Close the HDF5 file (shared by all visibilities imported from it)
+        """
+        self.dataset.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def convert_hdf_to_visibility_data(dataset, lazy=False, mmap=False):
+    """ Read the data array of a Visibility or BlockVisibility from HDF
+
+    If lazy is True, an HDF5VisibilityData is returned so that rows are only read when selected. If mmap is True
+    and the dataset is contiguous and uncompressed, a read-only numpy memmap of the file is returned (otherwise
+    mmap falls back to lazy).
+
+    :param dataset: h5py dataset
+    :param lazy: Return an HDF5VisibilityData
+    :param mmap: Return a memmap if possible
+    :return: numpy array, numpy memmap or HDF5VisibilityData
+    """
+    if mmap and dataset.chunks is None and dataset.compression is None:
+        offset = dataset.id.get_offset()
+        if offset is not None:
+            return numpy.memmap(dataset.file.filename, dtype=dataset.dtype, mode='r', offset=offset,
+                                shape=dataset.shape)
+    if lazy or mmap:
+        return HDF5VisibilityData(dataset)
+    return numpy.array(dataset)
+
+
+def convert_visibility_to_hdf(vis, f, chunk_timeslices=None, compression=None):
     """ Convert visibility to HDF
 
     :param vis:
     :param f: HDF root
+    :param chunk_timeslices: Number of time slices per chunk (default contiguous)
+    :param compression: HDF5 compression filter e.g. 'gzip', 'lzf'
     :return:
     """
     assert isinstance(vis, Visibility)
@@ -126,15 +239,18 @@ def convert_visibility_to_hdf(vis, f):
     f.attrs['polarisation_frame'] = vis.polarisation_frame.type
     f.attrs['source'] = vis.source
     f.attrs['meta'] = str(vis.meta)
-    f['data'] = vis.data
+    f = convert_visibility_data_to_hdf(vis.data, vis.time, f, chunk_timeslices=chunk_timeslices,
+                                       compression=compression)
     f = convert_configuration_to_hdf(vis.configuration, f)
     return f
 
 
-def convert_hdf_to_visibility(f):
+def convert_hdf_to_visibility(f, lazy=False, mmap=False):
     """ Convert HDF root to visibility
 
     :param f:
+    :param lazy: Leave the data in the file, reading rows on demand
+    :param mmap: Memory map the data if contiguous and uncompressed
     :return:
     """
     assert f.attrs['ARL_data_model'] == "Visibility", "Not a Visibility"
@@ -142,7 +258,7 @@ def convert_hdf_to_visibility(f):
     ss = [float(s[0]), float(s[1])] * u.deg
     phasecentre = SkyCoord(ra=ss[0], dec=ss[1], frame=f.attrs['phasecentre_frame'])
     polarisation_frame = PolarisationFrame(f.attrs['polarisation_frame'])
-    data = numpy.array(f['data'])
+    data = convert_hdf_to_visibility_data(f['data'], lazy=lazy, mmap=mmap)
     source = str(f.attrs['source'])
     meta = ast.literal_eval(f.attrs['meta'])
     vis = Visibility(data=data, polarisation_frame=polarisation_frame,
@@ -151,11 +267,13 @@ def convert_hdf_to_visibility(f):
     return vis
 
 
-def convert_blockvisibility_to_hdf(vis: BlockVisibility, f):
+def convert_blockvisibility_to_hdf(vis: BlockVisibility, f, chunk_timeslices=None, compression=None):
     """ Convert blockvisibility to HDF
 
     :param vis:
     :param f: HDF root
+    :param chunk_timeslices: Number of time slices per chunk (default contiguous)
+    :param compression: HDF5 compression filter e.g. 'gzip', 'lzf'
     :return:
     """
     assert isinstance(vis, BlockVisibility)
@@ -170,15 +288,21 @@ def convert_blockvisibility_to_hdf(vis: BlockVisibility, f):
     f.attrs['source'] = vis.source
     f.attrs['meta'] = str(vis.meta)
     f.attrs['channel_bandwidth'] = vis.channel_bandwidth
-    f['data'] = vis.data
+    f = convert_visibility_data_to_hdf(vis.data, vis.time, f, chunk_timeslices=chunk_timeslices,
+                                       compression=compression)
+    if vis.compact:
+        f['antenna1'] = vis.antenna1
+        f['antenna2'] = vis.antenna2
     f = convert_configuration_to_hdf(vis.configuration, f)
     return f
 
 
-def convert_hdf_to_blockvisibility(f):
+def convert_hdf_to_blockvisibility(f, lazy=False, mmap=False):
     """ Convert HDF root to blockvisibility
 
     :param f:
+    :param lazy: Leave the data in the file, reading rows on demand
+    :param mmap: Memory map the data if contiguous and uncompressed
     :return:
     """
     assert f.attrs['ARL_data_model'] == "BlockVisibility", "Not a BlockVisibility"
@@ -188,22 +312,29 @@ def convert_hdf_to_blockvisibility(f):
     polarisation_frame = PolarisationFrame(f.attrs['polarisation_frame'])
     frequency = f.attrs['frequency']
     channel_bandwidth = f.attrs['channel_bandwidth']
-    data = numpy.array(f['data'])
+    data = convert_hdf_to_visibility_data(f['data'], lazy=lazy, mmap=mmap)
     source = f.attrs['source']
     meta = ast.literal_eval(f.attrs['meta'])
+    if 'antenna1' in f:
+        antenna1 = numpy.array(f['antenna1'])
+        antenna2 = numpy.array(f['antenna2'])
+    else:
+        antenna1, antenna2 = None, None
     vis = BlockVisibility(data=data, polarisation_frame=polarisation_frame,
                           phasecentre=phasecentre, frequency=frequency,
                           channel_bandwidth=channel_bandwidth, source=source,
-                          meta=meta)
+                          meta=meta, antenna1=antenna1, antenna2=antenna2)
     vis.configuration = convert_configuration_from_hdf(f)
     return vis
 
 
-def export_visibility_to_hdf5(vis, filename):
+def export_visibility_to_hdf5(vis, filename, chunk_timeslices=None, compression=None):
     """ Export a Visibility to HDF5 format
 
     :param vis:
     :param filename:
+    :param chunk_timeslices: Number of time slices per chunk (default contiguous)
+    :param compression: HDF5 compression filter e.g. 'gzip', 'lzf'
     :return:
     """
     
@@ -213,31 +344,52 @@ def export_visibility_to_hdf5(vis, filename):
         f.attrs['number_data_models'] = len(vis)
         for i, v in enumerate(vis):
             vf = f.create_group('Visibility%d' % i)
-            convert_visibility_to_hdf(v, vf)
+            convert_visibility_to_hdf(v, vf, chunk_timeslices=chunk_timeslices, compression=compression)
         f.flush()
 
 
-def import_visibility_from_hdf5(filename):
+def import_visibility_from_hdf5(filename, lazy=False, mmap=False):
     """Import a Visibility from HDF5 format
 
+    If lazy is True the file is left open and the data of each Visibility is an HDF5VisibilityData, so that
+    rows are read only when selected e.g. by create_visibility_from_rows. The file is closed by closing the
+    data. If mmap is True, contiguous uncompressed data are memory mapped instead, and the file is closed unless
+    some data could not be mapped (these are then read lazily). Either way the imported data are read only, and
+    writes raise ValueError: use copy_visibility or create_visibility_from_rows to get data that can be changed::
+
+        vis = import_visibility_from_hdf5(filename, lazy=True)
+        with vis.data:
+            for rows in vis_timeslice_iter(vis):
+                visslice = create_visibility_from_rows(vis, rows)
+
     :param filename:
+    :param lazy: Leave the data in the file, reading rows on demand
+    :param mmap: Memory map the data if contiguous and uncompressed
     :return: If only one then a Visibility, otherwise a list of Visibilitys
     """
     
-    with h5py.File(filename, 'r') as f:
+    f = h5py.File(filename, 'r')
+    try:
         nvislist = f.attrs['number_data_models']
-        vislist = [convert_hdf_to_visibility(f['Visibility%d' % i]) for i in range(nvislist)]
-        if nvislist == 1:
-            return vislist[0]
-        else:
-            return vislist
+        vislist = [convert_hdf_to_visibility(f['Visibility%d' % i], lazy=lazy, mmap=mmap) for i in range(nvislist)]
+    except BaseException:
+        f.close()
+        raise
+    if not any(isinstance(vis.data, HDF5VisibilityData) for vis in vislist):
+        f.close()
+    if nvislist == 1:
+        return vislist[0]
+    else:
+        return vislist
 
 
-def export_blockvisibility_to_hdf5(vis, filename):
+def export_blockvisibility_to_hdf5(vis, filename, chunk_timeslices=None, compression=None):
     """ Export a BlockVisibility to HDF5 format
 
     :param vis:
     :param filename:
+    :param chunk_timeslices: Number of time slices per chunk (default contiguous)
+    :param compression: HDF5 compression filter e.g. 'gzip', 'lzf'
     :return:
     """
     
@@ -248,24 +400,35 @@ def export_blockvisibility_to_hdf5(vis, filename):
         for i, v in enumerate(vis):
             assert isinstance(v, BlockVisibility)
             vf = f.create_group('BlockVisibility%d' % i)
-            convert_blockvisibility_to_hdf(v, vf)
+            convert_blockvisibility_to_hdf(v, vf, chunk_timeslices=chunk_timeslices, compression=compression)
         f.flush()
 
 
-def import_blockvisibility_from_hdf5(filename):
+def import_blockvisibility_from_hdf5(filename, lazy=False, mmap=False):
     """Import a Visibility from HDF5 format
 
+    See import_visibility_from_hdf5 for the lazy and mmap options.
+
     :param filename:
+    :param lazy: Leave the data in the file, reading rows on demand
+    :param mmap: Memory map the data if contiguous and uncompressed
     :return: If only one then a BlockVisibility, otherwise a list of BlockVisibility's
     """
     
-    with h5py.File(filename, 'r') as f:
+    f = h5py.File(filename, 'r')
+    try:
         nvislist = f.attrs['number_data_models']
-        vislist = [convert_hdf_to_blockvisibility(f['BlockVisibility%d' % i]) for i in range(nvislist)]
-        if nvislist == 1:
-            return vislist[0]
-        else:
-            return vislist
+        vislist = [convert_hdf_to_blockvisibility(f['BlockVisibility%d' % i], lazy=lazy, mmap=mmap)
+                   for i in range(nvislist)]
+    except BaseException:
+        f.close()
+        raise
+    if not any(isinstance(vis.data, HDF5VisibilityData) for vis in vislist):
+        f.close()
+    if nvislist == 1:
+        return vislist[0]
+    else:
+        return vislist
 
 
 def convert_gaintable_to_hdf(gt: GainTable, f):
@@ -861,7 +861,7 @@ class Visibility:
         """
         size = 0
         for col in self.data.dtype.fields.keys():
-            size += self.data[col].nbytes
+            size += self.data.dtype[col].itemsize * self.data.shape[0]
         return size / 1024.0 / 1024.0 / 1024.0
 
     @property
@@ -874,7 +874,7 @@ class Visibility:
 
     @property
     def nvis(self):
-        return self.data['vis'].shape[0]
+        return self.data.shape[0]
 
     @property
     def uvw(self):  # In wavelengths in Visibility
@@ -952,6 +952,11 @@ class BlockVisibility:
     Polarisation frame is the same for the entire data set and can be stokesI, circular, linear
 
     The configuration is also an attribute
+
+    The columns are normally held in the square layout [ntimes, nants, nants, ...], with each baseline
+    at [antenna2, antenna1]. If the antenna1 and antenna2 lookup tables are given, the columns are instead
+    held in the compact layout [ntimes, nbaselines, ...], where baseline b corresponds to
+    [antenna2[b], antenna1[b]] in the square layout. The square method presents either layout as square.
     """
 
     def __init__(self,
@@ -959,7 +964,8 @@ class BlockVisibility:
                  phasecentre=None, configuration=None, uvw=None,
                  time=None, vis=None, weight=None, integration_time=None,
                  polarisation_frame=PolarisationFrame('stokesI'),
-                 imaging_weight=None, source='anonymous', meta=dict()):
+                 imaging_weight=None, source='anonymous', meta=dict(),
+                 antenna1=None, antenna2=None):
         """BlockVisibility
 
         :param data:
@@ -974,19 +980,29 @@ class BlockVisibility:
         :param integration_time:
         :param polarisation_frame:
         :param source:
+        :param antenna1: First antenna of each baseline, for the compact layout [nbaselines]
+        :param antenna2: Second antenna of each baseline, for the compact layout [nbaselines]
         """
+        assert (antenna1 is None) == (antenna2 is None), "Must specify both antenna1 and antenna2"
         if data is None and vis is not None:
-            ntimes, nants, _, nchan, npol = vis.shape
+            if antenna1 is not None:
+                ntimes, nbaselines, nchan, npol = vis.shape
+                assert len(antenna1) == nbaselines
+                assert len(antenna2) == nbaselines
+                blshape = (nbaselines,)
+            else:
+                ntimes, nants, _, nchan, npol = vis.shape
+                blshape = (nants, nants)
             assert vis.shape == weight.shape
             assert len(frequency) == nchan
             assert len(channel_bandwidth) == nchan
             desc = [('index', 'i8'),
-                    ('uvw', 'f8', (nants, nants, 3)),
+                    ('uvw', 'f8', blshape + (3,)),
                     ('time', 'f8'),
                     ('integration_time', 'f8'),
-                    ('vis', 'c16', (nants, nants, nchan, npol)),
-                    ('weight', 'f8', (nants, nants, nchan, npol)),
-                    ('imaging_weight', 'f8', (nants, nants, nchan, npol))]
+                    ('vis', 'c16', blshape + (nchan, npol)),
+                    ('weight', 'f8', blshape + (nchan, npol)),
+                    ('imaging_weight', 'f8', blshape + (nchan, npol))]
             data = numpy.zeros(shape=[ntimes], dtype=desc)
             data['index'] = list(range(ntimes))
             data['uvw'] = uvw
@@ -1004,6 +1020,8 @@ class BlockVisibility:
         self.polarisation_frame = polarisation_frame
         self.source = source
         self.meta = meta
+        self.antenna1 = antenna1
+        self.antenna2 = antenna2
 
     def __str__(self):
         """Default printer for BlockVisibility
@@ -1015,6 +1033,7 @@ class BlockVisibility:
         s += "\tNumber of visibilities: %s\n" % self.nvis
         s += "\tNumber of integrations: %s\n" % len(self.time)
         s += "\tVisibility shape: %s\n" % str(self.vis.shape)
+        s += "\tCompact layout: %s\n" % self.compact
         s += "\tNumber of channels: %d\n" % len(self.frequency)
         s += "\tFrequency: %s\n" % self.frequency
         s += "\tChannel bandwidth: %s\n" % self.channel_bandwidth
@@ -1030,20 +1049,58 @@ class BlockVisibility:
         """
         size = 0
         for col in self.data.dtype.fields.keys():
-            size += self.data[col].nbytes
+            size += self.data.dtype[col].itemsize * self.data.shape[0]
         return size / 1024.0 / 1024.0 / 1024.0
 
     @property
     def nchan(self):
-        return self.data['vis'].shape[3]
+        return self.data.dtype['vis'].shape[-2]
 
     @property
     def npol(self):
-        return self.data['vis'].shape[4]
+        return self.data.dtype['vis'].shape[-1]
+
+    @property
+    def compact(self):
+        return self.antenna1 is not None
 
     @property
     def nants(self):
-        return self.data['vis'].shape[1]
+        if self.compact:
+            if self.configuration is not None:
+                return len(self.configuration.names)
+            return int(max(numpy.max(self.antenna1), numpy.max(self.antenna2))) + 1
+        return self.data.dtype['vis'].shape[0]
+
+    @property
+    def nbaselines(self):
+        if self.compact:
+            return self.data.dtype['vis'].shape[0]
+        return self.nants * self.nants
+
+    def square(self, column):
+        """ Return a column in the square layout [ntimes, nants, nants, ...]
+
+        The square layout is returned unchanged. For the compact layout a new array is filled: each
+        baseline goes to [antenna2, antenna1] and its transpose [antenna1, antenna2] holds the
+        conjugate for vis, the negation for uvw, and the same value for the weights.
+
+        :param column: Name of column e.g. 'vis', 'uvw', 'weight', 'imaging_weight'
+        :return: numpy array
+        """
+        values = self.data[column]
+        if not self.compact:
+            return values
+        nants = self.nants
+        square = numpy.zeros([values.shape[0], nants, nants] + list(values.shape[2:]), dtype=values.dtype)
+        if column == 'vis':
+            square[:, self.antenna1, self.antenna2, ...] = numpy.conjugate(values)
+        elif column == 'uvw':
+            square[:, self.antenna1, self.antenna2, ...] = -values
+        else:
+            square[:, self.antenna1, self.antenna2, ...] = values
+        square[:, self.antenna2, self.antenna1, ...] = values
+        return square
 
     @property
     def uvw(self):  # In meters
@@ -59,30 +59,47 @@ def solve_gaintable(vis: BlockVisibility, modelvis: BlockVisibility = None, gt=N
     else:
         log.debug("solve_gaintable: starting from existing gaintable")
 
+    # Assign each visibility time to a solution interval
+    vis_time = vis.time
+    sol_of_row = -numpy.ones(len(vis_time), dtype='int')
     for row in range(gt.ntimes):
-        vis_rows = numpy.abs(vis.time - gt.time[row]) < gt.interval[row] / 2.0
-        if numpy.sum(vis_rows) > 0:
-            subvis = create_visibility_from_rows(vis, vis_rows)
-            if modelvis is not None:
-                model_subvis = create_visibility_from_rows(modelvis, vis_rows)
-                pointvis = divide_visibility(subvis, model_subvis)
-                x = numpy.sum(pointvis.vis * pointvis.weight, axis=0)
-                xwt = numpy.sum(pointvis.weight, axis=0)
-            else:
-                x = numpy.sum(subvis.vis * subvis.weight, axis=0)
-                xwt = numpy.sum(subvis.weight, axis=0)
-            
-            mask = numpy.abs(xwt) > 0.0
-            x_shape = x.shape
-            x[mask] = x[mask] / xwt[mask]
-            x[~mask] = 0.0
-            x = x.reshape(x_shape)
-            
-            gt = solve_from_X(gt, x, xwt, row, crosspol, niter, phase_only,
-                              tol, npol=vis.polarisation_frame.npol)
-            if normalise_gains and not phase_only:
-                gabs = numpy.average(numpy.abs(gt.data['gain'][row]))
-                gt.data['gain'][row] /= gabs
+        sol_of_row[numpy.abs(vis_time - gt.time[row]) < gt.interval[row] / 2.0] = row
+    
+    selected = numpy.where(sol_of_row >= 0)[0]
+    if len(selected) > 0:
+        if len(selected) < len(vis_time):
+            subvis = create_visibility_from_rows(vis, sol_of_row >= 0)
+            model_subvis = None if modelvis is None else create_visibility_from_rows(modelvis, sol_of_row >= 0)
+        else:
+            subvis, model_subvis = vis, modelvis
+        pointvis = subvis if model_subvis is None else divide_visibility(subvis, model_subvis)
+        
+        # Sum the point source equivalents over each solution interval in one pass
+        order = numpy.argsort(sol_of_row[selected], kind='stable')
+        sols, starts = numpy.unique(sol_of_row[selected][order], return_index=True)
+        weight = pointvis.weight[order]
+        x = numpy.add.reduceat(pointvis.vis[order] * weight, starts, axis=0)
+        xwt = numpy.add.reduceat(weight, starts, axis=0)
+        
+        mask = numpy.abs(xwt) > 0.0
+        x[mask] = x[mask] / xwt[mask]
+        x[~mask] = 0.0
+        
+        if vis.compact:
+            # The solvers work on [antenna2, antenna1] and fill the other triangle themselves
+            square_shape = [len(sols), vis.nants, vis.nants] + list(x.shape[2:])
+            x_square = numpy.zeros(square_shape, dtype=x.dtype)
+            xwt_square = numpy.zeros(square_shape, dtype=xwt.dtype)
+            x_square[:, vis.antenna2, vis.antenna1, ...] = x
+            xwt_square[:, vis.antenna2, vis.antenna1, ...] = xwt
+            x, xwt = x_square, xwt_square
+        
+        # All the solution intervals are solved together
+        gt = solve_from_X(gt, x, xwt, sols, crosspol, niter, phase_only,
+                          tol, npol=vis.polarisation_frame.npol)
+        if normalise_gains and not phase_only:
+            gabs = numpy.average(numpy.abs(gt.data['gain'][sols]), axis=(1, 2, 3, 4))
+            gt.data['gain'][sols] /= gabs[:, numpy.newaxis, numpy.newaxis, numpy.newaxis, numpy.newaxis]
     
     assert isinstance(gt, GainTable), "gt is not a GainTable: %r" % gt
     
@@ -76,6 +76,24 @@ def create_gaintable_from_blockvisibility(vis: BlockVisibility, timeslice=None,
     return gt
 
 
+def _invert_jones(jones: numpy.ndarray):
+    """ Invert an array of 2x2 Jones matrices analytically
+
+    :param jones: Jones matrices [..., 2, 2]
+    :return: Inverse Jones matrices [..., 2, 2], boolean array [...] that is True where the matrix is invertible
+    """
+    det = jones[..., 0, 0] * jones[..., 1, 1] - jones[..., 0, 1] * jones[..., 1, 0]
+    invertible = det != 0.0
+    rdet = numpy.zeros_like(det)
+    rdet[invertible] = 1.0 / det[invertible]
+    inverse = numpy.empty_like(jones)
+    inverse[..., 0, 0] = jones[..., 1, 1] * rdet
+    inverse[..., 0, 1] = - jones[..., 0, 1] * rdet
+    inverse[..., 1, 0] = - jones[..., 1, 0] * rdet
+    inverse[..., 1, 1] = jones[..., 0, 0] * rdet
+    return inverse, invertible
+
+
 def apply_gaintable(vis: BlockVisibility, gt: GainTable, inverse=False, vis_slices=None, **kwargs) -> BlockVisibility:
     """Apply a gain table to a block visibility
     
@@ -122,43 +140,59 @@ def apply_gaintable(vis: BlockVisibility, gt: GainTable, inverse=False, vis_slic
             originalwt = vis.weight[rows]
             applied = copy.deepcopy(original)
             appliedwt = copy.deepcopy(originalwt)
-            for time in range(ntimes):
-                antantwt = numpy.outer(gainwt, gainwt)
-                if is_scalar:
-                    if inverse:
-                        lgain = numpy.ones_like(gain)
-                        lgain[numpy.abs(gain) > 0.0] = 1.0 / gain[numpy.abs(gain) > 0.0]
-                    else:
-                        lgain = gain
-                    clgain = numpy.conjugate(lgain)
-                    for chan in range(nchan):
-                        smueller = numpy.ma.outer(lgain[time, :, chan, 0],
-                                                  clgain[time, :, chan, 0]).reshape([nant, nant])
-                        applied[time, :, :, chan, 0] = original[time, :, :, chan, 0] * smueller
-                        antantwt = numpy.outer(gainwt[time, :, chan, 0, 0], gainwt[time, :, chan, 0, 0])
-                        applied[time, :, :, chan, 0][antantwt == 0.0] = 0.0
-                        appliedwt[time, :, :, chan, 0][antantwt == 0.0] = 0.0
+            if is_scalar:
+                if inverse:
+                    lgain = numpy.ones_like(gain)
+                    lgain[numpy.abs(gain) > 0.0] = 1.0 / gain[numpy.abs(gain) > 0.0]
+                else:
+                    lgain = gain
+                lgain = lgain[..., 0, 0]
+                lgainwt = gainwt[..., 0, 0]
+                if vis.compact:
+                    # Baseline b is [antenna2[b], antenna1[b]] in the square layout
+                    a1, a2 = vis.antenna1, vis.antenna2
+                    smueller = lgain[:, a2, :] * numpy.conjugate(lgain[:, a1, :])
+                    antantwt = lgainwt[:, a2, :] * lgainwt[:, a1, :]
                 else:
-                    for a1 in range(vis.nants - 1):
-                        for a2 in range(a1 + 1, vis.nants):
-                            for chan in range(nchan):
-                                mueller = numpy.kron(gain[time, a1, chan, :, :],
-                                                     numpy.conjugate(gain[time, a2, chan, :, :]))
-                                if inverse:
-                                    # If the Mueller is singular, ignore it
-                                    try:
-                                        mueller = numpy.linalg.inv(mueller)
-                                        applied[time, a2, a1, chan, :] = \
-                                            numpy.matmul(mueller, original[time, a2, a1, chan, :])
-                                    except numpy.linalg.linalg.LinAlgError:
-                                        applied[time, a2, a1, chan, :] = \
-                                            original[time, a2, a1, chan, :]
-                                else:
-                                    applied[time, a2, a1, chan, :] = \
-                                        numpy.matmul(mueller, original[time, a2, a1, chan, :])
-                                if (gainwt[time, a1, chan, 0, 0] <= 0.0) or (gainwt[time, a1, chan, 0, 0] <= 0.0):
-                                    applied[time, a2, a1, chan, 0] = 0.0
-                                    appliedwt[time, a2, a1, chan, 0] = 0.0
+                    smueller = lgain[:, :, numpy.newaxis, :] * numpy.conjugate(lgain[:, numpy.newaxis, :, :])
+                    antantwt = lgainwt[:, :, numpy.newaxis, :] * lgainwt[:, numpy.newaxis, :, :]
+                applied[:ntimes, ..., 0] = original[:ntimes, ..., 0] * smueller
+                applied[:ntimes, ..., 0][antantwt == 0.0] = 0.0
+                appliedwt[:ntimes, ..., 0][antantwt == 0.0] = 0.0
+            else:
+                # Only the baselines with antenna2 > antenna1 are corrected
+                if vis.compact:
+                    bls = numpy.where(vis.antenna2 > vis.antenna1)[0]
+                    a1, a2 = vis.antenna1[bls], vis.antenna2[bls]
+                    blindex = (slice(None), bls)
+                else:
+                    a2, a1 = numpy.tril_indices(vis.nants, -1)
+                    blindex = (slice(None), a2, a1)
+                
+                if inverse:
+                    jones, invertible = _invert_jones(gain)
+                else:
+                    jones = gain
+                
+                # The visibility [..., npol] is the row-major flattening of the 2x2 coherency
+                # matrix so the Mueller matrix kron(J1, conj(J2)) acts as J1 V J2^H
+                blvis = original[:ntimes][blindex]
+                coherency = blvis.reshape(blvis.shape[:-1] + (nrec, nrec))
+                corrected = numpy.einsum('...ij,...jk,...lk->...il', jones[:, a1], coherency,
+                                         numpy.conjugate(jones[:, a2]))
+                corrected = corrected.reshape(blvis.shape)
+                if inverse:
+                    # If either Jones matrix is singular, ignore it
+                    singular = ~(invertible[:, a1] & invertible[:, a2])
+                    corrected[singular] = blvis[singular]
+                
+                lgainwt = gainwt[..., 0, 0]
+                flagged = (lgainwt[:, a1] <= 0.0) | (lgainwt[:, a2] <= 0.0)
+                corrected[..., 0][flagged] = 0.0
+                applied[:ntimes][blindex] = corrected
+                blwt = appliedwt[:ntimes][blindex]
+                blwt[..., 0][flagged] = 0.0
+                appliedwt[:ntimes][blindex] = blwt
             
             vis.data['vis'][rows] = applied
     return vis
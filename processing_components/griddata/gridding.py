@@ -8,14 +8,17 @@ This module contains functions for performing the griddata process and the inver
 The GridData data model is used to hold the specification of the desired result.
 """
 
+import hashlib
 import logging
 
 import numpy
 import numpy.testing
 
 from data_models.memory_data_models import Visibility
+from data_models.parameters import get_parameter
 from processing_components.griddata.operations import copy_griddata
 from processing_components.visibility.operations import copy_visibility
+from processing_library.fourier_transforms.fft_support import fft_real, ifft_real
 from processing_library.image.operations import ifft, fft, create_image_from_array
 
 log = logging.getLogger(__name__)
@@ -96,12 +99,112 @@ def convolution_mapping(vis, griddata, cf, channel_tolerance=1e-8):
     return pu_grid, pu_offset, pv_grid, pv_offset, pwg_grid, pwg_fraction, pwc_grid, pwc_fraction, pfreq_grid
 
 
-def grid_visibility_to_griddata(vis, griddata, cf):
+class GriddingPlan:
+    """ Precomputed mapping between a Visibility, a GridData, and a ConvolutionFunction
+
+    The mapping found by convolution_mapping (pixel, oversampling offset, w plane, and channel indices)
+    is held together with a description of the geometry: a digest of the uvw and frequency of the Visibility,
+    and the shapes and grid_wcs of the GridData and ConvolutionFunction. The mapping is only recalculated when
+    the geometry changes, so the same plan can be passed to gridding, weighting, reweighting and degridding of
+    the same Visibility in every major cycle.
+    """
+    
+    def __init__(self):
+        """ Empty plan
+        """
+        self.vis_digest = None
+        self.griddata_shape = None
+        self.griddata_wcs = None
+        self.cf_shape = None
+        self.cf_wcs = None
+        self.mapping = None
+    
+    def is_valid(self, vis, griddata, cf):
+        """ Is the mapping valid for this geometry?
+        
+        :param vis: Visibility
+        :param griddata: GridData
+        :param cf: Convolution function
+        :return: True or False
+        """
+        return self.mapping is not None and \
+               self.griddata_shape == griddata.shape and self.cf_shape == cf.shape and \
+               self.griddata_wcs.wcs.compare(griddata.grid_wcs.wcs) and \
+               self.cf_wcs.wcs.compare(cf.grid_wcs.wcs) and \
+               self.vis_digest == visibility_geometry_digest(vis)
+    
+    def get_mapping(self, vis, griddata, cf):
+        """ Return the mapping, recalculating if the geometry has changed
+
+        :param vis: Visibility
+        :param griddata: GridData
+        :param cf: Convolution function
+        :return: tuple as returned by convolution_mapping
+        """
+        if not self.is_valid(vis, griddata, cf):
+            log.debug("GriddingPlan: calculating convolution mapping")
+            self.mapping = convolution_mapping(vis, griddata, cf)
+            self.vis_digest = visibility_geometry_digest(vis)
+            self.griddata_shape = griddata.shape
+            self.griddata_wcs = griddata.grid_wcs.deepcopy()
+            self.cf_shape = cf.shape
+            self.cf_wcs = cf.grid_wcs.deepcopy()
+        return self.mapping
+
+
+def visibility_geometry_digest(vis):
+    """ Digest of the uvw and frequency of a Visibility
+
+    :param vis: Visibility
+    :return: hex digest (str)
+    """
+    digest = hashlib.sha1()
+    digest.update(numpy.ascontiguousarray(vis.uvw))
+    digest.update(numpy.ascontiguousarray(vis.frequency))
+    return digest.hexdigest()
+
+
+def create_gridding_plan(vis, griddata, cf):
+    """ Create a GriddingPlan for the geometry of vis, griddata, and cf
+
+    For example::
+
+        plan = create_gridding_plan(vis, griddata, cf)
+        griddata, sumwt = grid_visibility_to_griddata(vis, griddata, cf, plan=plan)
+        newvis = degrid_visibility_from_griddata(vis, griddata, cf, plan=plan)
+
+    :param vis: Visibility
+    :param griddata: GridData
+    :param cf: Convolution function
+    :return: GriddingPlan
+    """
+    assert isinstance(vis, Visibility), vis
+    plan = GriddingPlan()
+    plan.get_mapping(vis, griddata, cf)
+    return plan
+
+
+def plan_convolution_mapping(vis, griddata, cf, plan=None):
+    """ Find the mappings between visibility, griddata, and convolution function, using a plan if given
+
+    :param vis: Visibility
+    :param griddata: GridData
+    :param cf: Convolution function
+    :param plan: GriddingPlan (optional)
+    :return: tuple as returned by convolution_mapping
+    """
+    if plan is None:
+        return convolution_mapping(vis, griddata, cf)
+    return plan.get_mapping(vis, griddata, cf)
+
+
+def grid_visibility_to_griddata(vis, griddata, cf, plan=None):
     """Grid Visibility onto a GridData
 
     :param vis: Visibility to be gridded
     :param griddata: GridData
     :param cf: Convolution function
+    :param plan: GriddingPlan holding a precomputed convolution mapping (optional)
     :param kwargs:
     :return: GridData
     """
@@ -111,7 +214,7 @@ def grid_visibility_to_griddata(vis, griddata, cf):
     nchan, npol, nz, oversampling, _, support, _ = cf.shape
     sumwt = numpy.zeros([nchan, npol])
     pu_grid, pu_offset, pv_grid, pv_offset, pwg_grid, pwg_fraction, pwc_grid, pwc_fraction, pfreq_grid = \
-        convolution_mapping(vis, griddata, cf)
+        plan_convolution_mapping(vis, griddata, cf, plan)
     _, _, _, _, _, gv, gu = cf.shape
     coords = zip(vis.vis * vis.imaging_weight, vis.imaging_weight, pfreq_grid, pu_grid, pu_offset, pv_grid, pv_offset,
                  pwg_grid,
@@ -133,11 +236,81 @@ def grid_visibility_to_griddata(vis, griddata, cf):
     return griddata, sumwt
 
 
-def grid_visibility_to_griddata_fast(vis, griddata, cf, gcf):
+def grid_visibility_to_griddata_batch(vis, griddata, cf, max_elements=2 ** 22, plan=None):
+    """Grid Visibility onto a GridData, processing rows in batches
+
+    This gives the same result as grid_visibility_to_griddata but replaces the per-row Python loop by
+    vectorised operations. The rows are processed in chunks; for each chunk the kernel patches for
+    all rows are gathered from cf by (channel, w-plane, oversampling offset) with one fancy-indexing
+    operation, weighted by the visibilities, and then scatter-added onto the grid. The scatter-add
+    compacts the target cell indices of the chunk (numpy.unique) and sums coincident contributions with
+    numpy.bincount, so that the work and memory per chunk are proportional to the chunk and not the grid.
+
+    :param vis: Visibility to be gridded
+    :param griddata: GridData
+    :param cf: Convolution function
+    :param max_elements: Maximum number of grid contributions (rows x pols x support x support) per chunk
+    :param plan: GriddingPlan holding a precomputed convolution mapping (optional)
+    :return: GridData, sumwt
+    """
+
+    assert isinstance(vis, Visibility), vis
+
+    nchan, npol, nz, ny, nx = griddata.shape
+    sumwt = numpy.zeros([nchan, npol])
+    pu_grid, pu_offset, pv_grid, pv_offset, pwg_grid, pwg_fraction, pwc_grid, pwc_fraction, pfreq_grid = \
+        plan_convolution_mapping(vis, griddata, cf, plan)
+    _, _, _, _, _, gv, gu = cf.shape
+    griddata.data[...] = 0.0
+
+    du = gu // 2
+    dv = gv // 2
+    # The kernels must lie inside the grid, otherwise the flat cell indices would wrap into the next row or plane
+    assert numpy.min(pu_grid) >= du and numpy.max(pu_grid) + gu - du <= nx, "Kernel overflows the u axis of the grid"
+    assert numpy.min(pv_grid) >= dv and numpy.max(pv_grid) + gv - dv <= ny, "Kernel overflows the v axis of the grid"
+
+    # Offsets of the kernel pixels in the flattened grid, and of the polarisations
+    kernel_offsets = ((numpy.arange(gv) - dv)[:, numpy.newaxis] * nx +
+                      (numpy.arange(gu) - du)[numpy.newaxis, :])
+    pol_offsets = numpy.arange(npol) * nz * ny * nx
+
+    griddata.data = numpy.ascontiguousarray(griddata.data)
+    gridflat = griddata.data.reshape([-1])
+
+    wvis = vis.vis * vis.imaging_weight
+    nvis = wvis.shape[0]
+    chunk = max(1, max_elements // (npol * gv * gu))
+    for start in range(0, nvis, chunk):
+        rows = slice(start, min(start + chunk, nvis))
+        chan = pfreq_grid[rows]
+
+        # [nrows, npol, gv, gu] kernel patches, weighted by the visibilities
+        values = numpy.conjugate(cf.data[chan, :, pwc_grid[rows], pv_offset[rows], pu_offset[rows]])
+        values *= wvis[rows, :, numpy.newaxis, numpy.newaxis]
+
+        base = ((chan * npol * nz + pwg_grid[rows]) * ny + pv_grid[rows]) * nx + pu_grid[rows]
+        cells = base[:, numpy.newaxis, numpy.newaxis, numpy.newaxis] + \
+                pol_offsets[numpy.newaxis, :, numpy.newaxis, numpy.newaxis] + \
+                kernel_offsets[numpy.newaxis, numpy.newaxis, ...]
+
+        # Scatter-add onto the cells touched by this chunk
+        cells, inverse = numpy.unique(cells.reshape([-1]), return_inverse=True)
+        values = values.reshape([-1])
+        gridflat[cells] += numpy.bincount(inverse, weights=values.real, minlength=len(cells)) + \
+                           1j * numpy.bincount(inverse, weights=values.imag, minlength=len(cells))
+
+    for chan in range(nchan):
+        sumwt[chan, :] += numpy.sum(vis.imaging_weight[pfreq_grid == chan], axis=0)
+
+    return griddata, sumwt
+
+
+def grid_visibility_to_griddata_fast(vis, griddata, cf, gcf, plan=None):
     """Grid Visibility onto a GridData
 
     :param vis: Visibility to be gridded
     :param griddata: GridData
+    :param plan: GriddingPlan holding a precomputed convolution mapping (optional)
     :param kwargs:
     :return: GridData
     """
@@ -146,7 +319,7 @@ def grid_visibility_to_griddata_fast(vis, griddata, cf, gcf):
     nchan, npol, nz, ny, nx = griddata.shape
     sumwt = numpy.zeros([nchan, npol])
     pu_grid, pu_offset, pv_grid, pv_offset, pwg_grid, pwg_fraction, pwc_grid, pwc_fraction, pfreq_grid = \
-        convolution_mapping(vis, griddata, cf)
+        plan_convolution_mapping(vis, griddata, cf, plan)
     _, _, _, _, _, gv, gu = cf.shape
     coords = zip(vis.vis, vis.imaging_weight, pfreq_grid, pu_grid, pv_grid, pwg_grid)
     griddata.data[...] = 0.0
@@ -158,11 +331,14 @@ def grid_visibility_to_griddata_fast(vis, griddata, cf, gcf):
     return griddata, sumwt
 
 
-def grid_weight_to_griddata(vis, griddata, cf):
+def grid_weight_to_griddata(vis, griddata, cf, plan=None):
     """Grid Visibility weight onto a GridData
 
+    The weights are summed into the nearest grid cell of each row with numpy.bincount on the flattened cell index.
+
     :param vis: Visibility to be gridded
     :param griddata: GridData
+    :param plan: GriddingPlan holding a precomputed convolution mapping (optional)
     :param kwargs:
     :return: GridData
     """
@@ -171,14 +347,15 @@ def grid_weight_to_griddata(vis, griddata, cf):
     nchan, npol, nz, ny, nx = griddata.shape
     sumwt = numpy.zeros([nchan, npol])
     pu_grid, pu_offset, pv_grid, pv_offset, pwg_grid, pwg_fraction, pwc_grid, pwc_fraction, pfreq_grid = \
-        convolution_mapping(vis, griddata, cf)
-    _, _, _, _, _, gv, gu = cf.shape
-    coords = zip(vis.imaging_weight, pfreq_grid, pu_grid, pv_grid, pwg_grid)
+        plan_convolution_mapping(vis, griddata, cf, plan)
+    cells = ((pfreq_grid * nz + pwg_grid) * ny + pv_grid) * nx + pu_grid
     griddata.data[...] = 0.0
     
-    for vwt, chan, xx, yy, zzg in coords:
-        griddata.data[chan, :, zzg, yy, xx] += vwt
-        sumwt[chan, :] += vwt
+    for pol in range(npol):
+        vwt = vis.imaging_weight[:, pol]
+        griddata.data[:, pol, ...] = numpy.bincount(cells, weights=vwt,
+                                                    minlength=nchan * nz * ny * nx).reshape([nchan, nz, ny, nx])
+        sumwt[:, pol] = numpy.bincount(pfreq_grid, weights=vwt, minlength=nchan)
     
     return griddata, sumwt
 
@@ -210,59 +387,256 @@ def griddata_merge_weights(gd_list, algorithm='uniform'):
     return (gd, sumwt)
 
 
-def griddata_reweight(vis, griddata, cf):
+def griddata_reweight(vis, griddata, cf, plan=None, weighting='uniform', robustness=0.0):
     """Reweight Grid Visibility weight using the weights in griddata
 
+    For uniform weighting each imaging weight is divided by the summed weight W in its grid cell. For robust
+    (Briggs) weighting it is divided by 1 + f**2 W, where f**2 = (5 * 10**-robustness)**2 / (sum(W**2) / sum(W))
+    for each channel and polarisation of the grid: robustness -2 is close to uniform and 2 close to natural.
+    Rows with a non-positive divisor in any polarisation are not changed.
+
     :param vis: Visibility to be reweighted
     :param griddata: GridData, sumwt
-    :param kwargs:
-    :return: GridData
+    :param plan: GriddingPlan holding a precomputed convolution mapping (optional)
+    :param weighting: 'uniform' | 'robust' | 'natural' (no change)
+    :param robustness: Briggs robustness parameter for robust weighting
+    :return: Visibility
     """
+    if weighting == 'natural':
+        return vis
+
     pu_grid, pu_offset, pv_grid, pv_offset, pwg_grid, pwg_fraction, pwc_grid, pwc_fraction, pfreq_grid = \
-        convolution_mapping(vis, griddata, cf)
-    _, _, _, _, _, gv, gu = cf.shape
-    coords = zip(vis.imaging_weight, pfreq_grid, pu_grid, pv_grid, pwg_grid)
-    
-    for vwt, chan, xx, yy, zzg in coords:
-        if numpy.real(griddata.data[chan, :, zzg, yy, xx]).all() > 0.0:
-            vwt /= numpy.real(griddata.data[chan, :, zzg, yy, xx])
+        plan_convolution_mapping(vis, griddata, cf, plan)
+    # The summed weight in the cell of each row [nrows, npol]
+    density = numpy.real(griddata.data[pfreq_grid, :, pwg_grid, pv_grid, pu_grid])
+    gridwt = numpy.real(griddata.data)
+    gridsum = numpy.sum(gridwt, axis=(2, 3, 4))
+    gridsum2 = numpy.sum(gridwt ** 2, axis=(2, 3, 4)) if weighting == 'robust' else None
+    return _reweight(vis, density, pfreq_grid, gridsum, gridsum2, weighting, robustness)
+
+
+def _reweight(vis, density, chan, gridsum, gridsum2, weighting, robustness):
+    """ Divide the imaging weights of vis, see griddata_reweight
+
+    :param density: Summed weight in the cell of each row [nrows, npol]
+    :param chan: Grid channel of each row
+    :param gridsum: Sum of the weight grid [nchan, npol]
+    :param gridsum2: Sum of the squared weight grid [nchan, npol] (only needed for robust weighting)
+    """
+    if weighting == 'uniform':
+        divisor = density
+    elif weighting == 'robust':
+        f2 = numpy.zeros_like(gridsum)
+        numpy.divide((5.0 * 10.0 ** -robustness) ** 2 * gridsum, gridsum2, out=f2, where=gridsum2 > 0.0)
+        divisor = 1.0 + f2[chan, :] * density
+    else:
+        raise ValueError("Unknown weighting %s" % weighting)
+
+    rows = numpy.all(divisor > 0.0, axis=1)
+    vis.data['imaging_weight'][rows, :] /= divisor[rows, :]
     
     return vis
 
 
-def degrid_visibility_from_griddata(vis, griddata, cf, **kwargs):
+class SparseWeightGrid:
+    """ Weight grid holding only the occupied cells
+
+    The cells are the sorted flat indices into the [nchan, nz, ny, nx] axes of a GridData of the given shape, and
+    weights holds the summed imaging weight [ncells, npol] in each. Sparse weight grids are made by
+    grid_weight_to_sparse, summed by sparse_weights_merge, and used for reweighting by sparse_weights_reweight.
+    For robust weighting the sums of the weights and squared weights of the full grid are also kept, so that they
+    survive sparse_weights_select.
+    """
+
+    def __init__(self, shape, cells, weights, sumwt, gridsum=None, gridsum2=None):
+        """ Sparse weight grid
+
+        :param shape: Shape of the GridData [nchan, npol, nz, ny, nx]
+        :param cells: Sorted flat indices of the occupied cells
+        :param weights: Summed weight in each cell [ncells, npol]
+        :param sumwt: Sum of weights [nchan, npol]
+        :param gridsum: Sum of the weights of the full grid [nchan, npol] (def: from weights)
+        :param gridsum2: Sum of the squared weights of the full grid [nchan, npol] (def: from weights)
+        """
+        self.shape = tuple(shape)
+        self.cells = cells
+        self.weights = weights
+        self.sumwt = sumwt
+        nchan, npol, nz, ny, nx = self.shape
+        chan = cells // (nz * ny * nx)
+        if gridsum is None:
+            gridsum = numpy.array([numpy.bincount(chan, weights=weights[:, pol], minlength=nchan)
+                                   for pol in range(npol)]).T
+        if gridsum2 is None:
+            gridsum2 = numpy.array([numpy.bincount(chan, weights=weights[:, pol] ** 2, minlength=nchan)
+                                    for pol in range(npol)]).T
+        self.gridsum = gridsum
+        self.gridsum2 = gridsum2
+
+    def size(self):
+        """ Size in bytes of the cells and weights
+        """
+        return self.cells.nbytes + self.weights.nbytes
+
+
+def _sum_cells(cells, weights):
+    """ Sum the weights [n, npol] of repeated cells, returning the unique cells and their summed weights
+    """
+    cells, inverse = numpy.unique(cells, return_inverse=True)
+    summed = numpy.zeros([len(cells), weights.shape[1]])
+    for pol in range(weights.shape[1]):
+        summed[:, pol] = numpy.bincount(inverse, weights=weights[:, pol], minlength=len(cells))
+    return cells, summed
+
+
+def grid_weight_to_sparse(vis, griddata, cf, plan=None):
+    """Grid Visibility weight onto a SparseWeightGrid
+
+    This is the sparse equivalent of grid_weight_to_griddata: only the cells touched by vis are held. griddata
+    is only used as a template.
+
+    :param vis: Visibility to be gridded
+    :param griddata: GridData template
+    :param cf: Convolution function
+    :param plan: GriddingPlan holding a precomputed convolution mapping (optional)
+    :return: SparseWeightGrid
+    """
+    assert isinstance(vis, Visibility), vis
+
+    nchan, npol, nz, ny, nx = griddata.shape
+    pu_grid, pu_offset, pv_grid, pv_offset, pwg_grid, pwg_fraction, pwc_grid, pwc_fraction, pfreq_grid = \
+        plan_convolution_mapping(vis, griddata, cf, plan)
+    cells, weights = _sum_cells(((pfreq_grid * nz + pwg_grid) * ny + pv_grid) * nx + pu_grid,
+                                vis.imaging_weight)
+    sumwt = numpy.array([numpy.bincount(pfreq_grid, weights=vis.imaging_weight[:, pol], minlength=nchan)
+                         for pol in range(npol)]).T
+    return SparseWeightGrid(griddata.shape, cells, weights, sumwt)
+
+
+def sparse_weights_merge(swg_list):
+    """ Sum SparseWeightGrids
+
+    Entries that are None are skipped. This can be applied repeatedly to form a tree reduction.
+
+    :param swg_list: List of SparseWeightGrid of the same shape
+    :return: SparseWeightGrid
+    """
+    swg_list = [swg for swg in swg_list if swg is not None]
+    if len(swg_list) == 0:
+        return None
+    shape = swg_list[0].shape
+    for swg in swg_list:
+        if swg.shape != shape:
+            raise ValueError("Sparse weight grids have different shapes: %s, %s" % (shape, swg.shape))
+    cells, weights = _sum_cells(numpy.concatenate([swg.cells for swg in swg_list]),
+                                numpy.concatenate([swg.weights for swg in swg_list]))
+    return SparseWeightGrid(shape, cells, weights, numpy.sum([swg.sumwt for swg in swg_list], axis=0))
+
+
+def sparse_weights_select(swg, cells):
+    """ Select the cells of a (merged) SparseWeightGrid
+
+    The sums over the full grid are kept, so the result can be used for robust weighting.
+
+    :param swg: SparseWeightGrid
+    :param cells: Cells to select, either an array or the SparseWeightGrid whose cells are wanted
+    :return: SparseWeightGrid holding the weights of swg at cells (zero where swg has no weight)
+    """
+    if swg is None or cells is None:
+        return None
+    if isinstance(cells, SparseWeightGrid):
+        cells = cells.cells
+    weights = numpy.zeros([len(cells), swg.weights.shape[1]])
+    if len(swg.cells) > 0:
+        index = numpy.minimum(numpy.searchsorted(swg.cells, cells), len(swg.cells) - 1)
+        found = swg.cells[index] == cells
+        weights[found] = swg.weights[index[found]]
+    return SparseWeightGrid(swg.shape, cells, weights, swg.sumwt, swg.gridsum, swg.gridsum2)
+
+
+def sparse_weights_reweight(vis, swg, griddata, cf, plan=None, weighting='uniform', robustness=0.0):
+    """Reweight Visibility weight using the weights in a SparseWeightGrid
+
+    This is the sparse equivalent of griddata_reweight. swg must hold the cells touched by vis, e.g. as
+    selected from the merged grid by sparse_weights_select.
+
+    :param vis: Visibility to be reweighted
+    :param swg: SparseWeightGrid
+    :param griddata: GridData template
+    :param cf: Convolution function
+    :param plan: GriddingPlan holding a precomputed convolution mapping (optional)
+    :param weighting: 'uniform' | 'robust' | 'natural' (no change)
+    :param robustness: Briggs robustness parameter for robust weighting
+    :return: Visibility
+    """
+    if weighting == 'natural':
+        return vis
+
+    if swg.shape != tuple(griddata.shape):
+        raise ValueError("Sparse weight grid shape %s does not match griddata shape %s" %
+                         (swg.shape, tuple(griddata.shape)))
+    nchan, npol, nz, ny, nx = griddata.shape
+    pu_grid, pu_offset, pv_grid, pv_offset, pwg_grid, pwg_fraction, pwc_grid, pwc_fraction, pfreq_grid = \
+        plan_convolution_mapping(vis, griddata, cf, plan)
+    cells = ((pfreq_grid * nz + pwg_grid) * ny + pv_grid) * nx + pu_grid
+    index = numpy.searchsorted(swg.cells, cells)
+    if numpy.any(index >= len(swg.cells)) or not numpy.array_equal(swg.cells[index], cells):
+        raise ValueError("Sparse weight grid does not hold all cells of the visibility")
+    return _reweight(vis, swg.weights[index], pfreq_grid, swg.gridsum, swg.gridsum2, weighting, robustness)
+
+
+def degrid_visibility_from_griddata(vis, griddata, cf, plan=None, **kwargs):
     """Degrid Visibility from a GridData
 
+    The rows are processed in chunks. For each chunk the grid windows under the kernel are gathered
+    with one fancy-indexing operation, and contracted against the matching kernel patches
+    cf.data[chan, :, zzc, vvf, uuf] in one batched einsum. The chunk size is set so that no more than
+    max_elements (rows x pols x support x support) values are gathered at once.
+
     :param vis: Visibility to be degridded
     :param griddata: GridData containing image
     :param cf: Convolution function (as GridData)
+    :param max_elements: Maximum number of grid values gathered per chunk (default 2**22)
+    :param plan: GriddingPlan holding a precomputed convolution mapping (optional)
     :param kwargs:
     :return: Visibility
     """
-    nchan, npol, nz, oversampling, _, support, _ = cf.shape
+    nchan, npol, nz, ny, nx = griddata.shape
     pu_grid, pu_offset, pv_grid, pv_offset, pwg_grid, pwg_fraction, pwc_grid, pwc_fraction, pfreq_grid = \
-        convolution_mapping(vis, griddata, cf)
+        plan_convolution_mapping(vis, griddata, cf, plan)
     _, _, _, _, _, gv, gu = cf.shape
     
     newvis = copy_visibility(vis, zero=True)
     
-    # coords = zip(pfreq_grid, pu_grid, pu_offset, pv_grid, pv_offset, pw_grid)
-    
     du = gu // 2
     dv = gv // 2
+    # The kernels must lie inside the grid, otherwise the flat cell indices would wrap into the next row or plane
+    assert numpy.min(pu_grid) >= du and numpy.max(pu_grid) + gu - du <= nx, "Kernel overflows the u axis of the grid"
+    assert numpy.min(pv_grid) >= dv and numpy.max(pv_grid) + gv - dv <= ny, "Kernel overflows the v axis of the grid"
     
-    nvis = vis.vis.shape[0]
+    # Offsets of the kernel pixels in the flattened grid, and of the polarisations
+    kernel_offsets = ((numpy.arange(gv) - dv)[:, numpy.newaxis] * nx +
+                      (numpy.arange(gu) - du)[numpy.newaxis, :])
+    pol_offsets = numpy.arange(npol) * nz * ny * nx
     
-    for ivis in range(nvis):
-        chan, uu, uuf, vv, vvf, zzg, zzc = pfreq_grid[ivis], pu_grid[ivis], pu_offset[ivis], pv_grid[ivis], \
-                                           pv_offset[ivis], pwg_grid[ivis], pwc_grid[ivis]
+    gridflat = numpy.ascontiguousarray(griddata.data).reshape([-1])
+    
+    nvis = vis.vis.shape[0]
+    max_elements = get_parameter(kwargs, "max_elements", 2 ** 22)
+    chunk = max(1, max_elements // (npol * gv * gu))
+    for start in range(0, nvis, chunk):
+        rows = slice(start, min(start + chunk, nvis))
+        chan = pfreq_grid[rows]
+        base = ((chan * npol * nz + pwg_grid[rows]) * ny + pv_grid[rows]) * nx + pu_grid[rows]
+        cells = base[:, numpy.newaxis, numpy.newaxis, numpy.newaxis] + \
+                pol_offsets[numpy.newaxis, :, numpy.newaxis, numpy.newaxis] + \
+                kernel_offsets[numpy.newaxis, numpy.newaxis, ...]
         # Use einsum to replace the following:
         # newvis.vis[i,:] = numpy.sum(griddata.data[chan, :, zzg, (vv - dv):(vv + dv), (uu - du):(uu + du)] *
         #                              cf.data[chan, :, zzc, vvf, uuf, :, :], axis=(1, 2))
-        
-        newvis.vis[ivis, :] += numpy.einsum('ijk,ijk->i',
-                                         griddata.data[chan, :, zzg, (vv - dv):(vv + dv), (uu - du):(uu + du)],
-                                         cf.data[chan, :, zzc, vvf, uuf, :, :])
+        newvis.data['vis'][rows, :] += \
+            numpy.einsum('rijk,rijk->ri', gridflat[cells],
+                         cf.data[chan, :, pwc_grid[rows], pv_offset[rows], pu_offset[rows]])
     
     return newvis
 
@@ -270,14 +644,22 @@ def degrid_visibility_from_griddata(vis, griddata, cf, **kwargs):
 def fft_griddata_to_image(griddata, gcf, imaginary=False):
     """ FFT griddata after applying gcf
 
+    If only the real part is needed (and gcf is real), only the Hermitian part of the grid is transformed, using a
+    complex-to-real FFT.
+
     :param griddata:
     :param gcf: Grid correction image
+    :param imaginary: Also return the imaginary part
     :return:
     """
    
     projected = numpy.sum(griddata.data, axis=2)
     _, _, ny, nx = projected.data.shape
-    
+
+    if not imaginary and not numpy.iscomplexobj(gcf.data):
+        im_data = ifft_real(projected) * gcf.data * float(nx) * float(ny)
+        return create_image_from_array(im_data, griddata.projection_wcs, griddata.polarisation_frame)
+
     im_data = ifft(projected) * gcf.data * float(nx) * float(ny)
     
     im_real = create_image_from_array(im_data.real, griddata.projection_wcs, griddata.polarisation_frame)
@@ -292,11 +674,18 @@ def fft_griddata_to_image(griddata, gcf, imaginary=False):
 def fft_image_to_griddata(im, griddata, gcf):
     """Fill griddata with transform of im
 
+    A real image (with a real gcf) is transformed with a real-to-complex FFT.
+
+    :param im: Image, which may be complex
     :param griddata:
     :param gcf: Grid correction image
     :return:
     """
+    corrected = im.data * gcf.data
     # chan, pol, z, u, v, w
-    griddata.data[:, :, :, ...] = fft(im.data * gcf.data)[:, :, numpy.newaxis, ...]
+    if numpy.iscomplexobj(corrected):
+        griddata.data[:, :, :, ...] = fft(corrected)[:, :, numpy.newaxis, ...]
+    else:
+        griddata.data[:, :, :, ...] = fft_real(corrected)[:, :, numpy.newaxis, ...]
     
     return griddata
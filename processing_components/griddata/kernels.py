@@ -1,16 +1,23 @@
 """
 Functions that define and manipulate kernels
 
+The kernels can be expensive to calculate so a process-level cache is provided. The cached versions of the
+kernel functions (cached_pswf_convolutionfunction, cached_awterm_convolutionfunction) return kernels that
+share data with the cache. These must not be altered in place.
 """
+import collections
 import logging
+import threading
 
 import numpy
 
 from data_models.memory_data_models import Image
-from processing_library.fourier_transforms.convolutional_gridding import coordinates, grdsf
-from processing_library.image.operations import copy_image, create_w_term_like, pad_image, fft_image
+from processing_library.fourier_transforms.convolutional_gridding import coordinates, coordinates2Offset, grdsf
+from processing_library.fourier_transforms.fft_support import ifft_axis
+from processing_library.image.operations import copy_image
 from processing_library.image.operations import create_image_from_array
-from processing_components.griddata.convolution_functions import create_convolutionfunction_from_image
+from processing_components.griddata.convolution_functions import create_convolutionfunction_from_image, \
+    create_convolutionfunction_from_array, convolutionfunction_sizeof
 from processing_components.image.operations import reproject_image, create_empty_image_like
 
 log = logging.getLogger(__name__)
@@ -98,14 +105,21 @@ def create_pswf_convolutionfunction(im, oversampling=8, support=6):
 
 
 def create_awterm_convolutionfunction(im, make_pb=None, nw=1, wstep=1e15, oversampling=8, support=6, use_aaf=True,
-                                      maxsupport=512):
+                                      maxsupport=512, max_elements=2 ** 24, max_workers=1):
     """ Fill AW projection kernel into a GridData.
+    
+    The w screens for a chunk of w planes are calculated as one array and transformed together. Only the rows of the
+    padded screens that hold the screen are transformed along u, and only the columns that hold the oversampled
+    kernels are transformed along v. The kernels for all oversampling offsets are then extracted by one
+    reshape and transpose.
 
     :param im: Image template
     :param make_pb: Function to make the primary beam model image (hint: use a partial)
     :param nw: Number of w planes
     :param wstep: Step in w (wavelengths)
     :param oversampling: Oversampling of the convolution function in uv space
+    :param max_elements: Maximum number of values in the partially transformed screens of a chunk of w planes
+    :param max_workers: Number of chunks of w planes calculated in parallel threads (1)
     :return: griddata correction Image, griddata kernel as GridData
     """
     d2r = numpy.pi / 180.0
@@ -120,7 +134,7 @@ def create_awterm_convolutionfunction(im, make_pb=None, nw=1, wstep=1e15, oversa
     
     cf_shape = list(cf.data.shape)
     cf_shape[2] = nw
-    cf.data = numpy.zeros(cf_shape).astype('complex')
+    cf.data = numpy.zeros(cf_shape, dtype='complex')
     
     cf.grid_wcs.wcs.crpix[4] = nw // 2 + 1.0
     cf.grid_wcs.wcs.cdelt[4] = wstep
@@ -139,8 +153,6 @@ def create_awterm_convolutionfunction(im, make_pb=None, nw=1, wstep=1e15, oversa
     qnx = nx // oversampling
     qny = ny // oversampling
 
-    cf.data[...] = 0.0
-
     subim = copy_image(im)
     ccell = onx * numpy.abs(d2r * subim.wcs.wcs.cdelt[0]) / qnx
 
@@ -162,34 +174,59 @@ def create_awterm_convolutionfunction(im, make_pb=None, nw=1, wstep=1e15, oversa
         rpb.data[footprint.data < 1e-6] = 0.0
         norm *= rpb.data
     
-    # We might need to work with a larger image
-    padded_shape = [nchan, npol, ny, nx]
-    thisplane = copy_image(subim)
-    thisplane.data = numpy.zeros(thisplane.shape, dtype='complex')
-    for z, w in enumerate(w_list):
-        thisplane.data[...] = 0.0 + 0.0j
-        thisplane = create_w_term_like(thisplane, w, dopol=True)
-        thisplane.data *= norm
-        paddedplane = pad_image(thisplane, padded_shape)
-        paddedplane = fft_image(paddedplane)
+    # The w screens differ only by the scaling of the phase, so calculate 1 - n once (as in w_beam)
+    cx, cy = subim.wcs.wcs.crpix[0] - 1.0, subim.wcs.wcs.crpix[1] - 1.0
+    fov = qnx * (numpy.abs(subim.wcs.wcs.cdelt[0]) * numpy.pi / 180.0)
+    ly, mx = coordinates2Offset(qnx, cx, cy)
+    r2 = fov ** 2 * (ly ** 2 + mx ** 2)
+    inside = r2 < 1.0
+    one_minus_n = numpy.where(inside, 1.0 - numpy.sqrt(numpy.where(inside, 1.0 - r2, 1.0)), 0.0)
+    
+    def transform_padded(a, n, base):
+        """ Pad the last axis of a to n, transform as fft_image does (zero frequency at n // 2), and keep the
+        support * oversampling outputs starting at base
         
-        ycen, xcen = ny // 2, nx // 2
-        for y in range(oversampling):
-            ybeg = y + ycen + (support * oversampling) // 2 - oversampling // 2
-            yend = y + ycen - (support * oversampling) // 2 - oversampling // 2
-            # vv = range(ybeg, yend, -oversampling)
-            for x in range(oversampling):
-                xbeg = x + xcen + (support * oversampling) // 2 - oversampling // 2
-                xend = x + xcen - (support * oversampling) // 2 - oversampling // 2
-
-                # uu = range(xbeg, xend, -oversampling)
-                cf.data[..., z, y, x, :, :] = paddedplane.data[..., ybeg:yend:-oversampling, xbeg:xend:-oversampling]
-                # for chan in range(nchan):
-                #     for pol in range(npol):
-                #         cf.data[chan, pol, z, y, x, :, :] = paddedplane.data[chan, pol, :, :][vv, :][:, uu]
-
+        The input shift is done by where the input is placed, and the output shift by a phase ramp on the input.
+        """
+        na = a.shape[-1]
+        k = numpy.concatenate([numpy.arange(na - na // 2), numpy.arange(n - na // 2, n)])
+        ramp = numpy.exp(-2j * numpy.pi * ((k * (n // 2)) % n) / n)
+        padded = numpy.zeros(list(a.shape[:-1]) + [n], dtype='complex')
+        padded[..., k] = numpy.concatenate([a[..., (na // 2):], a[..., :(na // 2)]], axis=-1) * ramp
+        return ifft_axis(padded, axis=-1)[..., base:(base + support * oversampling)]
+    
+    def fill_planes(z0, z1):
+        """ Fill the kernels for w planes z0:z1 of cf
+        """
+        w = numpy.array(w_list[z0:z1])
+        # [nw, nchan, npol, qny, qnx] screens
+        screens = inside * numpy.exp(1j * (-2 * numpy.pi * w[:, numpy.newaxis, numpy.newaxis] * one_minus_n))
+        screens = screens[:, numpy.newaxis, numpy.newaxis, ...] * norm
+        # Transform along u and then v, keeping only the region holding the oversampled kernels
+        kernels = transform_padded(screens, nx, xbase)
+        kernels = transform_padded(numpy.swapaxes(kernels, -1, -2), ny, ybase)
+        # Pixel base + k * oversampling + offset holds the kernel at position support - 1 - k for that offset
+        kernels = kernels.reshape(list(kernels.shape[:-2]) + [support, oversampling, support, oversampling])
+        kernels = kernels[..., ::-1, :, ::-1, :]
+        numpy.conjugate(numpy.transpose(kernels, (1, 2, 0, 6, 4, 5, 3)), out=cf.data[:, :, z0:z1, ...])
+    
+    ycen, xcen = ny // 2, nx // 2
+    ybase = ycen + (support * oversampling) // 2 - oversampling // 2 - (support - 1) * oversampling
+    xbase = xcen + (support * oversampling) // 2 - oversampling // 2 - (support - 1) * oversampling
+    
+    # Process the w planes in chunks of at most max_elements values in the second transform
+    chunk = max(1, max_elements // (nchan * npol * ny * support * oversampling))
+    chunks = [(z0, min(z0 + chunk, len(w_list))) for z0 in range(0, len(w_list), chunk)]
+    if max_workers is None or max_workers <= 1 or len(chunks) <= 1:
+        for z0, z1 in chunks:
+            fill_planes(z0, z1)
+    else:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            list(pool.map(lambda zz: fill_planes(*zz), chunks))
+    
+    # The kernels were conjugated as they were filled
     cf.data /= numpy.sum(numpy.real(cf.data[0, 0, nw // 2, oversampling // 2, oversampling // 2, :, :]))
-    cf.data = numpy.conjugate(cf.data)
     
     if use_aaf:
         pswf_gcf, _ = create_pswf_convolutionfunction(im, oversampling=1, support=6)
@@ -198,3 +235,157 @@ def create_awterm_convolutionfunction(im, make_pb=None, nw=1, wstep=1e15, oversa
         pswf_gcf.data[...] = 1.0
     
     return pswf_gcf, cf
+
+
+class ConvolutionFunctionCache:
+    """ Least recently used cache of (griddata correction function, convolution function) pairs
+
+    The size of the cache is measured using convolutionfunction_sizeof (GB). When a new entry would take the
+    cache over max_size, the least recently used entries are evicted. The number of hits and misses is recorded.
+    The cache may be used from several threads at once, so its state is only changed while holding a lock.
+    """
+    
+    def __init__(self, max_size=1.0):
+        """ Empty cache
+        
+        :param max_size: Maximum size of cached convolution functions (GB)
+        """
+        self.max_size = max_size
+        self.size = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+    
+    def get(self, key):
+        """ Return the cached (gcf, cf) for key or None, updating the counters
+        
+        :param key: Hashable key
+        :return: (gcf, cf) or None
+        """
+        with self.lock:
+            if key in self.entries:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return self.entries[key]
+            self.misses += 1
+            return None
+    
+    def put(self, key, gcfcf):
+        """ Add (gcf, cf) to the cache, evicting least recently used entries as necessary
+        
+        :param key: Hashable key
+        :param gcfcf: (Grid correction function i.e. in image space, Convolution function i.e. in uv space)
+        """
+        size = convolutionfunction_sizeof(gcfcf[1])
+        if size > self.max_size:
+            log.debug("ConvolutionFunctionCache: convolution function of size %.3f (GB) is too large to cache" %
+                      size)
+            return
+        with self.lock:
+            if key in self.entries:
+                self.size -= convolutionfunction_sizeof(self.entries.pop(key)[1])
+            while self.entries and self.size + size > self.max_size:
+                _, (_, evicted_cf) = self.entries.popitem(last=False)
+                self.size -= convolutionfunction_sizeof(evicted_cf)
+            self.entries[key] = gcfcf
+            self.size += size
+    
+    def clear(self):
+        """ Remove all entries and reset the counters
+        """
+        with self.lock:
+            self.entries.clear()
+            self.size = 0.0
+            self.hits = 0
+            self.misses = 0
+    
+    def info(self):
+        """ Return dictionary of hits, misses, number of entries, size (GB), and max_size (GB)
+        """
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.entries),
+                    'size': self.size, 'max_size': self.max_size}
+
+
+convolutionfunction_cache = ConvolutionFunctionCache()
+
+
+def convolutionfunction_cache_key(im, **kwargs):
+    """ Key for the convolution function cache
+
+    The key holds the image shape, cell size, polarisation frame, and the remaining arguments
+    of the kernel function (e.g. support, oversampling, nw, wstep).
+    
+    :param im: Image template
+    :param kwargs: Arguments of the kernel function
+    :return: key (tuple)
+    """
+    return (tuple(im.shape), tuple(im.wcs.wcs.cdelt[0:2]), im.polarisation_frame.type) + \
+           tuple(sorted(kwargs.items()))
+
+
+def _cached_convolutionfunction(im, gcfcf):
+    """ Shallow copies of cached (gcf, cf) with the coordinate systems of the image im
+    
+    The data arrays are shared with the cache.
+    """
+    gcf, cf = gcfcf
+    grid_wcs = cf.grid_wcs.deepcopy()
+    grid_wcs.wcs.crval[5:7] = im.wcs.wcs.crval[2:4]
+    grid_wcs.wcs.crpix[5:7] = im.wcs.wcs.crpix[2:4]
+    grid_wcs.wcs.cdelt[5:7] = im.wcs.wcs.cdelt[2:4]
+    return create_image_from_array(gcf.data, im.wcs, im.polarisation_frame), \
+           create_convolutionfunction_from_array(cf.data, grid_wcs, im.wcs, im.polarisation_frame)
+
+
+def cached_pswf_convolutionfunction(im, oversampling=8, support=6):
+    """ Cached version of create_pswf_convolutionfunction
+    
+    The kernel is calculated only once for a given image shape, cell size, polarisation frame,
+    oversampling and support. The data arrays are shared with the cache and must not be altered in place.
+
+    :param im: Image template
+    :param oversampling: Oversampling of the convolution function in uv space
+    :param support: Support of the convolution function
+    :return: griddata correction Image, griddata kernel as ConvolutionFunction
+    """
+    key = convolutionfunction_cache_key(im, kernel='pswf', oversampling=oversampling, support=support)
+    gcfcf = convolutionfunction_cache.get(key)
+    if gcfcf is None:
+        gcfcf = create_pswf_convolutionfunction(im, oversampling=oversampling, support=support)
+        convolutionfunction_cache.put(key, gcfcf)
+    return _cached_convolutionfunction(im, gcfcf)
+
+
+def cached_awterm_convolutionfunction(im, make_pb=None, nw=1, wstep=1e15, oversampling=8, support=6, use_aaf=True,
+                                      maxsupport=512, max_workers=1):
+    """ Cached version of create_awterm_convolutionfunction
+
+    The kernel is calculated only once for a given image shape, cell size, polarisation frame, and
+    w sampling, oversampling and support. If make_pb is specified, the primary beam function (by identity)
+    and the image reference values are also part of the key. The data arrays are shared with the cache
+    and must not be altered in place.
+
+    :param im: Image template
+    :param make_pb: Function to make the primary beam model image (hint: use a partial)
+    :param nw: Number of w planes
+    :param wstep: Step in w (wavelengths)
+    :param oversampling: Oversampling of the convolution function in uv space
+    :param max_workers: Number of threads used to calculate the kernel (1). This is not part of the key.
+    :return: griddata correction Image, griddata kernel as ConvolutionFunction
+    """
+    if make_pb is None:
+        pb_key = None
+    else:
+        pb_key = (make_pb, tuple(im.wcs.wcs.crval), tuple(im.wcs.wcs.cdelt))
+    key = convolutionfunction_cache_key(im, kernel='awterm', make_pb=pb_key, nw=nw, wstep=wstep,
+                                        oversampling=oversampling, support=support, use_aaf=use_aaf,
+                                        maxsupport=maxsupport)
+    gcfcf = convolutionfunction_cache.get(key)
+    if gcfcf is None:
+        gcfcf = create_awterm_convolutionfunction(im, make_pb=make_pb, nw=nw, wstep=wstep,
+                                                  oversampling=oversampling, support=support, use_aaf=use_aaf,
+                                                  maxsupport=maxsupport, max_workers=max_workers)
+        convolutionfunction_cache.put(key, gcfcf)
+    return _cached_convolutionfunction(im, gcfcf)
@@ -4,6 +4,8 @@ The standard deconvolution algorithms are provided:
 
     hogbom: Hogbom CLEAN See: Hogbom CLEAN A&A Suppl, 15, 417, (1974)
     
+    clark: Clark CLEAN See: Clark, B.G., An efficient implementation of the algorithm 'CLEAN', A&A 89, 377 (1980)
+    
     msclean: MultiScale CLEAN See: Cornwell, T.J., Multiscale CLEAN (IEEE Journal of Selected Topics in Sig Proc,
     2008 vol. 2 pp. 793-801)
 
@@ -33,7 +35,8 @@ from photutils import fit_2dgaussian
 
 from data_models.memory_data_models import Image
 from data_models.parameters import get_parameter
-from processing_library.arrays.cleaners import hogbom, hogbom_complex, msclean, msmfsclean
+from processing_library.arrays.cleaners import hogbom, hogbom_complex, clark, msclean, msmfsclean
+from processing_library.fourier_transforms.fft_support import fft_threads, set_fft_engine_threads
 from processing_library.image.operations import create_image_from_array, copy_image
 from ..image.operations import calculate_image_frequency_moments, calculate_image_from_frequency_moments
 
@@ -65,13 +68,18 @@ def deconvolve_cube(dirty: Image, psf: Image, prefix='', **kwargs) -> (Image, Im
     :param psf: Image Point Spread Function
     :param window_shape: Window image (Bool) - clean where True
     :param mask: Window in the form of an image, overrides woindow_shape
-    :param algorithm: Cleaning algorithm: 'msclean'|'hogbom'|'mfsmsclean'
+    :param algorithm: Cleaning algorithm: 'msclean'|'hogbom'|'clark'|'mfsmsclean'
     :param gain: loop gain (float) 0.7
     :param threshold: Clean threshold (0.0)
     :param fractional_threshold: Fractional threshold (0.01)
     :param scales: Scales (in pixels) for multiscale ([0, 3, 10, 30])
     :param nmoment: Number of frequency moments (default 3)
     :param findpeak: Method of finding peak in mfsclean: 'Algorithm1'|'ASKAPSoft'|'CASA'|'ARL', Default is ARL.
+    :param psf_patch: Half-width of the PSF patch used in the clark minor cycle (32)
+    :param max_active: Maximum number of active pixels in a clark minor cycle (10000)
+    :param max_workers: Number of (channel, polarisation) planes cleaned in parallel by msclean, hogbom and clark (1)
+    :param executor: Run the planes in a 'thread' or 'process' pool ('thread'). The process pool needs
+        Python 3.8 or later: on earlier versions the thread pool is used.
     :return: componentimage, residual
     
     """
@@ -115,6 +123,8 @@ def deconvolve_cube(dirty: Image, psf: Image, prefix='', **kwargs) -> (Image, Im
         log.info('deconvolve_cube %s: PSF shape %s' % (prefix, str(psf.data.shape)))
     
     algorithm = get_parameter(kwargs, 'algorithm', 'msclean')
+    max_workers = get_parameter(kwargs, 'max_workers', 1)
+    executor = get_parameter(kwargs, 'executor', 'thread')
 
     if algorithm == 'msclean':
         log.info("deconvolve_cube %s: Multi-scale clean of each polarisation and channel separately" %
@@ -129,23 +139,10 @@ def deconvolve_cube(dirty: Image, psf: Image, prefix='', **kwargs) -> (Image, Im
         fracthresh = get_parameter(kwargs, 'fractional_threshold', 0.01)
         assert 0.0 < fracthresh < 1.0
         
-        comp_array = numpy.zeros_like(dirty.data)
-        residual_array = numpy.zeros_like(dirty.data)
-        for channel in range(dirty.data.shape[0]):
-            for pol in range(dirty.data.shape[1]):
-                if psf.data[channel, pol, :, :].max():
-                    log.info("deconvolve_cube %s: Processing pol %d, channel %d" % (prefix, pol, channel))
-                    if window is None:
-                        comp_array[channel, pol, :, :], residual_array[channel, pol, :, :] = \
-                            msclean(dirty.data[channel, pol, :, :], psf.data[channel, pol, :, :],
-                                    None, gain, thresh, niter, scales, fracthresh, prefix)
-                    else:
-                        comp_array[channel, pol, :, :], residual_array[channel, pol, :, :] = \
-                            msclean(dirty.data[channel, pol, :, :], psf.data[channel, pol, :, :],
-                                    window[channel, pol, :, :], gain, thresh, niter, scales, fracthresh,
-                                    prefix)
-                else:
-                    log.info("deconvolve_cube %s: Skipping pol %d, channel %d" % (prefix, pol, channel))
+        comp_array, residual_array = \
+            deconvolve_planes(msclean, dirty.data, psf.data, window,
+                              (gain, thresh, niter, scales, fracthresh, prefix), dtype=dirty.data.dtype,
+                              prefix=prefix, max_workers=max_workers, executor=executor)
         
         comp_image = create_image_from_array(comp_array, dirty.wcs, dirty.polarisation_frame)
         residual_image = create_image_from_array(residual_array, dirty.wcs, dirty.polarisation_frame)
@@ -222,22 +219,30 @@ def deconvolve_cube(dirty: Image, psf: Image, prefix='', **kwargs) -> (Image, Im
         fracthresh = get_parameter(kwargs, 'fractional_threshold', 0.1)
         assert 0.0 < fracthresh < 1.0
         
-        comp_array = numpy.zeros(dirty.data.shape)
-        residual_array = numpy.zeros(dirty.data.shape)
-        for channel in range(dirty.data.shape[0]):
-            for pol in range(dirty.data.shape[1]):
-                if psf.data[channel, pol, :, :].max():
-                    log.info("deconvolve_cube %s: Processing pol %d, channel %d" % (prefix, pol, channel))
-                    if window is None:
-                        comp_array[channel, pol, :, :], residual_array[channel, pol, :, :] = \
-                            hogbom(dirty.data[channel, pol, :, :], psf.data[channel, pol, :, :],
-                                   None, gain, thresh, niter, fracthresh, prefix)
-                    else:
-                        comp_array[channel, pol, :, :], residual_array[channel, pol, :, :] = \
-                            hogbom(dirty.data[channel, pol, :, :], psf.data[channel, pol, :, :],
-                                   window[channel, pol, :, :], gain, thresh, niter, fracthresh, prefix)
-                else:
-                    log.info("deconvolve_cube %s: Skipping pol %d, channel %d" % (prefix, pol, channel))
+        comp_array, residual_array = \
+            deconvolve_planes(hogbom, dirty.data, psf.data, window, (gain, thresh, niter, fracthresh, prefix),
+                              prefix=prefix, max_workers=max_workers, executor=executor)
+        
+        comp_image = create_image_from_array(comp_array, dirty.wcs, dirty.polarisation_frame)
+        residual_image = create_image_from_array(residual_array, dirty.wcs, dirty.polarisation_frame)
+    elif algorithm == 'clark':
+        log.info("deconvolve_cube %s: Clark clean of each polarisation and channel separately"
+                 % prefix)
+        gain = get_parameter(kwargs, 'gain', 0.7)
+        assert 0.0 < gain < 2.0, "Loop gain must be between 0 and 2"
+        thresh = get_parameter(kwargs, 'threshold', 0.0)
+        assert thresh >= 0.0
+        niter = get_parameter(kwargs, 'niter', 100)
+        assert niter > 0
+        fracthresh = get_parameter(kwargs, 'fractional_threshold', 0.1)
+        assert 0.0 < fracthresh < 1.0
+        psf_patch = get_parameter(kwargs, 'psf_patch', 32)
+        max_active = get_parameter(kwargs, 'max_active', 10000)
+        
+        comp_array, residual_array = \
+            deconvolve_planes(clark, dirty.data, psf.data, window,
+                              (gain, thresh, niter, fracthresh, prefix, psf_patch, max_active),
+                              prefix=prefix, max_workers=max_workers, executor=executor)
         
         comp_image = create_image_from_array(comp_array, dirty.wcs, dirty.polarisation_frame)
         residual_image = create_image_from_array(residual_array, dirty.wcs, dirty.polarisation_frame)
@@ -300,6 +305,127 @@ def deconvolve_cube(dirty: Image, psf: Image, prefix='', **kwargs) -> (Image, Im
     return comp_image, residual_image
 
 
+def _clean_plane(cleaner, dirty, psf, window, comp, residual, channel, pol, args, threads=None):
+    """ Clean one (channel, polarisation) plane, writing the results into comp and residual
+
+    :param threads: Number of FFT threads to use in this thread (def: unchanged)
+    """
+    if threads is not None:
+        set_fft_engine_threads(threads)
+    plane_window = None if window is None else window[channel, pol, :, :]
+    comp[channel, pol, :, :], residual[channel, pol, :, :] = \
+        cleaner(dirty[channel, pol, :, :], psf[channel, pol, :, :], plane_window, *args)
+
+
+def _clean_plane_shared(cleaner, buffers, channel, pol, args, threads=None):
+    """ Clean one plane in a worker process, with all arrays held in shared memory
+
+    :param buffers: dict of name: (shared memory name, shape, dtype) for dirty, psf, window, comp, residual
+    :param threads: Number of FFT threads to use in this process (def: unchanged)
+    """
+    from multiprocessing import shared_memory
+    
+    handles = dict()
+    arrays = dict()
+    for name, (shm_name, shape, dtype) in buffers.items():
+        handles[name] = shared_memory.SharedMemory(name=shm_name)
+        arrays[name] = numpy.ndarray(shape, dtype=dtype, buffer=handles[name].buf)
+    try:
+        _clean_plane(cleaner, arrays['dirty'], arrays['psf'], arrays.get('window', None), arrays['comp'],
+                     arrays['residual'], channel, pol, args, threads)
+    finally:
+        # The arrays must be released before the shared memory is closed
+        arrays.clear()
+        for shm in handles.values():
+            shm.close()
+
+
+def deconvolve_planes(cleaner, dirty, psf, window, args, dtype='float', prefix='', max_workers=1, executor='thread'):
+    """ Clean each (channel, polarisation) plane of a cube independently
+    
+    Planes whose PSF is zero are skipped. With max_workers > 1 the planes are cleaned in a thread or process pool,
+    and the FFT threads of each worker are divided by max_workers so that the CPUs are not oversubscribed.
+    For a process pool the dirty, PSF, window and output cubes are held in shared memory so that planes are not
+    pickled. This needs multiprocessing.shared_memory (Python 3.8 or later); on earlier versions the thread pool
+    is used instead. Each plane is cleaned exactly as in the serial case so the results do not depend on
+    max_workers.
+    
+    :param cleaner: Function cleaner(dirty, psf, window, *args) returning comp, residual for one plane e.g. hogbom
+    :param dirty: Dirty cube [nchan, npol, ny, nx]
+    :param psf: PSF cube [nchan, npol, ny', nx']
+    :param window: Window cube or None
+    :param args: Remaining arguments of the cleaner
+    :param dtype: Type of the output cubes
+    :param max_workers: Number of planes cleaned in parallel (1)
+    :param executor: 'thread' or 'process' ('thread'). 'process' needs Python 3.8 or later
+    :return: comp, residual cubes
+    """
+    comp = numpy.zeros(dirty.shape, dtype=dtype)
+    residual = numpy.zeros(dirty.shape, dtype=dtype)
+    
+    planes = list()
+    for channel in range(dirty.shape[0]):
+        for pol in range(dirty.shape[1]):
+            if psf[channel, pol, :, :].max():
+                log.info("deconvolve_cube %s: Processing pol %d, channel %d" % (prefix, pol, channel))
+                planes.append((channel, pol))
+            else:
+                log.info("deconvolve_cube %s: Skipping pol %d, channel %d" % (prefix, pol, channel))
+    
+    if max_workers is None or max_workers <= 1 or len(planes) <= 1:
+        for channel, pol in planes:
+            _clean_plane(cleaner, dirty, psf, window, comp, residual, channel, pol, args)
+        return comp, residual
+    
+    from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+    
+    if executor == 'process':
+        try:
+            from multiprocessing import shared_memory
+        except ImportError:
+            log.warning("deconvolve_cube %s: process executor needs Python 3.8 or later, using threads" % prefix)
+            executor = 'thread'
+    
+    threads = max(1, fft_threads() // max_workers)
+    if executor == 'thread':
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(_clean_plane, cleaner, dirty, psf, window, comp, residual, channel, pol, args,
+                                   threads)
+                       for channel, pol in planes]
+            for future in futures:
+                future.result()
+    elif executor == 'process':
+        inputs = {'dirty': dirty, 'psf': psf, 'comp': comp, 'residual': residual}
+        if window is not None:
+            inputs['window'] = window
+        handles = dict()
+        arrays = dict()
+        try:
+            buffers = dict()
+            for name, array in inputs.items():
+                array = numpy.ascontiguousarray(array)
+                handles[name] = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                arrays[name] = numpy.ndarray(array.shape, dtype=array.dtype, buffer=handles[name].buf)
+                arrays[name][...] = array
+                buffers[name] = (handles[name].name, array.shape, array.dtype)
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                futures = [pool.submit(_clean_plane_shared, cleaner, buffers, channel, pol, args, threads)
+                           for channel, pol in planes]
+                for future in futures:
+                    future.result()
+            comp[...] = arrays['comp']
+            residual[...] = arrays['residual']
+        finally:
+            arrays.clear()
+            for shm in handles.values():
+                shm.close()
+                shm.unlink()
+    else:
+        raise ValueError("deconvolve_cube %s: Unknown executor %s" % (prefix, executor))
+    
+    return comp, residual
+
+
 def restore_cube(model: Image, psf: Image, residual=None, **kwargs) -> Image:
     """ Restore the model image to the residuals
 
@@ -37,8 +37,8 @@ from processing_library.image.operations import create_image_from_array
 from processing_library.imaging.imaging_params import get_frequency_map
 from processing_library.util.coordinate_support import simulate_point, skycoord_to_lmn
 
-from processing_components.griddata.kernels  import create_pswf_convolutionfunction
-from ..griddata.gridding import grid_visibility_to_griddata, \
+from processing_components.griddata.kernels  import cached_pswf_convolutionfunction
+from ..griddata.gridding import grid_visibility_to_griddata, grid_visibility_to_griddata_batch, \
     fft_griddata_to_image, fft_image_to_griddata, \
     degrid_visibility_from_griddata
 from ..griddata.operations import create_griddata_from_image
@@ -109,8 +109,9 @@ def predict_2d(vis: Union[BlockVisibility, Visibility], model: Image, gcfcf=None
     this function. Any shifting needed is performed here.
 
     :param vis: Visibility to be predicted
-    :param model: model image
+    :param model: model image, which may be complex
     :param gcfcf: (Grid correction function i.e. in image space, Convolution function i.e. in uv space)
+    :param gridding_plan: GriddingPlan to reuse the convolution mapping between calls (optional)
     :return: resulting visibility (in place works)
     """
     
@@ -122,7 +123,7 @@ def predict_2d(vis: Union[BlockVisibility, Visibility], model: Image, gcfcf=None
     _, _, ny, nx = model.data.shape
     
     if gcfcf is None:
-        gcf, cf = create_pswf_convolutionfunction(model,
+        gcf, cf = cached_pswf_convolutionfunction(model,
                                                   support=get_parameter(kwargs, "support", 6),
                                                   oversampling=get_parameter(kwargs, "oversampling", 128))
     else:
@@ -130,7 +131,8 @@ def predict_2d(vis: Union[BlockVisibility, Visibility], model: Image, gcfcf=None
     
     griddata = create_griddata_from_image(model)
     griddata = fft_image_to_griddata(model, griddata, gcf)
-    vis = degrid_visibility_from_griddata(vis, griddata=griddata, cf=cf)
+    vis = degrid_visibility_from_griddata(vis, griddata=griddata, cf=cf,
+                                          plan=get_parameter(kwargs, "gridding_plan", None))
     
     # Now we can shift the visibility from the image frame to the original visibility frame
     svis = shift_vis_to_image(vis, model, tangent=True, inverse=True)
@@ -152,6 +154,8 @@ def invert_2d(vis: Visibility, im: Image, dopsf: bool = False, normalize: bool =
     :param dopsf: Make the psf instead of the dirty image
     :param normalize: Normalize by the sum of weights (True)
     :param gcfcf: (Grid correction function i.e. in image space, Convolution function i.e. in uv space)
+    :param gridder: Gridding algorithm: 'loop' (per-row, default) or 'batch' (vectorised over rows)
+    :param gridding_plan: GriddingPlan to reuse the convolution mapping between calls (optional)
     :return: resulting image
 
     """
@@ -165,14 +169,21 @@ def invert_2d(vis: Visibility, im: Image, dopsf: bool = False, normalize: bool =
     svis = shift_vis_to_image(svis, im, tangent=True, inverse=False)
 
     if gcfcf is None:
-        gcf, cf = create_pswf_convolutionfunction(im,
+        gcf, cf = cached_pswf_convolutionfunction(im,
                                                   support=get_parameter(kwargs, "support", 6),
                                                   oversampling=get_parameter(kwargs, "oversampling", 128))
     else:
         gcf, cf = gcfcf
 
     griddata = create_griddata_from_image(im)
-    griddata, sumwt = grid_visibility_to_griddata(svis, griddata=griddata, cf=cf)
+    gridder = get_parameter(kwargs, "gridder", "loop")
+    plan = get_parameter(kwargs, "gridding_plan", None)
+    if gridder == "batch":
+        griddata, sumwt = grid_visibility_to_griddata_batch(svis, griddata=griddata, cf=cf, plan=plan)
+    elif gridder == "loop":
+        griddata, sumwt = grid_visibility_to_griddata(svis, griddata=griddata, cf=cf, plan=plan)
+    else:
+        raise ValueError("invert_2d: unknown gridder %s" % gridder)
     
     imaginary = get_parameter(kwargs, "imaginary", False)
     if imaginary:
@@ -221,7 +232,7 @@ def predict_skycomponent_visibility(vis: Union[Visibility, BlockVisibility],
 
     elif isinstance(vis, BlockVisibility):
         
-        ntimes, nant, _, nchan, npol = vis.vis.shape
+        nchan = vis.nchan
         
         k = numpy.array(vis.frequency) / constants.c.to('m s^-1').value
         
@@ -235,9 +246,9 @@ def predict_skycomponent_visibility(vis: Union[Visibility, BlockVisibility],
             
             l, m, n = skycoord_to_lmn(comp.direction, vis.phasecentre)
             uvw = vis.uvw[..., numpy.newaxis] * k
-            phasor = numpy.ones([ntimes, nant, nant, nchan, npol], dtype='complex')
+            phasor = numpy.ones(vis.vis.shape, dtype='complex')
             for chan in range(nchan):
-                phasor[:, :, :, chan, :] = simulate_point(uvw[..., chan], l, m)[..., numpy.newaxis]
+                phasor[..., chan, :] = simulate_point(uvw[..., chan], l, m)[..., numpy.newaxis]
             
             vis.data['vis'][..., :, :] += flux[:, :] * phasor[..., :]
     
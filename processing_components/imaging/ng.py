@@ -50,10 +50,12 @@ try:
         
         # Extracting data from BlockVisibility
         freq = bvis.frequency  # frequency, Hz
-        nrows, nants, _, vnchan, vnpol = bvis.vis.shape
+        vshape = bvis.vis.shape
+        vnchan, vnpol = vshape[-2:]
         
-        uvw = newbvis.data['uvw'].reshape([nrows * nants * nants, 3])
-        vis = newbvis.data['vis'].reshape([nrows * nants * nants, vnchan, vnpol])
+        # Both the square and compact layouts are flattened to rows
+        uvw = newbvis.data['uvw'].reshape([-1, 3])
+        vis = newbvis.data['vis'].reshape([-1, vnchan, vnpol])
         
         vis[...] = 0.0 + 0.0j  # Make all vis data equal to 0 +0j
         
@@ -88,7 +90,7 @@ try:
                                     verbosity=verbosity)[:,0]
         
         vis = convert_pol_frame(vis, model.polarisation_frame, bvis.polarisation_frame, polaxis=2)
-        newbvis.data['vis'] = vis.reshape([nrows, nants, nants, vnchan, vnpol])
+        newbvis.data['vis'] = vis.reshape(vshape)
 
         # Now we can shift the visibility from the image frame to the original visibility frame
         return shift_vis_to_image(newbvis, model, tangent=True, inverse=True)
@@ -128,10 +130,12 @@ try:
         
         freq = sbvis.frequency  # frequency, Hz
         
-        nrows, nants, _, vnchan, vnpol = vis.shape
-        uvw = sbvis.uvw.reshape([nrows * nants * nants, 3])
-        ms = vis.reshape([nrows * nants * nants, vnchan, vnpol])
-        wgt = sbvis.imaging_weight.reshape([nrows * nants * nants, vnchan, vnpol])
+        # Both the square and compact layouts are flattened to rows
+        vnchan, vnpol = vis.shape[-2:]
+        uvw = sbvis.uvw.reshape([-1, 3])
+        ms = vis.reshape([-1, vnchan, vnpol])
+        wgt = sbvis.imaging_weight.reshape([-1, vnchan, vnpol])
+        nrows = uvw.shape[0]
         
         if dopsf:
             ms[...] = 1.0 + 0.0j
@@ -163,9 +167,9 @@ try:
             ichan = vis_to_im[vchan]
             for pol in range(npol):
                 # Nifty gridder likes to receive contiguous arrays
-                ms_1d = numpy.array([ms[row, vchan:vchan+1, pol] for row in range(nrows * nants * nants)], dtype='complex')
+                ms_1d = numpy.array([ms[row, vchan:vchan+1, pol] for row in range(nrows)], dtype='complex')
                 ms_1d.reshape([ms_1d.shape[0], 1])
-                wgt_1d = numpy.array([wgt[row, vchan:vchan+1, pol] for row in range(nrows * nants * nants)])
+                wgt_1d = numpy.array([wgt[row, vchan:vchan+1, pol] for row in range(nrows)])
                 wgt_1d.reshape([wgt_1d.shape[0], 1])
                 dirty = ng.ms2dirty(
                     fuvw, freq[vchan:vchan+1], ms_1d, wgt_1d,
@@ -10,8 +10,9 @@ There are two classes of functions:
 import numpy
 
 from data_models.memory_data_models import Visibility, BlockVisibility
-from processing_components.griddata.gridding import grid_weight_to_griddata, griddata_reweight
-from processing_components.griddata.kernels import create_pswf_convolutionfunction
+from data_models.parameters import get_parameter
+from processing_components.griddata.gridding import grid_weight_to_griddata, griddata_reweight, GriddingPlan
+from processing_components.griddata.kernels import cached_pswf_convolutionfunction
 from processing_components.griddata.operations import create_griddata_from_image
 from processing_library.util.array_functions import tukey_filter
 
@@ -24,19 +25,26 @@ def weight_visibility(vis, model, gcfcf=None, weighting='uniform', **kwargs):
 
     :param vis_list:
     :param model_imagelist: Model required to determine weighting parameters
-    :param weighting: Type of weighting
+    :param weighting: Type of weighting: 'uniform' | 'robust' | 'natural'
+    :param robustness: Briggs robustness parameter for robust weighting (def: 0.0)
     :param kwargs: Parameters for functions in graphs
     :return: List of vis_graphs
    """
     
     assert isinstance(vis, Visibility), vis
 
+    if weighting == 'natural':
+        return vis
+
     if gcfcf is None:
-        gcfcf = create_pswf_convolutionfunction(model)
+        gcfcf = cached_pswf_convolutionfunction(model)
     
+    # The same mapping is used for gridding the weights and for reweighting
+    plan = get_parameter(kwargs, "gridding_plan", GriddingPlan())
     griddata = create_griddata_from_image(model)
-    griddata, sumwt = grid_weight_to_griddata(vis, griddata, gcfcf[1])
-    vis = griddata_reweight(vis, griddata, gcfcf[1])
+    griddata, sumwt = grid_weight_to_griddata(vis, griddata, gcfcf[1], plan=plan)
+    vis = griddata_reweight(vis, griddata, gcfcf[1], plan=plan, weighting=weighting,
+                            robustness=get_parameter(kwargs, "robustness", 0.0))
     return vis
 
 
@@ -0,0 +1,238 @@
+"""
+The w-projection approach is to correct for the w term by convolving with a w-dependent kernel when gridding and
+degridding. The measurement equation is:
+
+.. math::
+
+    V(u,v,w) = G_w(u,v) \\ast \\int \\frac{I(l,m)}{\\sqrt{1-l^2-m^2}} e^{-2 \\pi j (ul+vm)} dl dm
+
+where the kernel :math:`G_w` is the Fourier transform of :math:`e^{-2 \\pi j (w(\\sqrt{1-l^2-m^2}-1))}`. The
+kernels are sampled in w and held in a ConvolutionFunction with one plane per w sample
+(see create_awterm_convolutionfunction).
+
+The size of the kernel grows with w. Each w plane is therefore trimmed to its own bounding box and the visibilities
+are gridded and degridded in groups sharing the same kernel size, so that rows with small w do not pay the cost of the
+largest kernel.
+"""
+
+import logging
+
+import numpy
+
+from data_models.memory_data_models import Visibility, Image
+from data_models.parameters import get_parameter
+from processing_components.griddata.convolution_functions import create_convolutionfunction_from_array, \
+    calculate_bounding_box_convolutionfunction
+from processing_components.griddata.gridding import grid_visibility_to_griddata, grid_visibility_to_griddata_batch, \
+    degrid_visibility_from_griddata, fft_griddata_to_image, fft_image_to_griddata
+from processing_components.griddata.kernels import cached_awterm_convolutionfunction, cached_pswf_convolutionfunction
+from processing_components.griddata.operations import create_griddata_from_image
+from processing_components.imaging.base import advise_wide_field, shift_vis_to_image, normalize_sumwt
+from processing_components.visibility.base import copy_visibility, create_visibility_from_rows
+
+log = logging.getLogger(__name__)
+
+
+def create_wprojection_convolutionfunction(vis: Visibility, im: Image, **kwargs):
+    """ Create (or fetch from the cache) the w-projection kernels for imaging vis onto im
+
+    The w sampling and the kernel support are derived from advise_wide_field for the field of view of im, and the
+    number of w planes is chosen to cover the largest abs(w) in vis. Any of these can be overridden.
+
+    :param vis: Visibility
+    :param im: Image template
+    :param delA: Allowed coherence loss used to set the w sampling (def: 0.02)
+    :param wstep: Step in w (wavelengths) (def: advised w sampling for the image)
+    :param nw: Number of w planes (def: enough to cover the maximum abs(w))
+    :param wprojection_support: Support of the largest kernel (def: advised)
+    :param oversampling: Oversampling of the convolution function in uv space (def: 8)
+    :return: griddata correction Image, griddata kernel as ConvolutionFunction
+    """
+    assert isinstance(vis, Visibility), vis
+
+    delA = get_parameter(kwargs, "delA", 0.02)
+    advice = advise_wide_field(vis, delA=delA, verbose=False)
+    # Sample w for the field of view of the image rather than the advised field of view
+    image_fov = im.shape[-1] * numpy.abs(numpy.deg2rad(im.wcs.wcs.cdelt[0]))
+    advice = advise_wide_field(vis, delA=delA, guard_band_image=image_fov / advice['primary_beam_fov'],
+                               verbose=False)
+
+    wstep = get_parameter(kwargs, "wstep", advice['w_sampling_image'])
+    nw = get_parameter(kwargs, "nw", 2 * int(numpy.ceil(advice['maximum_w'] / wstep)) + 1)
+    # The kernel at the largest w spreads over about w * fov**2 cells in uv, to which the anti-aliasing
+    # kernel adds 6 cells.
+    support = max(advice['nwpixels'], int(numpy.ceil(advice['maximum_w'] * image_fov ** 2)) + 6)
+    support = get_parameter(kwargs, "wprojection_support", support + support % 2)
+    oversampling = get_parameter(kwargs, "oversampling", 8)
+
+    log.debug("create_wprojection_convolutionfunction: %d w planes, wstep %.1f (wavelengths), support %d" %
+              (nw, wstep, support))
+
+    return cached_awterm_convolutionfunction(im, nw=nw, wstep=wstep, oversampling=oversampling, support=support,
+                                             use_aaf=True)
+
+
+def wprojection_gcfcf(vis: Visibility, im: Image, gcfcf=None, **kwargs):
+    """ Choose the kernels for w-projection
+
+    A supplied gcfcf with w planes is used as given. Without a gcfcf, or if the supplied one is the plain PSWF
+    kernel (as made by default in the workflows), the w-projection kernels are made by
+    create_wprojection_convolutionfunction. Any other supplied kernel with a single w plane (e.g. an A-projection
+    kernel) is used as given, with a warning that the w term is then not corrected.
+
+    :param vis: Visibility
+    :param im: Image template
+    :param gcfcf: (Grid correction function, Convolution function) or None
+    :return: griddata correction Image, griddata kernel as ConvolutionFunction
+    """
+    if gcfcf is None:
+        return create_wprojection_convolutionfunction(vis, im, **kwargs)
+    
+    gcf, cf = gcfcf
+    if cf.shape[2] > 1:
+        return gcf, cf
+    
+    _, pswf = cached_pswf_convolutionfunction(im, oversampling=cf.shape[3], support=cf.shape[-1])
+    if pswf.shape == cf.shape and numpy.allclose(pswf.data, cf.data):
+        log.debug("wprojection_gcfcf: replacing the PSWF kernel by w-projection kernels")
+        return create_wprojection_convolutionfunction(vis, im, **kwargs)
+    
+    log.warning("wprojection_gcfcf: the supplied convolution function has no w planes and is not a PSWF: "
+                "using it as given, without correcting the w term")
+    return gcf, cf
+
+
+def wprojection_kernel_groups(vis: Visibility, cf, fractional_level=1e-3):
+    """ Partition the rows of vis by the trimmed size of the w kernel they use
+
+    Each w plane of cf is trimmed to a square box, centred on the kernel centre, holding all values above
+    fractional_level times the peak of cf (see calculate_bounding_box_convolutionfunction). The rows of vis are
+    grouped by the size of the box of their w plane, and for each group a ConvolutionFunction is made from a view of
+    cf trimmed to that size.
+
+    :param vis: Visibility
+    :param cf: Convolution function with w planes
+    :param fractional_level: Level below which the kernel is trimmed (def: 1e-3)
+    :return: List of (row indices, trimmed ConvolutionFunction)
+    """
+    assert isinstance(vis, Visibility), vis
+
+    _, _, nw, _, _, gv, gu = cf.shape
+    assert gv == gu, "Convolution function must be square"
+    centre = gu // 2
+
+    halfwidth = numpy.zeros(nw, dtype='int')
+    for z, (u0, u1), (v0, v1) in calculate_bounding_box_convolutionfunction(cf, fractional_level=fractional_level):
+        halfwidth[z] = min(centre, max(centre - min(u0, v0), max(u1, v1) + 1 - centre))
+
+    pwc = numpy.round(cf.grid_wcs.sub([5]).wcs_world2pix(vis.w, 0)[0]).astype('int')
+    assert numpy.min(pwc) >= 0, "W axis underflows: %f" % numpy.min(pwc)
+    assert numpy.max(pwc) < nw, "W axis overflows: %f" % numpy.max(pwc)
+    row_halfwidth = halfwidth[pwc]
+
+    groups = list()
+    for h in numpy.unique(row_halfwidth):
+        rows = numpy.nonzero(row_halfwidth == h)[0]
+        grid_wcs = cf.grid_wcs.deepcopy()
+        grid_wcs.wcs.crpix[0] += h - gu / 2
+        grid_wcs.wcs.crpix[1] += h - gv / 2
+        trimmed = create_convolutionfunction_from_array(cf.data[..., centre - h:centre + h, centre - h:centre + h],
+                                                        grid_wcs, cf.projection_wcs, cf.polarisation_frame)
+        groups.append((rows, trimmed))
+
+    log.debug("wprojection_kernel_groups: kernel support %s for %s rows" %
+              ([2 * int(h) for h in numpy.unique(row_halfwidth)], [len(rows) for rows, _ in groups]))
+
+    return groups
+
+
+def predict_wprojection(vis: Visibility, model: Image, gcfcf=None, **kwargs) -> Visibility:
+    """ Predict using w-projection
+
+    The model is transformed once, and the visibilities are degridded in groups using the w kernels trimmed to the
+    size needed by each group.
+
+    :param vis: Visibility to be predicted
+    :param model: model image
+    :param gcfcf: (Grid correction function, Convolution function) with w planes. If not given, or if it is the
+        plain PSWF kernel, create_wprojection_convolutionfunction is used (see wprojection_gcfcf)
+    :param fractional_level: Level below which the kernels are trimmed (def: 1e-3)
+    :return: resulting visibility (in place works)
+    """
+    if model is None:
+        return vis
+
+    assert isinstance(vis, Visibility), vis
+
+    gcf, cf = wprojection_gcfcf(vis, model, gcfcf, **kwargs)
+
+    griddata = create_griddata_from_image(model)
+    griddata = fft_image_to_griddata(model, griddata, gcf)
+
+    newvis = copy_visibility(vis, zero=True)
+    for rows, trimmed_cf in wprojection_kernel_groups(vis, cf, get_parameter(kwargs, "fractional_level", 1e-3)):
+        subvis = degrid_visibility_from_griddata(create_visibility_from_rows(vis, rows), griddata=griddata,
+                                                 cf=trimmed_cf)
+        newvis.data['vis'][rows, ...] = subvis.vis
+
+    # Now we can shift the visibility from the image frame to the original visibility frame
+    return shift_vis_to_image(newvis, model, tangent=True, inverse=True)
+
+
+def invert_wprojection(vis: Visibility, im: Image, dopsf: bool = False, normalize: bool = True,
+                       gcfcf=None, **kwargs) -> (Image, numpy.ndarray):
+    """ Invert using w-projection
+
+    The visibilities are gridded in groups using the w kernels trimmed to the size needed by each group, and the
+    summed grid is transformed once.
+
+    :param vis: Visibility to be inverted
+    :param im: image template (not changed)
+    :param dopsf: Make the psf instead of the dirty image
+    :param normalize: Normalize by the sum of weights (True)
+    :param gcfcf: (Grid correction function, Convolution function) with w planes. If not given, or if it is the
+        plain PSWF kernel, create_wprojection_convolutionfunction is used (see wprojection_gcfcf)
+    :param gridder: Gridding algorithm: 'loop' (per-row, default) or 'batch' (vectorised over rows)
+    :param fractional_level: Level below which the kernels are trimmed (def: 1e-3)
+    :return: resulting image, sum of weights
+    """
+    assert isinstance(vis, Visibility), vis
+
+    svis = copy_visibility(vis)
+
+    if dopsf:
+        svis.data['vis'][...] = 1.0 + 0.0j
+
+    svis = shift_vis_to_image(svis, im, tangent=True, inverse=False)
+
+    gcf, cf = wprojection_gcfcf(svis, im, gcfcf, **kwargs)
+
+    gridder = get_parameter(kwargs, "gridder", "loop")
+    if gridder == "batch":
+        grid = grid_visibility_to_griddata_batch
+    elif gridder == "loop":
+        grid = grid_visibility_to_griddata
+    else:
+        raise ValueError("invert_wprojection: unknown gridder %s" % gridder)
+
+    griddata = create_griddata_from_image(im)
+    sumwt = 0.0
+    for rows, trimmed_cf in wprojection_kernel_groups(svis, cf, get_parameter(kwargs, "fractional_level", 1e-3)):
+        subgriddata, subsumwt = grid(create_visibility_from_rows(svis, rows),
+                                     griddata=create_griddata_from_image(im), cf=trimmed_cf)
+        griddata.data += subgriddata.data
+        sumwt += subsumwt
+
+    imaginary = get_parameter(kwargs, "imaginary", False)
+    if imaginary:
+        result0, result1 = fft_griddata_to_image(griddata, gcf, imaginary=imaginary)
+        log.debug("invert_wprojection: retaining imaginary part of dirty image")
+        if normalize:
+            result0 = normalize_sumwt(result0, sumwt)
+            result1 = normalize_sumwt(result1, sumwt)
+        return result0, sumwt, result1
+    else:
+        result = fft_griddata_to_image(griddata, gcf)
+        if normalize:
+            result = normalize_sumwt(result, sumwt)
+        return result, sumwt
@@ -16,7 +16,6 @@ from data_models.memory_data_models import Visibility, Image, BlockVisibility
 from processing_library.image.operations import create_w_term_like
 
 from ..image.operations import copy_image
-from ..visibility.base import copy_visibility
 from ..imaging.base import predict_2d, invert_2d
 
 import logging
@@ -43,21 +42,13 @@ def predict_wstack_single(vis, model, remove=True, gcfcf=None, **kwargs) -> Visi
     w_average = numpy.average(vis.w)
     if remove:
         vis.data['uvw'][..., 2] -= w_average
-    tempvis = copy_visibility(vis)
 
-    # Calculate w beam and apply to the model. The imaginary part is not needed
+    # Calculate w beam and apply to the model. The predict is linear so the complex model is predicted in one pass.
     workimage = copy_image(model)
     w_beam = create_w_term_like(model, w_average, vis.phasecentre)
-    
-    # Do the real part
-    workimage.data = w_beam.data.real * model.data
+    workimage.data = numpy.conjugate(w_beam.data) * model.data
     vis = predict_2d(vis, workimage, gcfcf=gcfcf, **kwargs)
     
-    # and now the imaginary part
-    workimage.data = w_beam.data.imag * model.data
-    tempvis = predict_2d(tempvis, workimage, gcfcf=gcfcf, **kwargs)
-    vis.data['vis'] -= 1j * tempvis.data['vis']
-    
     if remove:
         vis.data['uvw'][..., 2] += w_average
 
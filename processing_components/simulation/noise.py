@@ -60,14 +60,19 @@ def calculate_noise_blockvisibility(bandwidth, int_time, diameter, t_sys, eta):
     return sigma
 
 
-def addnoise_visibility(vis, t_sys=None, eta=None):
+def addnoise_visibility(vis, t_sys=None, eta=None, seed=None):
     """ Add noise to a visibility
     
     TODO: Obtain sensitivity values from vis as a function of frequency
+
+    The noise is drawn from a numpy.random.Generator made from seed. To get reproducible, independent noise for
+    chunks processed in parallel, give each chunk its own child of one numpy.random.SeedSequence, e.g.
+    numpy.random.SeedSequence(seed).spawn(nchunks).
     
     :param vis:
     :param t_sys: System temperature
     :param eta: Efficiency
+    :param seed: Seed for numpy.random.default_rng: None, int, SeedSequence or Generator (def: None, fresh entropy)
     :return:
     """
     assert isinstance(vis, Visibility) or isinstance(vis, BlockVisibility), vis
@@ -78,6 +83,8 @@ def addnoise_visibility(vis, t_sys=None, eta=None):
     if eta is None:
         eta = 0.78
     
+    rng = numpy.random.default_rng(seed)
+    
     # We need to handle Visibility and BlockVisibility separately since time and bandwidth are
     # stored differently
     if isinstance(vis, Visibility):
@@ -85,20 +92,27 @@ def addnoise_visibility(vis, t_sys=None, eta=None):
                                            vis.configuration.diameter[0], t_sys=t_sys, eta=eta)
         log.debug('addnoise_visibility: RMS noise value: %g' % sigma[0])
         # Each pol gets a separate noise
-        for pol in range(vis.npol):
-            vis.data["vis"][:, pol].real += numpy.random.normal(0, sigma)
-            vis.data["vis"][:, pol].imag += numpy.random.normal(0, sigma)
+        vis.data["vis"] += sigma[:, numpy.newaxis] * _complex_normal(rng, vis.data["vis"].shape)
     elif isinstance(vis, BlockVisibility):
         sigma = calculate_noise_blockvisibility(vis.channel_bandwidth, vis.data['integration_time'],
                                                 vis.configuration.diameter[0], t_sys=t_sys, eta=eta)
         log.debug('addnoise_visibility: RMS noise value (first integration, first channel): %g' % sigma[0, 0])
-        for row in range(vis.nvis):
-            for ant1 in range(vis.nants):
-                for ant2 in range(ant1, vis.nants):
-                    for pol in range(vis.npol):
-                        vis.data["vis"][row, ant2, ant1, :, pol].real += numpy.random.normal(0, sigma[row, ...])
-                        vis.data["vis"][row, ant2, ant1, :, pol].imag += numpy.random.normal(0, sigma[row, ...])
-                        vis.data["vis"][row, ant1, ant2, :, pol] = \
-                            numpy.conjugate(vis.data["vis"][row, ant2, ant1, :, pol])
+        if vis.compact:
+            # Each baseline is held once, so the noise is added directly
+            vis.data["vis"] += sigma[:, numpy.newaxis, :, numpy.newaxis] * _complex_normal(rng, vis.data["vis"].shape)
+        else:
+            # Noise is added to [ant2, ant1] for ant1 <= ant2, and [ant1, ant2] is then set to its conjugate
+            ant2, ant1 = numpy.tril_indices(vis.nants)
+            nrows, _, _, nchan, npol = vis.data["vis"].shape
+            noise = _complex_normal(rng, [nrows, len(ant1), nchan, npol])
+            noise *= sigma[:, numpy.newaxis, :, numpy.newaxis]
+            vis.data["vis"][:, ant2, ant1, ...] += noise
+            vis.data["vis"][:, ant1, ant2, ...] = numpy.conjugate(vis.data["vis"][:, ant2, ant1, ...])
     
     return vis
+
+
+def _complex_normal(rng, shape):
+    """ Complex noise with unit standard deviation in each of the real and imaginary parts, drawn in one call
+    """
+    return rng.standard_normal(list(shape) + [2]).view('complex')[..., 0]
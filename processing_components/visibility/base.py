@@ -162,11 +162,14 @@ def create_blockvisibility(config: Configuration,
                            elevation_limit=None,
                            source='unknown',
                            meta=None,
+                           compact=False,
                            **kwargs) -> BlockVisibility:
     """ Create a BlockVisibility from Configuration, hour angles, and direction of source
 
     Note that we keep track of the integration time for BDA purposes
 
+    If compact is True, the BlockVisibility holds only the baselines antenna2 > antenna1, indexed by baseline
+
     :param config: Configuration of antennas
     :param times: hour angles in radians
     :param frequency: frequencies (Hz] [nchan]
@@ -175,6 +178,7 @@ def create_blockvisibility(config: Configuration,
     :param channel_bandwidth: channel bandwidths: (Hz] [nchan]
     :param integration_time: Integration time ('auto' or value in s)
     :param polarisation_frame:
+    :param compact: Use the compact, baseline indexed layout (False)
     :return: BlockVisibility
     """
     assert phasecentre is not None, "Must specify phase centre"
@@ -207,12 +211,18 @@ def create_blockvisibility(config: Configuration,
         log.info('create_visibility: created %d times' % (ntimes))
     
     npol = polarisation_frame.npol
-    visshape = [ntimes, nants, nants, nch, npol]
+    if compact:
+        antenna2, antenna1 = numpy.tril_indices(nants, -1)
+        visshape = [ntimes, len(antenna1), nch, npol]
+        ruvw = numpy.zeros([ntimes, len(antenna1), 3])
+    else:
+        antenna1, antenna2 = None, None
+        visshape = [ntimes, nants, nants, nch, npol]
+        ruvw = numpy.zeros([ntimes, nants, nants, 3])
     rvis = numpy.zeros(visshape, dtype='complex')
     rweight = weight * numpy.ones(visshape)
     rimaging_weight = numpy.ones(visshape)
     rtimes = numpy.zeros([ntimes])
-    ruvw = numpy.zeros([ntimes, nants, nants, 3])
     
     # Do each hour angle in turn
     itime = 0
@@ -226,11 +236,14 @@ def create_blockvisibility(config: Configuration,
             rtimes[itime] = ha * 43200.0 / numpy.pi
             rweight[itime, ...] = 1.0
 
-            # Loop over all pairs of antennas. Note that a2>a1
-            for a1 in range(nants):
-                for a2 in range(a1 + 1, nants):
-                    ruvw[itime, a2, a1, :] = (ant_pos[a2, :] - ant_pos[a1, :])
-                    ruvw[itime, a1, a2, :] = (ant_pos[a1, :] - ant_pos[a2, :])
+            if compact:
+                ruvw[itime, ...] = ant_pos[antenna2, :] - ant_pos[antenna1, :]
+            else:
+                # Loop over all pairs of antennas. Note that a2>a1
+                for a1 in range(nants):
+                    for a2 in range(a1 + 1, nants):
+                        ruvw[itime, a2, a1, :] = (ant_pos[a2, :] - ant_pos[a1, :])
+                        ruvw[itime, a1, a2, :] = (ant_pos[a1, :] - ant_pos[a2, :])
             itime += 1
     
     rintegration_time = numpy.full_like(rtimes, integration_time)
@@ -240,7 +253,8 @@ def create_blockvisibility(config: Configuration,
     vis = BlockVisibility(uvw=ruvw, time=rtimes, frequency=frequency, vis=rvis, weight=rweight,
                           imaging_weight=rimaging_weight,
                           integration_time=rintegration_time, channel_bandwidth=rchannel_bandwidth,
-                          polarisation_frame=polarisation_frame, source=source, meta=meta)
+                          polarisation_frame=polarisation_frame, source=source, meta=meta,
+                          antenna1=antenna1, antenna2=antenna2)
     vis.phasecentre = phasecentre
     vis.configuration = config
     log.info("create_blockvisibility: %s" % (vis_summary(vis)))
@@ -249,45 +263,140 @@ def create_blockvisibility(config: Configuration,
     return vis
 
 
-def create_visibility_from_rows(vis: Union[Visibility, BlockVisibility], rows: numpy.ndarray, makecopy=True):
+def convert_blockvisibility_to_compact(vis: BlockVisibility, autocorrelations=False) -> BlockVisibility:
+    """ Convert a BlockVisibility to the compact, baseline indexed layout
+
+    The baselines [antenna2, antenna1] with antenna2 > antenna1 (or antenna2 >= antenna1 if
+    autocorrelations is True) are kept. The other triangle of the square layout is redundant and is dropped.
+
+    :param vis: BlockVisibility
+    :param autocorrelations: Keep the autocorrelations (False)
+    :return: BlockVisibility in compact layout
+    """
+    assert isinstance(vis, BlockVisibility), "vis is not a BlockVisibility: %r" % vis
+    if vis.compact:
+        return vis
+
+    antenna2, antenna1 = numpy.tril_indices(vis.nants, 0 if autocorrelations else -1)
+    return BlockVisibility(uvw=vis.uvw[:, antenna2, antenna1, ...], time=vis.time,
+                           frequency=vis.frequency, channel_bandwidth=vis.channel_bandwidth,
+                           vis=vis.vis[:, antenna2, antenna1, ...], weight=vis.weight[:, antenna2, antenna1, ...],
+                           imaging_weight=vis.imaging_weight[:, antenna2, antenna1, ...],
+                           integration_time=vis.integration_time, phasecentre=vis.phasecentre,
+                           configuration=vis.configuration, polarisation_frame=vis.polarisation_frame,
+                           source=vis.source, meta=vis.meta, antenna1=antenna1, antenna2=antenna2)
+
+
+def convert_blockvisibility_to_square(vis: BlockVisibility) -> BlockVisibility:
+    """ Convert a BlockVisibility to the square layout [ntimes, nants, nants, nchan, npol]
+
+    See BlockVisibility.square for how the redundant triangle is filled.
+
+    :param vis: BlockVisibility
+    :return: BlockVisibility in square layout
+    """
+    assert isinstance(vis, BlockVisibility), "vis is not a BlockVisibility: %r" % vis
+    if not vis.compact:
+        return vis
+
+    return BlockVisibility(uvw=vis.square('uvw'), time=vis.time,
+                           frequency=vis.frequency, channel_bandwidth=vis.channel_bandwidth,
+                           vis=vis.square('vis'), weight=vis.square('weight'),
+                           imaging_weight=vis.square('imaging_weight'),
+                           integration_time=vis.integration_time, phasecentre=vis.phasecentre,
+                           configuration=vis.configuration, polarisation_frame=vis.polarisation_frame,
+                           source=vis.source, meta=vis.meta)
+
+
+def read_visibility_rows(data, rows: numpy.ndarray) -> numpy.ndarray:
+    """ Read selected rows of the data of a Visibility or BlockVisibility into memory
+
+    The data may be a numpy array or, for a lazily imported visibility, an HDF5VisibilityData. For the latter a
+    contiguous selection such as a time slice is read as a single slice.
+
+    :param data: numpy structured array or HDF5VisibilityData
+    :param rows: Boolean array of row selection, sorted array of row indices, or slice
+    :return: numpy structured array
+    """
+    if isinstance(data, numpy.ndarray) or isinstance(rows, slice):
+        return data[rows]
+    
+    index = numpy.where(rows)[0] if rows.dtype == bool else rows
+    if index[-1] - index[0] + 1 == len(index):
+        return data[index[0]:index[-1] + 1]
+    else:
+        return data[index]
+
+
+def number_of_rows(rows, nvis) -> int:
+    """ Number of rows in a row selection
+
+    :param rows: Boolean array of row selection, array of row indices, or slice
+    :param nvis: Number of rows in the visibility
+    :return: Number of rows selected
+    """
+    if isinstance(rows, slice):
+        return len(range(*rows.indices(nvis)))
+    rows = numpy.asarray(rows)
+    if rows.dtype == bool:
+        assert len(rows) == nvis, "Length of rows does not agree with length of visibility"
+        return int(numpy.sum(rows))
+    return len(rows)
+
+
+def create_visibility_from_rows(vis: Union[Visibility, BlockVisibility], rows: numpy.ndarray, makecopy=True,
+                                view=False):
     """ Create a Visibility from selected rows
 
+    Only the selected rows are read, so this can be used to stream through a visibility imported lazily
+    from HDF5.
+    
+    The rows can be selected by a boolean array, as from the visibility iterators, or by an array of row indices
+    or a slice, as from the iterators with indices=True. If view is True and the rows are a slice, the data of the
+    new visibility are a view of the data of vis, so no copy is made.
+
     :param vis: Visibility
-    :param rows: Boolean array of row selction
+    :param rows: Boolean array of row selction, array of row indices, or slice
     :param makecopy: Make a deep copy (True)
+    :param view: Use a view of the data for a slice of rows (False)
     :return: Visibility
     """
     
-    if rows is None or numpy.sum(rows) == 0:
+    if rows is None or number_of_rows(rows, vis.nvis) == 0:
         return None
     
-    assert len(rows) == vis.nvis, "Length of rows does not agree with length of visibility"
+    if view and isinstance(rows, slice) and isinstance(vis.data, numpy.ndarray):
+        newvis = copy.copy(vis)
+        newvis.data = vis.data[rows]
+        if isinstance(vis, Visibility) and vis.cindex is not None:
+            newvis.cindex = vis.cindex[rows]
+        return newvis
     
     if isinstance(vis, Visibility):
         
         if makecopy:
-            newvis = copy_visibility(vis)
-            if vis.cindex is not None and len(rows) == len(vis.cindex):
+            newvis = copy.copy(vis)
+            if vis.cindex is not None and len(vis.cindex) == vis.nvis:
                 newvis.cindex = vis.cindex[rows]
             else:
                 newvis.cindex = None
             if vis.blockvis is not None:
                 newvis.blockvis = vis.blockvis
-            newvis.data = copy.deepcopy(vis.data[rows])
+            newvis.data = copy.deepcopy(read_visibility_rows(vis.data, rows))
             return newvis
         else:
-            vis.data = copy.deepcopy(vis.data[rows])
+            vis.data = copy.deepcopy(read_visibility_rows(vis.data, rows))
             if vis.cindex is not None:
                 vis.cindex = vis.cindex[rows]
             return vis
     else:
         
         if makecopy:
-            newvis = copy_visibility(vis)
-            newvis.data = copy.deepcopy(vis.data[rows])
+            newvis = copy.copy(vis)
+            newvis.data = copy.deepcopy(read_visibility_rows(vis.data, rows))
             return newvis
         else:
-            vis.data = copy.deepcopy(vis.data[rows])
+            vis.data = copy.deepcopy(read_visibility_rows(vis.data, rows))
             
             return vis
 
@@ -461,8 +570,8 @@ def export_blockvisibility_to_ms(msname, vis_list, source_name=None, ack=False):
         # bv_uvw = numpy.zeros([ntimes, nants, nants, 3])
         time = vis.data['time']
         int_time = vis.data['integration_time']
-        bv_vis = vis.data['vis']
-        bv_uvw = vis.data['uvw']
+        bv_vis = vis.square('vis')
+        bv_uvw = vis.square('uvw')
 
         # bv_antenna1 = vis.data['antenna1']
         # bv_antenna2 = vis.data['antenna2']
@@ -520,8 +629,162 @@ def list_ms(msname, ack=False):
     return sources, dds
 
 
+def _select_ms_fields_dds(msname, tab, selected_sources=None, selected_dds=None):
+    """ Find the FIELD_IDs and DATA_DESC_IDs to be read from an MS
+
+    :param msname: File name of MS
+    :param tab: Main table of the MS
+    :param selected_sources: Names of sources to select, default is None meaning all
+    :param selected_dds: Data descriptions to select, default is None meaning all
+    :return: fields, dds
+    """
+    from casacore.tables import table  # pylint: disable=import-error
+
+    if selected_sources is None:
+        fields = numpy.unique(tab.getcol('FIELD_ID'))
+    else:
+        fieldtab = table('%s/FIELD' % msname, ack=False)
+        sources = fieldtab.getcol('NAME')
+        fields = list()
+        for field, source in enumerate(sources):
+            if source in selected_sources: fields.append(field)
+        assert len(fields) > 0, "No sources selected"
+        
+    if selected_dds is None:
+        dds = numpy.unique(tab.getcol('DATA_DESC_ID'))
+    else:
+        dds = selected_dds
+    return fields, dds
+
+
+def _read_ms_subtables(msname, field, dd, channum):
+    """ Get the frequency, polarisation, configuration and phasecentre information from the MS subtables
+
+    :param msname: File name of MS
+    :param field: FIELD_ID
+    :param dd: DATA_DESC_ID
+    :param channum: Channels to be read
+    :return: frequency, channel_bandwidth, polarisation_frame, configuration, phasecentre, source
+    """
+    from casacore.tables import table  # pylint: disable=import-error
+
+    spwtab = table('%s/SPECTRAL_WINDOW' % msname, ack=False)
+    cfrequency = spwtab.getcol('CHAN_FREQ')[dd][channum]
+    cchannel_bandwidth = spwtab.getcol('CHAN_WIDTH')[dd][channum]
+    # Get polarisation info
+    poltab = table('%s/POLARIZATION' % msname, ack=False)
+    corr_type = poltab.getcol('CORR_TYPE')
+    # These correspond to the CASA Stokes enumerations
+    if numpy.array_equal(corr_type[0], [1, 2, 3, 4]):
+        polarisation_frame = PolarisationFrame('stokesIQUV')
+    elif numpy.array_equal(corr_type[0], [5, 6, 7, 8]):
+        polarisation_frame = PolarisationFrame('circular')
+    elif numpy.array_equal(corr_type[0], [9, 10, 11, 12]):
+        polarisation_frame = PolarisationFrame('linear')
+    elif numpy.array_equal(corr_type[0], [9]):
+        polarisation_frame = PolarisationFrame('stokesI')
+    else:
+        raise KeyError("Polarisation not understood: %s" % str(corr_type))
+    
+    # Get configuration
+    anttab = table('%s/ANTENNA' % msname, ack=False)
+    mount = anttab.getcol('MOUNT')
+    names = anttab.getcol('NAME')
+    diameter = anttab.getcol('DISH_DIAMETER')
+    xyz = anttab.getcol('POSITION')
+    configuration = Configuration(name='', data=None, location=None,
+                                  names=names, xyz=xyz, mount=mount, frame=None,
+                                  receptor_frame=ReceptorFrame("linear"),
+                                  diameter=diameter)
+    # Get phasecentres
+    fieldtab = table('%s/FIELD' % msname, ack=False)
+    pc = fieldtab.getcol('PHASE_DIR')[field, 0, :]
+    source = fieldtab.getcol('NAME')[field]
+    phasecentre = SkyCoord(ra=pc[0] * u.rad, dec=pc[1] * u.rad, frame='icrs', equinox='J2000')
+    return cfrequency, cchannel_bandwidth, polarisation_frame, configuration, phasecentre, source
+
+
+def _ms_time_index(time, integration_time):
+    """ Assign each MS row to an integration
+
+    A new integration starts when the time moves on by more than the integration time. Only the rows at which
+    the time changes need to be examined, so the loop is over distinct times rather than rows.
+
+    :param time: Time of each row (s)
+    :param integration_time: Integration time of each row (s)
+    :return: integration index of each row
+    """
+    if len(time) == 0:
+        return numpy.zeros([0], dtype='int')
+    starts = numpy.concatenate([[0], numpy.nonzero(numpy.diff(time) != 0.0)[0] + 1])
+    run_index = numpy.zeros(len(starts), dtype='int')
+    time_last = time[0]
+    time_index = 0
+    for run, row in enumerate(starts):
+        if time[row] > time_last + integration_time[row]:
+            assert time[row] > time_last, "MS is not time-sorted - cannot convert"
+            time_index += 1
+            time_last = time[row]
+        run_index[run] = time_index
+    return numpy.repeat(run_index, numpy.diff(numpy.append(starts, len(time))))
+
+
+def _ms_baselines(antenna1, antenna2, nants):
+    """ Find the baselines present in the MS for the compact layout
+
+    Baselines are ordered as in the square layout [antenna2, antenna1]
+
+    :param antenna1: ANTENNA1 of each row
+    :param antenna2: ANTENNA2 of each row
+    :param nants: Number of antennas
+    :return: antenna1 and antenna2 of each baseline, baseline index of each row
+    """
+    baselines, baseline_row = numpy.unique(antenna2 * nants + antenna1, return_inverse=True)
+    bv_antenna2, bv_antenna1 = numpy.divmod(baselines, nants)
+    return bv_antenna1, bv_antenna2, baseline_row
+
+
+def _scatter_ms_rows(time_index_row, ntimes, antenna1, antenna2, baseline_row, nants, time, integration_time,
+                     ms_vis, ms_weight, uvw, bv_antenna1=None):
+    """ Scatter MS rows into BlockVisibility columns
+
+    The scatter is a single fancy-indexed assignment per column: rows go to [time, baseline] in the compact layout
+    and to [time, antenna2, antenna1] in the square layout.
+
+    :param time_index_row: Integration index of each row
+    :param ntimes: Number of integrations
+    :param antenna1: ANTENNA1 of each row
+    :param antenna2: ANTENNA2 of each row
+    :param baseline_row: Baseline index of each row (compact layout only)
+    :param nants: Number of antennas
+    :param bv_antenna1: ANTENNA1 of each baseline, None for the square layout
+    :return: times, integration_time, vis, weight, imaging_weight, uvw
+    """
+    nchan, npol = ms_vis.shape[-2:]
+    if bv_antenna1 is not None:
+        index = (time_index_row, baseline_row)
+        blshape = [len(bv_antenna1)]
+    else:
+        index = (time_index_row, antenna2, antenna1)
+        blshape = [nants, nants]
+    
+    bv_times = numpy.zeros([ntimes])
+    bv_integration_time = numpy.zeros([ntimes])
+    bv_vis = numpy.zeros([ntimes] + blshape + [nchan, npol]).astype('complex')
+    bv_weight = numpy.zeros([ntimes] + blshape + [nchan, npol])
+    bv_uvw = numpy.zeros([ntimes] + blshape + [3])
+    
+    bv_times[time_index_row] = time
+    bv_integration_time[time_index_row] = integration_time
+    bv_vis[index] = ms_vis
+    bv_weight[index] = ms_weight[:, numpy.newaxis, ...]
+    bv_imaging_weight = bv_weight.copy()
+    bv_uvw[index] = uvw
+    return bv_times, bv_integration_time, bv_vis, bv_weight, bv_imaging_weight, bv_uvw
+
+
 def create_blockvisibility_from_ms(msname, channum=None, start_chan=None, end_chan=None, ack=False,
-                                   datacolumn='DATA', selected_sources=None, selected_dds=None):
+                                   datacolumn='DATA', selected_sources=None, selected_dds=None, compact=False):
     """ Minimal MS to BlockVisibility converter
 
     The MS format is much more general than the ARL BlockVisibility so we cut many corners. This requires casacore to be
@@ -533,10 +796,13 @@ def create_blockvisibility_from_ms(msname, channum=None, start_chan=None, end_ch
     and end_chan is preferred since it only reads the channels required. Channum is more flexible and can be used to
     read a random list of channels.
     
+    If compact is True, the BlockVisibility's hold only the baselines present in the MS, indexed by baseline.
+    
     :param msname: File name of MS
     :param channum: range of channels e.g. range(17,32), default is None meaning all
     :param start_chan: Starting channel to read
     :param end_chan: End channel to read
+    :param compact: Use the compact, baseline indexed layout (False)
     :return:
     """
     try:
@@ -551,20 +817,7 @@ def create_blockvisibility_from_ms(msname, channum=None, start_chan=None, end_ch
     tab = table(msname, ack=ack)
     log.debug("create_blockvisibility_from_ms: %s" % str(tab.info()))
 
-    if selected_sources is None:
-        fields = numpy.unique(tab.getcol('FIELD_ID'))
-    else:
-        fieldtab = table('%s/FIELD' % msname, ack=False)
-        sources = fieldtab.getcol('NAME')
-        fields = list()
-        for field, source in enumerate(sources):
-            if source in selected_sources: fields.append(field)
-        assert len(fields) > 0, "No sources selected"
-        
-    if selected_dds is None:
-        dds = numpy.unique(tab.getcol('DATA_DESC_ID'))
-    else:
-        dds = selected_dds
+    fields, dds = _select_ms_fields_dds(msname, tab, selected_sources, selected_dds)
         
     log.debug("create_blockvisibility_from_ms: Reading unique fields %s, unique data descriptions %s" % (
         str(fields), str(dds)))
@@ -632,74 +885,21 @@ def create_blockvisibility_from_ms(msname, channum=None, start_chan=None, end_ch
             log.debug("create_blockvisibility_from_ms: Observation from %s to %s" %
                       (Time(start_time, format='mjd').iso, Time(end_time, format='mjd').iso))
 
-            # Now get info from the subtables
-            spwtab = table('%s/SPECTRAL_WINDOW' % msname, ack=False)
-            cfrequency = spwtab.getcol('CHAN_FREQ')[dd][channum]
-            cchannel_bandwidth = spwtab.getcol('CHAN_WIDTH')[dd][channum]
-            nchan = cfrequency.shape[0]
-            
-            # Get polarisation info
-            npol = 4
-            poltab = table('%s/POLARIZATION' % msname, ack=False)
-            corr_type = poltab.getcol('CORR_TYPE')
-            # These correspond to the CASA Stokes enumerations
-            if numpy.array_equal(corr_type[0], [1, 2, 3, 4]):
-                polarisation_frame = PolarisationFrame('stokesIQUV')
-            elif numpy.array_equal(corr_type[0], [5, 6, 7, 8]):
-                polarisation_frame = PolarisationFrame('circular')
-            elif numpy.array_equal(corr_type[0], [9, 10, 11, 12]):
-                polarisation_frame = PolarisationFrame('linear')
-            elif numpy.array_equal(corr_type[0], [9]):
-                npol = 1
-                polarisation_frame = PolarisationFrame('stokesI')
-            else:
-                raise KeyError("Polarisation not understood: %s" % str(corr_type))
+            cfrequency, cchannel_bandwidth, polarisation_frame, configuration, phasecentre, source = \
+                _read_ms_subtables(msname, field, dd, channum)
+            nants = configuration.xyz.shape[0]
             
+            time_index_row = _ms_time_index(time, integration_time)
+            ntimes = numpy.max(time_index_row) + 1
             
-            # Get configuration
-            anttab = table('%s/ANTENNA' % msname, ack=False)
-            nants = anttab.nrows()
-            mount = anttab.getcol('MOUNT')
-            names = anttab.getcol('NAME')
-            diameter = anttab.getcol('DISH_DIAMETER')
-            xyz = anttab.getcol('POSITION')
-            configuration = Configuration(name='', data=None, location=None,
-                                          names=names, xyz=xyz, mount=mount, frame=None,
-                                          receptor_frame=ReceptorFrame("linear"),
-                                          diameter=diameter)
-            # Get phasecentres
-            fieldtab = table('%s/FIELD' % msname, ack=False)
-            pc = fieldtab.getcol('PHASE_DIR')[field, 0, :]
-            source = fieldtab.getcol('NAME')[field]
-            phasecentre = SkyCoord(ra=pc[0] * u.rad, dec=pc[1] * u.rad, frame='icrs', equinox='J2000')
-
-            time_index_row = numpy.zeros_like(time, dtype='int')
-            time_last = time[0]
-            time_index = 0
-            for row, _ in enumerate(time):
-                if time[row] > time_last + integration_time[row]:
-                    assert time[row] > time_last, "MS is not time-sorted - cannot convert"
-                    time_index += 1
-                    time_last = time[row]
-                time_index_row[row] = time_index
-
-            ntimes = time_index + 1
+            if compact:
+                bv_antenna1, bv_antenna2, baseline_row = _ms_baselines(antenna1, antenna2, nants)
+            else:
+                bv_antenna1, bv_antenna2, baseline_row = None, None, None
             
-            bv_times = numpy.zeros([ntimes])
-            bv_vis = numpy.zeros([ntimes, nants, nants, nchan, npol]).astype('complex')
-            bv_weight = numpy.zeros([ntimes, nants, nants, nchan, npol])
-            bv_imaging_weight = numpy.zeros([ntimes, nants, nants, nchan, npol])
-            bv_uvw = numpy.zeros([ntimes, nants, nants, 3])
-            bv_integration_time = numpy.zeros([ntimes])
-
-            for row, _ in enumerate(time):
-                time_index = time_index_row[row]
-                bv_times[time_index] = time[row]
-                bv_vis[time_index, antenna2[row], antenna1[row], ...] = ms_vis[row, ...]
-                bv_weight[time_index, antenna2[row], antenna1[row], :, ...] = ms_weight[row, numpy.newaxis, ...]
-                bv_imaging_weight[time_index, antenna2[row], antenna1[row], :, ...] = ms_weight[row, numpy.newaxis, ...]
-                bv_uvw[time_index, antenna2[row], antenna1[row], :] = uvw[row, :]
-                bv_integration_time[time_index] = integration_time[row]
+            bv_times, bv_integration_time, bv_vis, bv_weight, bv_imaging_weight, bv_uvw = \
+                _scatter_ms_rows(time_index_row, ntimes, antenna1, antenna2, baseline_row, nants, time,
+                                 integration_time, ms_vis, ms_weight, uvw, bv_antenna1)
 
             vis_list.append(BlockVisibility(uvw=bv_uvw,
                                             time=bv_times,
@@ -712,11 +912,124 @@ def create_blockvisibility_from_ms(msname, channum=None, start_chan=None, end_ch
                                             configuration=configuration,
                                             phasecentre=phasecentre,
                                             polarisation_frame=polarisation_frame,
-                                            source=source, meta=meta))
+                                            source=source, meta=meta,
+                                            antenna1=bv_antenna1, antenna2=bv_antenna2))
         tab.close()
     return vis_list
 
 
+def iterate_blockvisibility_from_ms(msname, time_chunk=1, channum=None, start_chan=None, end_chan=None, ack=False,
+                                    datacolumn='DATA', selected_sources=None, selected_dds=None, compact=False):
+    """ Iterate through an MS, yielding one BlockVisibility per chunk of integrations
+
+    This is a streaming form of create_blockvisibility_from_ms: only the TIME, INTERVAL, ANTENNA1 and ANTENNA2 columns
+    are read in full, the data, weight and uvw columns are read in fixed row ranges of time_chunk integrations. The
+    MS must be time-sorted.
+
+    For example::
+
+        for bvis in iterate_blockvisibility_from_ms(msname, time_chunk=10):
+            bvis = apply_gaintable(bvis, gt)
+
+    :param msname: File name of MS
+    :param time_chunk: Number of integrations in each BlockVisibility
+    :param channum: range of channels e.g. range(17,32), default is None meaning all
+    :param start_chan: Starting channel to read
+    :param end_chan: End channel to read
+    :param datacolumn: Column to read as the visibility ('DATA')
+    :param selected_sources: Names of sources to select, default is None meaning all
+    :param selected_dds: Data descriptions to select, default is None meaning all
+    :param compact: Use the compact, baseline indexed layout (False)
+    :return: Generator of BlockVisibility
+    """
+    try:
+        from casacore.tables import table  # pylint: disable=import-error
+    except ModuleNotFoundError:
+        raise ModuleNotFoundError("casacore is not installed")
+    
+    assert time_chunk > 0, "time_chunk must be positive"
+
+    tab = table(msname, ack=ack)
+    fields, dds = _select_ms_fields_dds(msname, tab, selected_sources, selected_dds)
+    
+    for field in fields:
+        ftab = table(msname, ack=ack).query('FIELD_ID==%d' % field, style='')
+        for dd in dds:
+            meta = {'MSV2': {'FIELD_ID': field, 'DATA_DESC_ID': dd}}
+            ms = ftab.query('DATA_DESC_ID==%d' % dd, style='')
+            assert ms.nrows() > 0, "Empty selection for FIELD_ID=%d and DATA_DESC_ID=%d" % (field, dd)
+            
+            datacol_shape = list(ms.getcol(datacolumn, nrow=1).shape)
+            if channum is not None:
+                chans = numpy.array(channum)
+                blc, trc = None, None
+            elif start_chan is not None and end_chan is not None:
+                chans = numpy.arange(start_chan, end_chan + 1)
+                blc, trc = [start_chan, 0], [end_chan, datacol_shape[-1] - 1]
+            else:
+                chans = numpy.arange(datacol_shape[-2])
+                blc, trc = None, None
+            if numpy.max(chans) >= datacol_shape[-2]:
+                raise IndexError("channel number exceeds max. within ms")
+            
+            cfrequency, cchannel_bandwidth, polarisation_frame, configuration, phasecentre, source = \
+                _read_ms_subtables(msname, field, dd, chans)
+            nants = configuration.xyz.shape[0]
+            
+            integration_time = ms.getcol('INTERVAL')
+            time = ms.getcol('TIME') - integration_time / 2.0
+            antenna1 = ms.getcol('ANTENNA1')
+            antenna2 = ms.getcol('ANTENNA2')
+            time_index_row = _ms_time_index(time, integration_time)
+            
+            if compact:
+                bv_antenna1, bv_antenna2, baseline_row = _ms_baselines(antenna1, antenna2, nants)
+            else:
+                bv_antenna1, bv_antenna2, baseline_row = None, None, None
+            
+            # Row ranges holding time_chunk integrations each
+            ntimes = time_index_row[-1] + 1
+            row_edges = numpy.searchsorted(time_index_row, numpy.arange(0, ntimes + time_chunk, time_chunk))
+            row_edges = numpy.minimum(row_edges, ms.nrows())
+            log.debug("iterate_blockvisibility_from_ms: reading %d integrations in chunks of %d" %
+                      (ntimes, time_chunk))
+            
+            for startrow, endrow in zip(row_edges[:-1], row_edges[1:]):
+                nrow = int(endrow - startrow)
+                if nrow == 0:
+                    continue
+                startrow = int(startrow)
+                rows = slice(startrow, startrow + nrow)
+                if blc is not None:
+                    ms_vis = ms.getcolslice(datacolumn, blc=blc, trc=trc, startrow=startrow, nrow=nrow)
+                else:
+                    ms_vis = ms.getcol(datacolumn, startrow=startrow, nrow=nrow)[:, chans, :]
+                ms_weight = ms.getcol('WEIGHT', startrow=startrow, nrow=nrow)
+                uvw = -1 * ms.getcol('UVW', startrow=startrow, nrow=nrow)
+                
+                chunk_time_index = time_index_row[rows] - time_index_row[startrow]
+                chunk_baseline_row = None if baseline_row is None else baseline_row[rows]
+                bv_times, bv_integration_time, bv_vis, bv_weight, bv_imaging_weight, bv_uvw = \
+                    _scatter_ms_rows(chunk_time_index, chunk_time_index[-1] + 1, antenna1[rows], antenna2[rows],
+                                     chunk_baseline_row, nants, time[rows], integration_time[rows], ms_vis,
+                                     ms_weight, uvw, bv_antenna1)
+                
+                yield BlockVisibility(uvw=bv_uvw,
+                                      time=bv_times,
+                                      frequency=cfrequency,
+                                      channel_bandwidth=cchannel_bandwidth,
+                                      vis=bv_vis,
+                                      weight=bv_weight,
+                                      integration_time=bv_integration_time,
+                                      imaging_weight=bv_imaging_weight,
+                                      configuration=configuration,
+                                      phasecentre=phasecentre,
+                                      polarisation_frame=polarisation_frame,
+                                      source=source, meta=copy.deepcopy(meta),
+                                      antenna1=bv_antenna1, antenna2=bv_antenna2)
+    tab.close()
+
+
 def create_visibility_from_ms(msname, channum=None, start_chan=None, end_chan=None,  ack=False):
     """ Minimal MS to BlockVisibility converter
 
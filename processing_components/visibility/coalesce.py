@@ -2,7 +2,8 @@
 Functions for visibility coalescence and decoalescence.
 
 The BlockVisibility format describes the visibility
-data_models as it would come from the correlator: [time, ant2, ant1, channel, pol]. This is well-suited to
+data_models as it would come from the correlator: [time, ant2, ant1, channel, pol], or [time, baseline, channel, pol]
+in the compact layout. This is well-suited to
 calibration and some visibility processing such as continuum removal. However the BlockVisibility format
 is vastly oversampled on the short spacings where the visibility (after calibration) varies slowly compared to
 the longest baselines. The coalescence operation resamples the visibility at a rate inversely proportional
@@ -22,8 +23,6 @@ import numpy
 
 from astropy import constants
 
-from processing_library.util.array_functions import average_chunks, average_chunks2
-
 from data_models.memory_data_models import Visibility, BlockVisibility
 from data_models.parameters import get_parameter
 
@@ -63,7 +62,7 @@ def coalesce_visibility(vis: BlockVisibility, **kwargs) -> Visibility:
         = average_in_blocks(vis.data['vis'], vis.data['uvw'], vis.data['weight'], vis.data['imaging_weight'],
                             vis.time, vis.integration_time,
                             vis.frequency, vis.channel_bandwidth, time_coal, max_time_coal,
-                            frequency_coal, max_frequency_coal)
+                            frequency_coal, max_frequency_coal, antenna1=vis.antenna1, antenna2=vis.antenna2)
     coalesced_vis = Visibility(uvw=cuvw, time=ctime, frequency=cfrequency,
                                channel_bandwidth=cchannel_bandwidth,
                                phasecentre=vis.phasecentre, antenna1=ca1, antenna2=ca2, vis=cvis,
@@ -94,7 +93,7 @@ def convert_blockvisibility_to_visibility(vis: BlockVisibility) -> Visibility:
     cvis, cuvw, cwts, cimaging_wts, ctime, cfrequency, cchannel_bandwidth, ca1, ca2, cintegration_time, cindex \
         = convert_blocks(vis.data['vis'], vis.data['uvw'], vis.data['weight'], vis.data['imaging_weight'],
                          vis.time, vis.integration_time,
-                         vis.frequency, vis.channel_bandwidth)
+                         vis.frequency, vis.channel_bandwidth, antenna1=vis.antenna1, antenna2=vis.antenna2)
     converted_vis = Visibility(uvw=cuvw, time=ctime, frequency=cfrequency,
                                channel_bandwidth=cchannel_bandwidth,
                                phasecentre=vis.phasecentre, antenna1=ca1, antenna2=ca2, vis=cvis,
@@ -127,14 +126,16 @@ def decoalesce_visibility(vis: Visibility, **kwargs) -> BlockVisibility:
 
     vshape = decomp_vis.data['vis'].shape
 
-    npol = vshape[-1]
-    dvis = numpy.zeros(vshape, dtype='complex')
-    assert numpy.max(vis.cindex) < dvis.size
+    ntimes, npol = vshape[0], vshape[-1]
+    assert vis.cindex.size * npol == numpy.prod(vshape), "Incorrect template used in decoalescing"
     assert numpy.max(vis.cindex) < vis.vis.shape[0], "Incorrect template used in decoalescing"
-    for i in range(dvis.size // npol):
-        decomp_vis.data['vis'].flat[i:i + npol] = vis.data['vis'][vis.cindex[i]]
-        decomp_vis.data['weight'].flat[i:i + npol] = vis.data['weight'][vis.cindex[i]]
-        decomp_vis.data['imaging_weight'].flat[i:i + npol] = vis.data['imaging_weight'][vis.cindex[i]]
+    # Gather the rows straight into the columns of the BlockVisibility. Each time is one record, so the columns
+    # can be viewed (without a copy, else setting the shape fails) as [ntimes, samples per time, npol].
+    rows = vis.cindex.reshape([ntimes, -1])
+    for column in ['vis', 'weight', 'imaging_weight']:
+        out = decomp_vis.data[column].view()
+        out.shape = (ntimes, rows.shape[1], npol)
+        numpy.take(vis.data[column], rows, axis=0, mode='clip', out=out)
 
     log.debug('decoalesce_visibility: Coalesced %s, decoalesced %s' % (vis_summary(vis),
                                                                        vis_summary(
@@ -144,9 +145,13 @@ def decoalesce_visibility(vis: Visibility, **kwargs) -> BlockVisibility:
 
 
 def average_in_blocks(vis, uvw, wts, imaging_wts, times, integration_time, frequency, channel_bandwidth,
-                      time_coal=1.0, max_time_coal=100, frequency_coal=1.0, max_frequency_coal=100):
+                      time_coal=1.0, max_time_coal=100, frequency_coal=1.0, max_frequency_coal=100,
+                      antenna1=None, antenna2=None):
     """ Average visibility in blocks
     
+    The block is either in the square layout [ntimes, nant, nant, ...] or, if antenna1 and antenna2 are
+    given, in the compact layout [ntimes, nbaselines, ...].
+    
     :param vis:
     :param uvw:
     :param wts:
@@ -159,6 +164,8 @@ def average_in_blocks(vis, uvw, wts, imaging_wts, times, integration_time, frequ
     :param max_time_coal:
     :param frequency_coal:
     :param max_frequency_coal:
+    :param antenna1: First antenna of each baseline for the compact layout
+    :param antenna2: Second antenna of each baseline for the compact layout
     :return:
     """
     # Calculate the averaging factors for time and frequency making them the same for all times
@@ -166,57 +173,33 @@ def average_in_blocks(vis, uvw, wts, imaging_wts, times, integration_time, frequ
     # Find the maximum possible baseline and then scale to this.
 
     # The input visibility is a block of shape [ntimes, nant, nant, nchan, npol]. We will map this
-    # into rows like vis[npol] and with additional columns antenna1, antenna2, frequency
-
-    ntimes, nant, _, nchan, npol = vis.shape
+    # into rows like vis[npol] and with additional columns antenna1, antenna2, frequency. The square
+    # layout is treated as nant * nant baselines ordered as [a2, a1].
+    vis, uvw, wts, imaging_wts, antenna1, antenna2 = \
+        _blocks_by_baseline(vis, uvw, wts, imaging_wts, antenna1, antenna2)
+    
+    ntimes, nbaselines, nchan, npol = vis.shape
 
     times.dtype = numpy.float64
 
-    # Original
     # Pol independent weighting
-    # allpwtsgrid = numpy.sum(wts, axis=4)
-    # # Pol and frequency independent weighting
-    # allcpwtsgrid = numpy.sum(allpwtsgrid, axis=3)
-    # # Pol and time independent weighting
-    # alltpwtsgrid = numpy.sum(allpwtsgrid, axis=0)
-
-    # Optimized
-    allpwtsgrid = numpy.einsum('ijklm->ijkl', wts, optimize=True)
-    allcpwtsgrid = numpy.einsum('ijkl->ijk', allpwtsgrid, optimize=True)
-    alltpwtsgrid = numpy.einsum('ijkl->jkl', allpwtsgrid, optimize=True)
+    allpwtsgrid = numpy.einsum('ijkl->ijk', wts, optimize=True)
 
     # Now calculate on a baseline basis the time and frequency averaging. We do this by looking at
     # the maximum uv distance for all data and for a given baseline. The integration time and
     # channel bandwidth are scale appropriately.
-    time_average = numpy.ones([nant, nant], dtype='int')
-    frequency_average = numpy.ones([nant, nant], dtype='int')
-    ua = numpy.arange(nant)
-
-    # Original
-    # uvmax = numpy.sqrt(numpy.max(uvw[..., 0] ** 2 + uvw[..., 1] ** 2 + uvw[..., 2] ** 2))
-    # for a2 in ua:
-    #     for a1 in ua:
-    #         if allpwtsgrid[:, a2, a1, :].any() > 0.0:
-    #             uvdist = numpy.max(numpy.sqrt(uvw[:, a2, a1, 0] ** 2 + uvw[:, a2, a1, 1] ** 2), axis=0)
-    #             if uvdist > 0.0:
-    #                 time_average[a2, a1] = min(max_time_coal,
-    #                                            max(1, int(round((time_coal * uvmax / uvdist)))))
-    #                 frequency_average[a2, a1] = min(max_frequency_coal,
-    #                                                 max(1, int(round(frequency_coal * uvmax / uvdist))))
-    #             else:
-    #                 time_average[a2, a1] = max_time_coal
-    #                 frequency_average[a2, a1] = max_frequency_coal
+    time_average = numpy.ones([nbaselines], dtype='int')
+    frequency_average = numpy.ones([nbaselines], dtype='int')
 
     # Optimized
     # Calculate uvdist instead of uvwdist
     uvwd = uvw[..., 0:2]
-    uvdist = numpy.einsum('ijkm,ijkm->ijk', uvwd, uvwd, optimize=True)
+    uvdist = numpy.einsum('ijm,ijm->ij', uvwd, uvwd, optimize=True)
     uvmax = numpy.sqrt(numpy.max(uvdist))
 
-    # uvdist = numpy.sqrt(numpy.einsum('ijkm,ijkm->ijk', uvw, uvw, optimize=True))
     uvdist_max = numpy.sqrt(numpy.max(uvdist, axis=0))
 
-    allpwtsgrid_bool = numpy.einsum('ijklm->jk', wts, optimize=True)
+    allpwtsgrid_bool = numpy.einsum('ijkl->j', wts, optimize=True)
     mask = numpy.where(uvdist_max > 0.)
     mask0 = numpy.where(uvdist_max <= 0.)
     time_average[mask] = numpy.round((time_coal * uvmax / uvdist_max[mask]))
@@ -232,26 +215,14 @@ def average_in_blocks(vis, uvw, wts, imaging_wts, times, integration_time, frequ
     numpy.putmask(frequency_average, frequency_average < 1, 1)
     numpy.putmask(frequency_average, frequency_average > max_frequency_coal, max_frequency_coal)
 
-    # See how many time chunks and frequency we need for each baseline. To do this we use the same averaging that
-    # we will use later for the actual data_models. This tells us the number of chunks required for each baseline.
-    frequency_grid, time_grid = numpy.meshgrid(frequency, times)
-    channel_bandwidth_grid, integration_time_grid = numpy.meshgrid(channel_bandwidth, integration_time)
-    cnvis = 0
-    time_chunk_len = numpy.ones([nant, nant], dtype='int')
-    frequency_chunk_len = numpy.ones([nant, nant], dtype='int')
-
-    for a2 in ua:
-        for a1 in ua:
-            if (time_average[a2, a1] > 0) & (frequency_average[a2, a1] > 0 & (allpwtsgrid[:, a2, a1, ...].any() > 0.0)):
-                time_chunks, _ = average_chunks(times, allcpwtsgrid[:, a2, a1], time_average[a2, a1])
-                time_chunk_len[a2, a1] = time_chunks.shape[0]
-                frequency_chunks, _ = average_chunks(frequency, alltpwtsgrid[a2, a1, :], frequency_average[a2, a1])
-                frequency_chunk_len[a2, a1] = frequency_chunks.shape[0]
-                nrows = time_chunk_len[a2, a1] * frequency_chunk_len[a2, a1]
-                cnvis += nrows
-
-    # Now we know enough to define the output coalesced arrays. The output will be
-    # successive a1, a2: [len_time_chunks[a2,a1], a2, a1, len_frequency_chunks[a2,a1]]
+    # Every baseline is averaged into ceil(ntimes / time_average) by ceil(nchan / frequency_average) rows. The
+    # output holds successive baselines, each ordered as [time chunk, frequency chunk].
+    time_chunk_len = (ntimes + time_average - 1) // time_average
+    frequency_chunk_len = (nchan + frequency_average - 1) // frequency_average
+    nrows = time_chunk_len * frequency_chunk_len
+    visstart = numpy.cumsum(nrows) - nrows
+    cnvis = int(numpy.sum(nrows))
+
     ctime = numpy.zeros([cnvis])
     cfrequency = numpy.zeros([cnvis])
     cchannel_bandwidth = numpy.zeros([cnvis])
@@ -259,78 +230,85 @@ def average_in_blocks(vis, uvw, wts, imaging_wts, times, integration_time, frequ
     cwts = numpy.zeros([cnvis, npol])
     cimwts = numpy.zeros([cnvis, npol])
     cuvw = numpy.zeros([cnvis, 3])
-    ca1 = numpy.zeros([cnvis], dtype='int')
-    ca2 = numpy.zeros([cnvis], dtype='int')
+    ca1 = numpy.repeat(antenna1, nrows)
+    ca2 = numpy.repeat(antenna2, nrows)
     cintegration_time = numpy.zeros([cnvis])
 
-    # For decoalescence we keep an index to map back to the original BlockVisibility
-    rowgrid = numpy.zeros([ntimes, nant, nant, nchan], dtype='int')
-    rowgrid.flat = range(rowgrid.size)
-
-    cindex = numpy.zeros([rowgrid.size], dtype='int')
-
-    # Now go through, chunking up the various arrays. Everything is converted into an array with
-    # axes [time, channel] and then it is averaged over time and frequency chunks for
-    # this baseline.
-    # To aid decoalescence we will need an index of which output elements a given input element
-    # contributes to. This is a many to one. The decoalescence will then just consist of using
-    # this index to extract the coalesced value that a given input element contributes towards.
-
-    visstart = 0
-    for a2 in ua:
-        for a1 in ua:
-            nrows = time_chunk_len[a2, a1] * frequency_chunk_len[a2, a1]
-            rows = slice(visstart, visstart + nrows)
-
-            cindex.flat[rowgrid[:, a2, a1, :]] = numpy.array(range(visstart, visstart + nrows))
-
-            ca1[rows] = a1
-            ca2[rows] = a2
-
-            # Average over time and frequency for case where polarisation isn't an issue
-            def average_from_grid(arr):
-                return average_chunks2(arr, allpwtsgrid[:, a2, a1, :],
-                                       (time_average[a2, a1], frequency_average[a2, a1]))[0]
-
-            ctime[rows] = average_from_grid(time_grid).flatten()
-            cfrequency[rows] = average_from_grid(frequency_grid).flatten()
+    # For decoalescence we keep an index to map back to the original BlockVisibility: each input element
+    # [time, baseline, channel] points to the output row it was averaged into.
+    time_chunk = numpy.arange(ntimes)[:, numpy.newaxis] // time_average[numpy.newaxis, :]
+    frequency_chunk = numpy.arange(nchan)[numpy.newaxis, :] // frequency_average[:, numpy.newaxis]
+    cindex = (visstart + time_chunk * frequency_chunk_len)[..., numpy.newaxis] + frequency_chunk[numpy.newaxis, ...]
+    cindex = cindex.flatten()
+
+    # Baselines with the same averaging factors are averaged together, as blocks of
+    # [time chunks, baselines, frequency chunks, ...]
+    factors = numpy.stack([time_average, frequency_average], axis=1)
+    for ta, fa in numpy.unique(factors, axis=0):
+        bls = numpy.nonzero((time_average == ta) & (frequency_average == fa))[0]
+        l0 = time_chunk_len[bls[0]]
+        l1 = frequency_chunk_len[bls[0]]
+        rows = visstart[bls][numpy.newaxis, :, numpy.newaxis] + \
+               l1 * numpy.arange(l0)[:, numpy.newaxis, numpy.newaxis] + numpy.arange(l1)
+
+        blwts = wts[:, bls, ...]
+        cvis[rows, :], cwts[rows, :] = _average_blocks(vis[:, bls, ...], blwts, ta, fa)
+        cimwts[rows, :] = _average_blocks(imaging_wts[:, bls, ...], blwts, ta, fa)[0]
+
+        # Pol independent weighting for the remaining columns
+        pwts = allpwtsgrid[:, bls, :]
+        ctime[rows] = _average_blocks(times[:, numpy.newaxis, numpy.newaxis], pwts, ta, fa)[0]
+        cfrequency[rows] = _average_blocks(frequency[numpy.newaxis, numpy.newaxis, :], pwts, ta, fa)[0]
+        uvwgrid = uvw[:, bls, numpy.newaxis, :] * (frequency / constants.c.value)[:, numpy.newaxis]
+        cuvw[rows, :] = _average_blocks(uvwgrid, pwts[..., numpy.newaxis], ta, fa)[0]
+
+        # For these we need the sum not the average. As before, this is taken as the average times the number
+        # of rows for the baseline.
+        cintegration_time[rows] = l0 * l1 * \
+                                  _average_blocks(integration_time[:, numpy.newaxis, numpy.newaxis], pwts, ta, fa)[0]
+        cchannel_bandwidth[rows] = l0 * l1 * \
+                                   _average_blocks(channel_bandwidth[numpy.newaxis, numpy.newaxis, :], pwts, ta, fa)[0]
 
-            for axis in range(3):
-                uvwgrid = numpy.outer(uvw[:, a2, a1, axis], frequency / constants.c.value)
-                cuvw[rows, axis] = average_from_grid(uvwgrid).flatten()
+    return cvis, cuvw, cwts, cimwts, ctime, cfrequency, cchannel_bandwidth, ca1, ca2, cintegration_time, cindex
 
-            # For some variables, we need the sum not the average
-            def sum_from_grid(arr):
-                result = average_chunks2(arr, allpwtsgrid[:, a2, a1, :],
-                                         (time_average[a2, a1], frequency_average[a2, a1]))
-                return result[0] * result[0].size
 
-            cintegration_time[rows] = sum_from_grid(integration_time_grid).flatten()
-            cchannel_bandwidth[rows] = sum_from_grid(channel_bandwidth_grid).flatten()
+def _average_blocks(arr, wts, time_average, frequency_average):
+    """ Weighted average of arr over blocks of time_average times and frequency_average channels
 
-            # For the polarisations we have to perform the time-frequency average separately for each polarisation
-            for pol in range(npol):
-                result = average_chunks2(vis[:, a2, a1, :, pol], wts[:, a2, a1, :, pol],
-                                         (time_average[a2, a1], frequency_average[a2, a1]))
-                cvis[rows, pol], cwts[rows, pol] = result[0].flatten(), result[1].flatten()
+    This is the same as average_chunks2 applied to each baseline: the arrays are [ntimes, nbaselines, nchan, ...]
+    and the last blocks may be short. Blocks with no weight hold the weighted sum, and with no averaging the values
+    are returned unchanged.
 
-            # Now do the imaging weights
-            for pol in range(npol):
-                result = average_chunks2(imaging_wts[:, a2, a1, :, pol], wts[:, a2, a1, :, pol],
-                                         (time_average[a2, a1], frequency_average[a2, a1]))
-                cimwts[rows, pol] = result[0].flatten()
+    :param arr: Values, broadcast against wts
+    :param wts: Weights, with arr [ntimes, nbaselines, nchan, ...]
+    :param time_average: Number of times in a block
+    :param frequency_average: Number of channels in a block
+    :return: averaged values, summed weights, both [ntimes chunks, nbaselines, nchan chunks, ...]
+    """
+    arr, wts = numpy.broadcast_arrays(arr, wts)
+    if time_average <= 1 and frequency_average <= 1:
+        return arr, wts
 
-            visstart += nrows
+    def block_sum(a):
+        if time_average > 1:
+            a = numpy.add.reduceat(a, numpy.arange(0, a.shape[0], time_average), axis=0)
+        if frequency_average > 1:
+            a = numpy.add.reduceat(a, numpy.arange(0, a.shape[2], frequency_average), axis=2)
+        return a
 
-    assert cnvis == visstart, "Mismatch between number of rows in coalesced visibility %d and index %d" % \
-                              (cnvis, visstart)
+    weights = block_sum(wts)
+    chunks = block_sum(wts * arr)
+    numpy.divide(chunks, weights, out=chunks, where=weights > 0.0)
+    return chunks, weights
 
-    return cvis, cuvw, cwts, cimwts, ctime, cfrequency, cchannel_bandwidth, ca1, ca2, cintegration_time, cindex
 
-
-def convert_blocks(vis, uvw, wts, imaging_wts, times, integration_time, frequency, channel_bandwidth):
+def convert_blocks(vis, uvw, wts, imaging_wts, times, integration_time, frequency, channel_bandwidth,
+                   antenna1=None, antenna2=None):
     """ Convert with no averaging
     
+    The block is either in the square layout [ntimes, nant, nant, ...] or, if antenna1 and antenna2 are
+    given, in the compact layout [ntimes, nbaselines, ...]. Only baselines with antenna2 > antenna1 are kept.
+    
     :param vis:
     :param uvw:
     :param wts:
@@ -339,110 +317,67 @@ def convert_blocks(vis, uvw, wts, imaging_wts, times, integration_time, frequenc
     :param integration_time:
     :param frequency:
     :param channel_bandwidth:
+    :param antenna1: First antenna of each baseline for the compact layout
+    :param antenna2: Second antenna of each baseline for the compact layout
     :return:
     """
-    # The input visibility is a block of shape [ntimes, nant, nant, nchan, npol]. We will map this
+    # The input visibility is a block of shape [ntimes, nbaselines, nchan, npol]. We will map this
     # into rows like vis[npol] and with additional columns antenna1, antenna2, frequency
+    vis, uvw, wts, imaging_wts, antenna1, antenna2 = \
+        _blocks_by_baseline(vis, uvw, wts, imaging_wts, antenna1, antenna2)
 
-    ntimes, nant, _, nchan, npol = vis.shape
+    ntimes, nbaselines, nchan, npol = vis.shape
     assert nchan == len(frequency)
 
-    cnvis = ntimes * nant * (nant - 1) * nchan // 2
-
-    # Now we know enough to define the output coalesced arrays. The shape will be
-    # succesive a1, a2: [len_time_chunks[a2,a1], a2, a1, len_frequency_chunks[a2,a1]]
-    # ctime1 = numpy.zeros([cnvis])
-    # cfrequency1 = numpy.zeros([cnvis])
-    # cchannel_bandwidth1 = numpy.zeros([cnvis])
-    # cvis1 = numpy.zeros([cnvis, npol], dtype='complex')
-    # cwts1 = numpy.zeros([cnvis, npol])
-    # cimaging_weights1 = numpy.ones([cnvis, npol])
-    # cuvw1 = numpy.zeros([cnvis, 3])
-    # cintegration_time1 = numpy.zeros([cnvis])
-
-    ca1 = numpy.zeros([cnvis], dtype='int')
-    ca2 = numpy.zeros([cnvis], dtype='int')
-
-    # ctime = numpy.zeros([cnvis])
-    # cfrequency = numpy.zeros([cnvis])
-    # cchannel_bandwidth = numpy.zeros([cnvis])
-    # cvis = numpy.zeros([cnvis, npol], dtype='complex')
-    # cwts = numpy.zeros([cnvis, npol])
-    # cimaging_weights = numpy.ones([cnvis, npol])
-    # cuvw = numpy.zeros([cnvis, 3])
-    # cintegration_time = numpy.zeros([cnvis])
+    # Select the baselines a2 > a1 i.e. the lower triangle of the square layout
+    blmask = antenna2 > antenna1
+    nbl = numpy.sum(blmask)
+    cnvis = ntimes * nbl * nchan
 
     # For decoalescence we keep an index to map back to the original BlockVisibility
-    rowgrid = numpy.zeros([ntimes, nant, nant, nchan], dtype='int')
-
+    rowgrid = numpy.zeros([ntimes, nbaselines, nchan], dtype='int')
     rowgrid.flat = range(rowgrid.size)
 
     cindex = numpy.zeros([rowgrid.size], dtype='int')
+    cindex.flat[rowgrid[:, blmask, :].flatten()] = range(cnvis)
+
+    # The rows are ordered by time, baseline, channel
+    ca1 = numpy.tile(numpy.repeat(antenna1[blmask], nchan), ntimes)
+    ca2 = numpy.tile(numpy.repeat(antenna2[blmask], nchan), ntimes)
 
-    mask_rowgrid = numpy.zeros_like(rowgrid, dtype='bool')
-    mask_uvw = numpy.zeros_like(uvw, dtype='bool')
-    mask_vis = numpy.zeros_like(vis, dtype='bool')
-    mask_wts = numpy.zeros_like(wts, dtype='bool')
-    mask_imaging_wts = numpy.zeros_like(imaging_wts, dtype='bool')
-    # Now go through, chunking up the various arrays. Everything is converted into an array with
-    # axes [time, channel] and then it is averaged over time and frequency chunks for
-    # this baseline.
-    # To aid decoalescence we will need an index of which output elements a given input element
-    # contributes to. This is a many to one. The decoalescence will then just consist of using
-    # this index to extract the coalesced value that a given input element contributes towards.
-    # row = 0
-    # for itime in range(ntimes):
-    #     for a1 in range(nant):
-    #         for a2 in range(a1 + 1, nant):
-    #             for chan in range(nchan):
-    #                 ca1[row] = a1
-    #                 ca2[row] = a2
-    #                 cfrequency[row] = frequency[chan]
-    #                 ctime[row] = times[itime]
-    #
-    #                 cuvw[row, :] = uvw[itime, a2, a1, :] * frequency[chan] / constants.c.value
-    #
-    #                 cindex.flat[rowgrid[itime, a2, a1, chan]] = row
-    #                 cintegration_time[row] = integration_time[itime]
-    #                 cchannel_bandwidth[row] = channel_bandwidth[chan]
-    #                 cvis[row, :] = vis[itime, a2, a1, chan, :]
-    #                 cwts[row, :] = wts[itime, a2, a1, chan, :]
-    #                 cimaging_weights[row, :] = imaging_wts[itime, a2, a1, chan, :]
-    #                 row += 1
-
-    for a1 in range(nant):
-        for a2 in range(a1 + 1, nant):
-            mask_uvw[:, a2, a1, :] = True
-            mask_vis[:, a2, a1, :, :] = True
-            mask_wts[:, a2, a1, :, :] = True
-            mask_imaging_wts[:, a2, a1, :, :] = True
-            mask_rowgrid[:, a2, a1, :] = True
-
-    rowgrid_mask = numpy.argwhere(mask_rowgrid == True)
-    # uvw_mask.flat = range(len(uvw_mask))
-    ca2 = rowgrid_mask[:, 1]
-    ca1 = rowgrid_mask[:, 2]
-
-    # Recalcute the position
-    cindex.flat[rowgrid[rowgrid_mask[:, 0], rowgrid_mask[:, 1], rowgrid_mask[:, 2], rowgrid_mask[:, 3]]] = range(cnvis)
-
-    cfrequency = numpy.tile(frequency, ntimes * nant * (nant - 1) // 2)
-    cchannel_bandwidth = numpy.tile(channel_bandwidth, ntimes * nant * (nant - 1) // 2)
-
-    ctime = numpy.repeat(times, nchan * nant * (nant - 1) // 2)
-    cintegration_time = numpy.repeat(integration_time, nchan * nant * (nant - 1) // 2)
-
-    cuvw = (numpy.tile(uvw[mask_uvw].reshape(-1, 3), nchan)).reshape(-1, 3)
+    cfrequency = numpy.tile(frequency, ntimes * nbl)
+    cchannel_bandwidth = numpy.tile(channel_bandwidth, ntimes * nbl)
+
+    ctime = numpy.repeat(times, nchan * nbl)
+    cintegration_time = numpy.repeat(integration_time, nchan * nbl)
+
+    cuvw = (numpy.tile(uvw[:, blmask, :].reshape(-1, 3), nchan)).reshape(-1, 3)
     freq = numpy.repeat(cfrequency, 3).reshape(-1, 3)
     cuvw[..., :] *= freq[:] / constants.c.value
 
-    cvis = vis[mask_vis].reshape(-1, npol)
-    cwts = wts[mask_wts].reshape(-1, npol)
-    cimaging_weights = imaging_wts[mask_imaging_wts].reshape(-1, npol)
+    cvis = vis[:, blmask, ...].reshape(-1, npol)
+    cwts = wts[:, blmask, ...].reshape(-1, npol)
+    cimaging_weights = imaging_wts[:, blmask, ...].reshape(-1, npol)
 
     return cvis, cuvw, cwts, cimaging_weights, ctime, cfrequency, cchannel_bandwidth, ca1, ca2, \
            cintegration_time, cindex
 
+
+def _blocks_by_baseline(vis, uvw, wts, imaging_wts, antenna1=None, antenna2=None):
+    """ Present blocks as [ntimes, nbaselines, ...] together with the antennas of each baseline
+
+    The square layout [ntimes, nant, nant, ...] is reshaped so that baseline a2 * nant + a1 holds [a2, a1].
+    """
+    if antenna1 is not None:
+        return vis, uvw, wts, imaging_wts, antenna1, antenna2
+
+    ntimes, nant, _, nchan, npol = vis.shape
+    antenna2, antenna1 = numpy.divmod(numpy.arange(nant * nant), nant)
+    return vis.reshape([ntimes, nant * nant, nchan, npol]), uvw.reshape([ntimes, nant * nant, 3]), \
+           wts.reshape([ntimes, nant * nant, nchan, npol]), \
+           imaging_wts.reshape([ntimes, nant * nant, nchan, npol]), antenna1, antenna2
+
+
 def convert_visibility_to_blockvisibility(vis: Visibility) -> BlockVisibility:
     """ Convert a Visibility to equivalent BlockVisibility format
 
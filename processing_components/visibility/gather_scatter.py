@@ -16,21 +16,25 @@ from typing import List
 import numpy
 
 from data_models.memory_data_models import Visibility, BlockVisibility
-from ..visibility.base import create_visibility_from_rows
+from ..visibility.base import create_visibility_from_rows, number_of_rows
 from ..visibility.iterators import vis_timeslice_iter, vis_wslice_iter
 
 log = logging.getLogger(__name__)
 
 
-def visibility_scatter(vis: Visibility, vis_iter, vis_slices=1) -> List[Visibility]:
+def visibility_scatter(vis: Visibility, vis_iter, vis_slices=1, view=False) -> List[Visibility]:
     """Scatter a visibility into a list of subvisibilities
     
     If vis_iter is over time then the type of the outvisibilities will be the same as inout
     If vis_iter is over w then the type of the output visibilities will always be Visibility
+    
+    The rows of each slice are found by sorting the times or w once. If view is True and the visibility is
+    already sorted, the subvisibilities are views of vis rather than copies.
 
     :param vis: Visibility
     :param vis_iter: visibility iterator
     :param vis_slices: Number of slices to be made
+    :param view: Make the subvisibilities views of vis where possible (False)
     :return: list of subvisibilitys
     """
     
@@ -40,8 +44,8 @@ def visibility_scatter(vis: Visibility, vis_iter, vis_slices=1) -> List[Visibili
         return [vis]
     
     visibility_list = list()
-    for i, rows in enumerate(vis_iter(vis, vis_slices=vis_slices)):
-        subvis = create_visibility_from_rows(vis, rows)
+    for i, rows in enumerate(vis_iter(vis, vis_slices=vis_slices, indices=True)):
+        subvis = create_visibility_from_rows(vis, rows, view=view)
         visibility_list.append(subvis)
     
     return visibility_list
@@ -65,16 +69,13 @@ def visibility_gather(visibility_list: List[Visibility], vis: Visibility, vis_it
     if vis_slices is None:
         vis_slices = len(visibility_list)
     
-    rowses = []
-    for i, rows in enumerate(vis_iter(vis, vis_slices=vis_slices)):
-        rowses.append(rows)
-
-    for i, rows in enumerate(rowses):
+    for i, rows in enumerate(vis_iter(vis, vis_slices=vis_slices, indices=True)):
         assert i < len(visibility_list), "Gather not consistent with scatter for slice %d" % i
-        if visibility_list[i] is not None and numpy.sum(rows):
-            assert numpy.sum(rows) == visibility_list[i].nvis, \
+        nrows = number_of_rows(rows, vis.nvis)
+        if visibility_list[i] is not None and nrows:
+            assert nrows == visibility_list[i].nvis, \
                 "Mismatch in number of rows (%d, %d) in gather for slice %d" % \
-            (numpy.sum(rows), visibility_list[i].nvis, i)
+            (nrows, visibility_list[i].nvis, i)
             vis.data[rows] = visibility_list[i].data[...]
     
     return vis
@@ -106,7 +107,7 @@ def visibility_scatter_channel(vis: BlockVisibility) -> List[Visibility]:
 
     def extract_channel(v, chan):
         vis_shape = numpy.array(v.data['vis'].shape)
-        vis_shape[3] = 1
+        vis_shape[-2] = 1
         
         vis = BlockVisibility(data=None,
                               frequency=numpy.array([v.frequency[chan]]),
@@ -121,7 +122,9 @@ def visibility_scatter_channel(vis: BlockVisibility) -> List[Visibility]:
                               integration_time=v.integration_time,
                               polarisation_frame=v.polarisation_frame,
                               source=v.source,
-                              meta=v.meta)
+                              meta=v.meta,
+                              antenna1=v.antenna1,
+                              antenna2=v.antenna2)
         return vis
     
     return [extract_channel(vis, channel) for channel, _ in enumerate(vis.frequency)]
@@ -158,7 +161,9 @@ def visibility_gather_channel(vis_list: List[BlockVisibility], vis: BlockVisibil
                               integration_time=vis_list[0].integration_time,
                               polarisation_frame=vis_list[0].polarisation_frame,
                               source=vis_list[0].source,
-                              meta=vis_list[0].meta)
+                              meta=vis_list[0].meta,
+                              antenna1=vis_list[0].antenna1,
+                              antenna2=vis_list[0].antenna2)
     
     assert len(vis.frequency) == len(vis_list)
     
@@ -7,6 +7,10 @@ A typical use would be to make a sequence of snapshot images::
         dirtySnapshot = create_image_from_visibility(visslice, npixel=512, cellsize=0.001, npol=1)
         dirtySnapshot, sumwt = invert_2d(visslice, dirtySnapshot)
 
+By default the iterators yield a boolean mask over all rows. With indices=True the time or w values are sorted once
+and each slice is found by binary search. The rows are then yielded as a sorted index array, or as a slice if the
+visibility is already sorted, so that create_visibility_from_rows can take a view rather than a copy.
+
 """
 
 import logging
@@ -20,29 +24,76 @@ from data_models.memory_data_models import Visibility, BlockVisibility
 log = logging.getLogger(__name__)
 
 
-def vis_null_iter(vis: Union[Visibility, BlockVisibility], vis_slices=1) -> numpy.ndarray:
+def vis_null_iter(vis: Union[Visibility, BlockVisibility], vis_slices=1, indices=False) -> numpy.ndarray:
     """One time iterator returning true for all rows
     
     :param vis:
     :param vis_slices:
+    :param indices: Yield a slice rather than a boolean array
     :return:
     """
     assert vis is not None
     assert isinstance(vis, Visibility) or isinstance(vis, BlockVisibility), vis
-    yield numpy.ones_like(vis.time, dtype=bool)
+    if indices:
+        yield slice(0, vis.nvis)
+    else:
+        yield numpy.ones_like(vis.time, dtype=bool)
+
 
+def _sorted_slice_iter(values, boxes, halfwidth, inclusive=True, indices=False):
+    """ Iterate through the rows within halfwidth of each box centre
 
-def vis_timeslice_iter(vis: Union[Visibility, BlockVisibility], vis_slices=None) -> numpy.ndarray:
+    The values are sorted once and the range of each slice is found by binary search. The candidate range is
+    then checked with the same test as a boolean mask would use, so the selection is identical.
+
+    :param values: Value (e.g. time or w) of each row
+    :param boxes: Centres of the slices
+    :param halfwidth: Half width of the slices
+    :param inclusive: Include rows at exactly halfwidth from the centre
+    :param indices: Yield index arrays or slices rather than boolean arrays
+    :return: Boolean array, sorted index array, or slice for each box
+    """
+    nrows = len(values)
+    order = numpy.argsort(values, kind='stable')
+    is_sorted = numpy.array_equal(order, numpy.arange(nrows))
+    sorted_values = values[order]
+    margin = 1e-9 * (halfwidth + numpy.max(numpy.abs(sorted_values), initial=0.0))
+    lower = numpy.searchsorted(sorted_values, boxes - halfwidth - margin, side='left')
+    upper = numpy.searchsorted(sorted_values, boxes + halfwidth + margin, side='right')
+    
+    for box, lo, hi in zip(boxes, lower, upper):
+        if inclusive:
+            selected = numpy.abs(sorted_values[lo:hi] - box) <= halfwidth
+        else:
+            selected = numpy.abs(sorted_values[lo:hi] - box) < halfwidth
+        # The values are sorted so the selected rows are contiguous
+        selected = numpy.flatnonzero(selected)
+        start, stop = (lo + selected[0], lo + selected[-1] + 1) if len(selected) > 0 else (lo, lo)
+        if indices:
+            if is_sorted:
+                yield slice(start, stop)
+            else:
+                yield numpy.sort(order[start:stop])
+        else:
+            rows = numpy.zeros(nrows, dtype=bool)
+            rows[order[start:stop]] = True
+            yield rows
+
+
+def vis_timeslice_iter(vis: Union[Visibility, BlockVisibility], vis_slices=None, indices=False) -> numpy.ndarray:
     """ Time slice iterator
 
     :param vis:
     :param vis_slices: Number of time slices
+    :param indices: Yield sorted row indices, or a slice if the times are sorted, rather than a boolean array
     :return: Boolean array with selected rows=True
     """
     assert vis is not None
     assert isinstance(vis, Visibility) or isinstance(vis, BlockVisibility), vis
-    timemin = numpy.min(vis.time)
-    timemax = numpy.max(vis.time)
+    # Read the times once, since the visibility may be backed by a file
+    time = vis.time
+    timemin = numpy.min(time)
+    timemax = numpy.max(time)
     
     if vis_slices is None:
         vis_slices = vis_timeslices(vis, 'auto')
@@ -53,8 +104,7 @@ def vis_timeslice_iter(vis: Union[Visibility, BlockVisibility], vis_slices=None)
     else:
         timeslice = timemax - timemin
     
-    for box in boxes:
-        rows = numpy.abs(vis.time - box) <= 0.5 * timeslice
+    for rows in _sorted_slice_iter(time, boxes, 0.5 * timeslice, inclusive=True, indices=indices):
         yield rows
 
 
@@ -88,15 +138,17 @@ def vis_wslices(vis: Visibility, wslice=10.0) -> int:
     
     return 1 + 2 * numpy.round(wmaxabs / wslice).astype('int')
 
-def vis_wslice_iter(vis: Visibility, vis_slices=1) -> numpy.ndarray:
+def vis_wslice_iter(vis: Visibility, vis_slices=1, indices=False) -> numpy.ndarray:
     """ W slice iterator
 
     :param vis:
     :param vis_slices: Number of slices
+    :param indices: Yield sorted row indices, or a slice if w is sorted, rather than a boolean array
     :return: Boolean array with selected rows=True
     """
     assert isinstance(vis, Visibility), vis
-    wmaxabs = numpy.max(numpy.abs(vis.w))
+    w = vis.w
+    wmaxabs = numpy.max(numpy.abs(w))
     
     boxes = numpy.linspace(- wmaxabs, +wmaxabs, vis_slices)
     if vis_slices > 1:
@@ -104,6 +156,5 @@ def vis_wslice_iter(vis: Visibility, vis_slices=1) -> numpy.ndarray:
     else:
         wstack = 2 * wmaxabs
     
-    for box in boxes:
-        rows = numpy.abs(vis.w - box) < 0.5 * wstack
+    for rows in _sorted_slice_iter(w, boxes, 0.5 * wstack, inclusive=False, indices=indices):
         yield rows
\ No newline at end of file
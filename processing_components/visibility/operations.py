@@ -95,17 +95,17 @@ def concatenate_blockvisibility_frequency(bvis_list):
     
     assert len(bvis_list) > 0
     
-    nvis = bvis_list[0].nvis
     time = bvis_list[0].time
     frequency = numpy.array(numpy.array([bvis.frequency for bvis in bvis_list]).flat)
     channel_bandwidth = numpy.array(numpy.array([bvis.channel_bandwidth for bvis in bvis_list]).flat)
     nchan = len(frequency)
-    ntimes, nants, _, _, npol = bvis_list[0].vis.shape
+    vis_shape = list(bvis_list[0].vis.shape)
+    vis_shape[-2] = nchan
     uvw = bvis_list[0].uvw
     integration_time = bvis_list[0].integration_time
-    vis = numpy.zeros([nvis, nants, nants, nchan, npol], dtype='complex')
-    weight = numpy.ones([nvis, nants, nants, nchan, npol])
-    imaging_weight = numpy.ones([nvis, nants, nants, nchan, npol])
+    vis = numpy.zeros(vis_shape, dtype='complex')
+    weight = numpy.ones(vis_shape)
+    imaging_weight = numpy.ones(vis_shape)
     
     echan = 0
     for ibv, bvis in enumerate(bvis_list):
@@ -120,7 +120,7 @@ def concatenate_blockvisibility_frequency(bvis_list):
                            integration_time=integration_time, frequency=frequency, channel_bandwidth=channel_bandwidth,
                            polarisation_frame=bvis_list[0].polarisation_frame, source=bvis_list[0].source,
                            configuration=bvis_list[0].configuration, phasecentre=bvis_list[0].phasecentre,
-                           meta=None)
+                           meta=None, antenna1=bvis_list[0].antenna1, antenna2=bvis_list[0].antenna2)
 
 
 def sum_visibility(vis: Visibility, direction: SkyCoord) -> numpy.array:
@@ -263,32 +263,40 @@ def divide_visibility(vis: BlockVisibility, modelvis: BlockVisibility):
         mask = xwt > 0.0
         x[mask] = vis.vis[mask] / modelvis.vis[mask]
     else:
-        nrows, nants, _, nchan, npol = vis.vis.shape
+        vshape = vis.vis.shape
+        nrows, nchan, npol = vshape[0], vshape[-2], vshape[-1]
         nrec = 2
         assert nrec * nrec == npol
-        xshape = (nrows, nants, nants, nchan, nrec, nrec)
+        xshape = vshape[:-1] + (nrec, nrec)
         x = numpy.zeros(xshape, dtype='complex')
         xwt = numpy.zeros(xshape)
         # TODO: Remove filter when fixed to use ndarray
         warnings.simplefilter("ignore", category=PendingDeprecationWarning)
         
+        # The baselines [ant2, ant1] with ant2 > ant1, as indices into the block
+        if vis.compact:
+            baselines = [(bl,) for bl in numpy.where(vis.antenna2 > vis.antenna1)[0]]
+        else:
+            baselines = [(ant2, ant1) for ant1 in range(vis.nants) for ant2 in range(ant1 + 1, vis.nants)]
+        
         # TODO: optimise loop
         for row in range(nrows):
-            for ant1 in range(nants):
-                for ant2 in range(ant1 + 1, nants):
-                    for chan in range(nchan):
-                        ovis = numpy.matrix(vis.vis[row, ant2, ant1, chan].reshape([2, 2]))
-                        mvis = numpy.matrix(modelvis.vis[row, ant2, ant1, chan].reshape([2, 2]))
-                        wt = numpy.matrix(vis.weight[row, ant2, ant1, chan].reshape([2, 2]))
-                        x[row, ant2, ant1, chan] = numpy.matmul(numpy.linalg.inv(mvis), ovis)
-                        xwt[row, ant2, ant1, chan] = numpy.dot(mvis, numpy.multiply(wt, mvis.H)).real
-        x = x.reshape((nrows, nants, nants, nchan, nrec * nrec))
-        xwt = xwt.reshape((nrows, nants, nants, nchan, nrec * nrec))
+            for bl in baselines:
+                for chan in range(nchan):
+                    index = (row,) + bl + (chan,)
+                    ovis = numpy.matrix(vis.vis[index].reshape([2, 2]))
+                    mvis = numpy.matrix(modelvis.vis[index].reshape([2, 2]))
+                    wt = numpy.matrix(vis.weight[index].reshape([2, 2]))
+                    x[index] = numpy.matmul(numpy.linalg.inv(mvis), ovis)
+                    xwt[index] = numpy.dot(mvis, numpy.multiply(wt, mvis.H)).real
+        x = x.reshape(vshape)
+        xwt = xwt.reshape(vshape)
     
     pointsource_vis = BlockVisibility(data=None, frequency=vis.frequency, channel_bandwidth=vis.channel_bandwidth,
                                       phasecentre=vis.phasecentre, configuration=vis.configuration,
                                       uvw=vis.uvw, time=vis.time, integration_time=vis.integration_time, vis=x,
-                                      weight=xwt, source=vis.source, meta=vis.meta)
+                                      weight=xwt, source=vis.source, meta=vis.meta,
+                                      antenna1=vis.antenna1, antenna2=vis.antenna2)
     return pointsource_vis
 
 
@@ -302,7 +310,6 @@ def integrate_visibility_by_channel(vis: BlockVisibility) -> BlockVisibility:
     assert isinstance(vis, Visibility) or isinstance(vis, BlockVisibility), vis
     
     vis_shape = list(vis.vis.shape)
-    ntimes, nants, _, nchan, npol = vis_shape
     vis_shape[-2] = 1
     newvis = BlockVisibility(data=None,
                              frequency=numpy.ones([1]) * numpy.average(vis.frequency),
@@ -317,7 +324,9 @@ def integrate_visibility_by_channel(vis: BlockVisibility) -> BlockVisibility:
                              integration_time=vis.integration_time,
                              polarisation_frame=vis.polarisation_frame,
                              source=vis.source,
-                             meta=vis.meta)
+                             meta=vis.meta,
+                             antenna1=vis.antenna1,
+                             antenna2=vis.antenna2)
     
     newvis.data['vis'][..., 0, :] = numpy.sum(vis.data['vis'] * vis.data['weight'], axis=-2)
     newvis.data['weight'][..., 0, :] = numpy.sum(vis.data['weight'], axis=-2)
@@ -422,4 +431,5 @@ def convert_blockvisibility_to_stokesI(vis):
                            phasecentre=vis.phasecentre, configuration=vis.configuration, uvw=vis.uvw,
                            time=vis.time, vis=vis_data,
                            weight=vis_weight, imaging_weight=vis_imaging_weight, integration_time=vis.integration_time,
-                           polarisation_frame=polarisation_frame, source=vis.source, meta=vis.meta)
+                           polarisation_frame=polarisation_frame, source=vis.source, meta=vis.meta,
+                           antenna1=vis.antenna1, antenna2=vis.antenna2)
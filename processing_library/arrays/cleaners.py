@@ -4,17 +4,31 @@
 
 import numpy
 import logging
+import threading
 import time
 
+from processing_library.fourier_transforms.fft_support import rfft2, irfft2
+
 log = logging.getLogger(__name__)
 
+# Scale stacks and their transforms, keyed by shape, scales and normalisation. The planes of a cube may be
+# cleaned in several threads at once, so the caches are only accessed while holding the lock.
+_scalestack_cache = dict()
+_scalestack_transform_cache = dict()
+_scalestack_cache_size = 16
+_scalestack_cache_lock = threading.Lock()
+
 
-def hogbom(dirty, psf, window, gain, thresh, niter, fracthresh, prefix=''):
+def hogbom(dirty, psf, window, gain, thresh, niter, fracthresh, prefix='', tile_size=64):
     """ Clean the point spread function from a dirty image
 
     See Hogbom CLEAN (1974A&AS...15..417H)
 
     This version operates on numpy arrays.
+    
+    The peak search uses a cache of the maximum of the windowed absolute residual in each tile of tile_size x
+    tile_size pixels. Only the tiles touched by the last PSF subtraction are rescanned. Ties are resolved as
+    numpy.argmax does, so the result is identical to a full search of the image.
 
     :param fracthresh:
     :param prefix:
@@ -24,6 +38,7 @@ def hogbom(dirty, psf, window, gain, thresh, niter, fracthresh, prefix=''):
     :param gain: The "loop gain", i.e., the fraction of the brightest pixel that is removed in each iteration
     :param thresh: Cleaning stops when the maximum of the absolute deviation of the residual is less than this value
     :param niter: Maximum number of components to make if the threshold `thresh` is not hit
+    :param tile_size: Size of tiles in the peak cache (64)
     :return: clean component Image, residual Image
     """
 
@@ -38,19 +53,25 @@ def hogbom(dirty, psf, window, gain, thresh, niter, fracthresh, prefix=''):
              (prefix, niter, absolutethresh))
 
     comps = numpy.zeros(dirty.shape)
-    res = numpy.array(dirty)
     pmax = psf.max()
     assert pmax > 0.0
+    
+    res = numpy.array(dirty)
+
+    def absolute_residual(x0, x1, y0, y1):
+        """The windowed absolute residual in a box"""
+        if window is None:
+            return numpy.fabs(res[numpy.newaxis, x0:x1, y0:y1])
+        return numpy.fabs(res[numpy.newaxis, x0:x1, y0:y1] * window[x0:x1, y0:y1])
+
+    peaks = _TilePeaks(absolute_residual, (1,) + res.shape, tile_size)
     log.info('hogbom %s: Timing for setup: %.3f (s) for dirty shape %s, PSF shape %s' %
              (prefix, time.time() - starttime, str(dirty.shape), str(psf.shape)))
     starttime = time.time()
     aiter = 0
     for i in range(niter):
         aiter = i + 1
-        if window is not None:
-            mx, my = numpy.unravel_index((numpy.fabs(res * window)).argmax(), dirty.shape)
-        else:
-            mx, my = numpy.unravel_index((numpy.fabs(res)).argmax(), dirty.shape)
+        mx, my = peaks.argmax(0)
         mval = res[mx, my] * gain / pmax
         comps[mx, my] += mval
         a1o, a2o = overlapIndices(dirty, psf, mx, my)
@@ -60,6 +81,7 @@ def hogbom(dirty, psf, window, gain, thresh, niter, fracthresh, prefix=''):
         if numpy.abs(res[mx, my]) < 0.9 * absolutethresh:
             log.info("hogbom %s Stopped at iteration %d, peak %s at [%d, %d]" % (prefix, i, res[mx, my], mx, my))
             break
+        peaks.update(*a1o)
     log.info("hogbom %s End of minor cycle" % prefix)
     
     dtime = time.time() - starttime
@@ -69,6 +91,121 @@ def hogbom(dirty, psf, window, gain, thresh, niter, fracthresh, prefix=''):
     return comps, res
 
 
+def clark(dirty, psf, window, gain, thresh, niter, fracthresh, prefix='', psf_patch=32, max_active=10000):
+    """ Clean the point spread function from a dirty image using the Clark algorithm
+
+    See Clark CLEAN (1980A&A....89..377C)
+
+    Each major round selects the active pixels where the windowed absolute residual exceeds a flux limit. The flux
+    limit is the current peak times the highest PSF sidelobe outside a patch of +/- psf_patch pixels. The minor
+    cycle runs Hogbom CLEAN on the active pixels only, subtracting the PSF patch. At the end of the round the new
+    components are convolved with the full PSF by FFT and subtracted from the residual.
+
+    This version operates on numpy arrays.
+
+    :param dirty: The dirty Image, i.e., the Image to be deconvolved
+    :param psf: The point spread-function
+    :param window: Regions where clean components are allowed. If None, entire dirty Image is allowed
+    :param gain: The "loop gain", i.e., the fraction of the brightest pixel that is removed in each iteration
+    :param thresh: Cleaning stops when the maximum of the absolute deviation of the residual is less than this value
+    :param niter: Maximum number of components to make if the threshold `thresh` is not hit
+    :param fracthresh: The predefined fractional threshold at which to stop cleaning
+    :param prefix: Informational prefix for log messages
+    :param psf_patch: Half-width of the PSF patch used in the minor cycle (32)
+    :param max_active: Maximum number of active pixels in a minor cycle (10000)
+    :return: clean component Image, residual Image
+    """
+
+    starttime = time.time()
+    assert 0.0 < gain < 2.0
+    assert niter > 0
+    assert psf_patch > 0
+    assert max_active > 0
+
+    log.info("clark %s Max abs in dirty image = %.6f Jy/beam" % (prefix, numpy.max(numpy.abs(dirty))))
+    absolutethresh = max(thresh, fracthresh * numpy.fabs(dirty).max())
+    log.info("clark %s Start of minor cycle" % prefix)
+    log.info("clark %s This minor cycle will stop at %d iterations or peak < %.6f (Jy/beam)" %
+             (prefix, niter, absolutethresh))
+
+    comps = numpy.zeros(dirty.shape)
+    res = numpy.array(dirty)
+    pmax = psf.max()
+    assert pmax > 0.0
+
+    # As in overlapIndices, the PSF peak is at psf.shape // 2 and only 2 * psf.shape // 2 pixels are used
+    px, py = psf.shape[0] // 2, psf.shape[1] // 2
+    psf = psf[:2 * px, :2 * py]
+    exterior = numpy.fabs(psf) / pmax
+    exterior[max(0, px - psf_patch):px + psf_patch + 1, max(0, py - psf_patch):py + psf_patch + 1] = 0.0
+    sidelobe = exterior.max()
+    log.info("clark %s Maximum PSF sidelobe outside patch of +/- %d pixels = %.6f" % (prefix, psf_patch, sidelobe))
+
+    aiter = 0
+    nround = 0
+    while aiter < niter:
+        absres = numpy.fabs(res) if window is None else numpy.fabs(res * window)
+        peak = absres.max()
+        if peak < absolutethresh or peak == 0.0:
+            break
+        fluxlimit = max(absolutethresh, sidelobe * peak)
+        active = numpy.flatnonzero(absres >= fluxlimit)
+        if len(active) > max_active:
+            # Raise the flux limit so that only the brightest max_active pixels are active
+            fluxlimit = numpy.partition(absres.flat[active], -max_active)[-max_active]
+            active = active[absres.flat[active] >= fluxlimit]
+        ax, ay = numpy.unravel_index(active, res.shape)
+        aval = res[ax, ay].astype('float')
+        awindow = None if window is None else window[ax, ay]
+        acomps = numpy.zeros(len(active))
+
+        # Minor cycle on the active pixels, using only the PSF patch
+        for i in range(niter - aiter):
+            aabs = numpy.fabs(aval) if awindow is None else numpy.fabs(aval * awindow)
+            k = aabs.argmax()
+            if aabs[k] < fluxlimit or aabs[k] == 0.0:
+                break
+            mval = aval[k] * gain / pmax
+            acomps[k] += mval
+            dx, dy = ax - ax[k], ay - ay[k]
+            near = (numpy.abs(dx) <= psf_patch) & (numpy.abs(dy) <= psf_patch) & \
+                   (dx >= -px) & (dx < px) & (dy >= -py) & (dy < py)
+            aval[near] -= psf[dx[near] + px, dy[near] + py] * mval
+            aiter += 1
+
+        # Major cycle: subtract the new components convolved with the full PSF
+        round_comps = numpy.zeros(dirty.shape)
+        round_comps[ax, ay] = acomps
+        comps += round_comps
+        res -= _convolve_psf(round_comps, psf)
+        nround += 1
+        log.info("clark %s Round %d, %d active pixels above %.6f, %d iterations" %
+                 (prefix, nround, len(active), fluxlimit, aiter))
+    log.info("clark %s End of minor cycle" % prefix)
+
+    dtime = time.time() - starttime
+    log.info('%s Timing for clean: %.3f (s) for dirty %s, PSF %s , %d iterations in %d rounds' %
+             (prefix, dtime, str(dirty.shape), str(psf.shape), aiter, nround))
+
+    return comps, res
+
+
+def _convolve_psf(image, psf):
+    """ Convolve an image with a PSF by FFT, keeping the shape of the image
+
+    The PSF peak is at psf.shape // 2, as in overlapIndices.
+
+    :param image: Image to be convolved
+    :param psf: The point spread-function
+    :return: Convolved image
+    """
+    nx, ny = image.shape
+    px, py = psf.shape
+    shape = [nx + px, ny + py]
+    conv = irfft2(rfft2(image, shape) * rfft2(psf, shape), shape)
+    return conv[px // 2:px // 2 + nx, py // 2:py // 2 + ny]
+
+
 def hogbom_complex(dirty_q, dirty_u, psf_q, psf_u, window, gain, thresh, niter, fracthresh):
     """Clean the point spread function from a dirty Q+iU image
 
@@ -162,6 +299,66 @@ def argmax(a):
     return numpy.unravel_index(a.argmax(), a.shape)
 
 
+class _TilePeaks:
+    """ Cache of the maximum of each tile of a stack of images, for incremental peak searches
+
+    The images are evaluated by image(x0, x1, y0, y1), which returns the stack [nplanes, x1 - x0, y1 - y0] of the
+    searched quantity in a box. After the images change within a box only the tiles overlapping that box need to
+    be rescanned. Ties are resolved to the first position, as numpy.argmax does.
+    """
+
+    def __init__(self, image, shape, tile_size=64):
+        """ Scan all tiles
+
+        :param image: Function image(x0, x1, y0, y1) returning the stack in a box
+        :param shape: Shape of the stack [nplanes, nx, ny]
+        :param tile_size: Size of tiles (64)
+        """
+        self.image = image
+        self.nplanes, self.nx, self.ny = shape
+        self.tile_size = tile_size
+        ntx, nty = -(-self.nx // tile_size), -(-self.ny // tile_size)
+        self.tile_max = numpy.zeros([self.nplanes, ntx, nty])
+        self.tile_first = numpy.zeros([self.nplanes, ntx, nty], dtype='int')
+        self.update(0, self.nx, 0, self.ny)
+
+    def update(self, x0, x1, y0, y1):
+        """ Rescan the tiles overlapping the box [x0:x1, y0:y1]
+        """
+        ts = self.tile_size
+        tx0, tx1, ty0, ty1 = x0 // ts, -(-x1 // ts), y0 // ts, -(-y1 // ts)
+        ntx, nty = tx1 - tx0, ty1 - ty0
+        bx1, by1 = min(tx1 * ts, self.nx), min(ty1 * ts, self.ny)
+        block = self.image(tx0 * ts, bx1, ty0 * ts, by1)
+        if block.shape[1:] != (ntx * ts, nty * ts):
+            # Pad the partial tiles at the edges so that the padding is never a maximum
+            padded = numpy.full([self.nplanes, ntx * ts, nty * ts], -numpy.inf)
+            padded[:, :block.shape[1], :block.shape[2]] = block
+            block = padded
+        block = block.reshape([self.nplanes, ntx, ts, nty, ts]).transpose([0, 1, 3, 2, 4])
+        block = block.reshape([self.nplanes, ntx, nty, ts * ts])
+        first = block.argmax(axis=-1)
+        self.tile_max[:, tx0:tx1, ty0:ty1] = numpy.take_along_axis(block, first[..., numpy.newaxis], axis=-1)[..., 0]
+        x = numpy.arange(tx0, tx1)[:, numpy.newaxis] * ts + first // ts
+        y = numpy.arange(ty0, ty1)[numpy.newaxis, :] * ts + first % ts
+        self.tile_first[:, tx0:tx1, ty0:ty1] = x * self.ny + y
+
+    def plane_max(self):
+        """ Return the maximum of each plane
+        """
+        return self.tile_max.reshape([self.nplanes, -1]).max(axis=1)
+
+    def argmax(self, plane=None):
+        """ Return the first position of the maximum in a plane, or (plane, x, y) over all planes if plane is None
+        """
+        if plane is None:
+            tile_max = self.tile_max.reshape([self.nplanes, -1])
+            plane = int(numpy.flatnonzero(tile_max.max(axis=1) == tile_max.max())[0])
+            return (plane,) + self.argmax(plane)
+        tile_max = self.tile_max[plane]
+        return divmod(int(self.tile_first[plane][tile_max == tile_max.max()].min()), self.ny)
+
+
 def msclean(dirty, psf, window, gain, thresh, niter, scales, fracthresh, prefix=''):
     """ Perform multiscale clean
 
@@ -240,6 +437,18 @@ def msclean(dirty, psf, window, gain, thresh, niter, scales, fracthresh, prefix=
     log.info("msclean %s: This minor cycle will stop at %d iterations or peak < %.6f (Jy/beam)" %
              (prefix, niter, absolutethresh))
 
+    # Cache the peaks of the scaled residuals in tiles, and update only those touched by each component. This
+    # finds the same peak as find_max_abs_stack.
+    coupling_diagonal = numpy.diag(coupling_matrix)[:, numpy.newaxis, numpy.newaxis]
+
+    def scaled_residual(x0, x1, y0, y1):
+        """The windowed absolute residual in a box, scaled by the coupling matrix"""
+        if windowstack is None:
+            return numpy.abs(res_scalestack[:, x0:x1, y0:y1] / coupling_diagonal)
+        return numpy.abs(res_scalestack[:, x0:x1, y0:y1] * windowstack[:, x0:x1, y0:y1] / coupling_diagonal)
+
+    peaks = _TilePeaks(scaled_residual, res_scalestack.shape)
+
     log.info('msclean %s: Timing for setup: %.3f (s) for dirty shape %s, PSF shape %s , scales %s' %
              (prefix, time.time() - starttime, str(dirty.shape), str(psf.shape), str(scales)))
     starttime = time.time()
@@ -247,7 +456,7 @@ def msclean(dirty, psf, window, gain, thresh, niter, scales, fracthresh, prefix=
     for i in range(niter):
         aiter = i + 1
         # Find peak over all smoothed images
-        mx, my, mscale = find_max_abs_stack(res_scalestack, windowstack, coupling_matrix)
+        mscale, mx, my = peaks.argmax()
         # Find the values to subtract, accounting for the coupling matrix
         mval = res_scalestack[mscale, mx, my] / coupling_matrix[mscale, mscale]
         if niter < 10 or i % (niter // 10) == 0:
@@ -267,6 +476,7 @@ def msclean(dirty, psf, window, gain, thresh, niter, scales, fracthresh, prefix=
                     psf_scalescalestack[iscale, mscale, rhs[0]:rhs[1], rhs[2]:rhs[3]] * gain * mval
             comps[lhs[0]:lhs[1], lhs[2]:lhs[3]] += \
                 pscalestack[mscale, rhs[0]:rhs[1], rhs[2]:rhs[3]] * gain * mval
+            peaks.update(*lhs)
         else:
             break
             
@@ -283,6 +493,10 @@ def msclean(dirty, psf, window, gain, thresh, niter, scales, fracthresh, prefix=
 def create_scalestack(scaleshape, scales, norm=True):
     """ Create a cube consisting of the scales
 
+    The stacks are cached by shape, scales and normalisation so the returned array is shared and read-only. The
+    Fourier transforms of cached stacks are also cached for use by convolve_scalestack and
+    convolve_convolve_scalestack.
+
     :param scaleshape: desired shape of stack
     :param scales: scales (in pixels)
     :param norm: Normalise each plane to unity?
@@ -290,6 +504,12 @@ def create_scalestack(scaleshape, scales, norm=True):
     """
     assert scaleshape[0] == len(scales)
 
+    key = (tuple(int(n) for n in scaleshape), tuple(float(scale) for scale in scales), bool(norm))
+    with _scalestack_cache_lock:
+        cached = _scalestack_cache.get(key, None)
+    if cached is not None:
+        return cached
+
     basis = numpy.zeros(scaleshape)
     nx = scaleshape[1]
     ny = scaleshape[2]
@@ -299,23 +519,49 @@ def create_scalestack(scaleshape, scales, norm=True):
         halfscale = int(numpy.ceil(scales[iscale] / 2.0))
         if scales[iscale] > 0.0:
             rscale2 = 1.0 / (float(scales[iscale]) / 2.0) ** 2
-            x = range(xcen - halfscale - 1, xcen + halfscale + 1)
-            # Unroll this since spheroidal_function needs a scalar
-            for y in range(ycen - halfscale - 1, ycen + halfscale + 1):
-                for x in range(xcen - halfscale - 1, xcen + halfscale + 1):
-                    fx = float(x - xcen)
-                    fy = float(y - ycen)
-                    r2 = rscale2 * (fx * fx + fy * fy)
-                    r = numpy.sqrt(r2)
-                    basis[iscale, x, y] = spheroidal_function(r) * (1.0 - r ** 2)
+            x = numpy.arange(xcen - halfscale - 1, xcen + halfscale + 1)
+            y = numpy.arange(ycen - halfscale - 1, ycen + halfscale + 1)
+            fx = (x - xcen).astype('float')[:, numpy.newaxis]
+            fy = (y - ycen).astype('float')[numpy.newaxis, :]
+            r = numpy.sqrt(rscale2 * (fx * fx + fy * fy))
+            basis[iscale][numpy.ix_(x, y)] = spheroidal_function(r) * (1.0 - r ** 2)
             basis[basis < 0.0] = 0.0
             if norm:
                 basis[iscale, :, :] /= numpy.sum(basis[iscale, :, :])
         else:
             basis[iscale, xcen, ycen] = 1.0
+
+    basis.setflags(write=False)
+    with _scalestack_cache_lock:
+        if key not in _scalestack_cache and len(_scalestack_cache) >= _scalestack_cache_size:
+            del _scalestack_cache[next(iter(_scalestack_cache))]
+        _scalestack_cache[key] = basis
     return basis
 
 
+def scalestack_transform(scalestack):
+    """ Return the Fourier transform of the scale stack, as used in the scale convolutions
+
+    The transform is cached if the stack came from create_scalestack.
+
+    :param scalestack: stack containing the scales
+    :return: real-to-complex transform of the shifted stack
+    """
+    with _scalestack_cache_lock:
+        cached = _scalestack_transform_cache.get(id(scalestack), None)
+    if cached is not None and cached[0] is scalestack:
+        return cached[1]
+    xscale = rfft2(numpy.fft.fftshift(scalestack, axes=(1, 2)))
+    if not scalestack.flags.writeable:
+        with _scalestack_cache_lock:
+            if id(scalestack) not in _scalestack_transform_cache and \
+                    len(_scalestack_transform_cache) >= _scalestack_cache_size:
+                del _scalestack_transform_cache[next(iter(_scalestack_transform_cache))]
+            # Holding the stack keeps its id from being reused while the transform is cached
+            _scalestack_transform_cache[id(scalestack)] = (scalestack, xscale)
+    return xscale
+
+
 def convolve_scalestack(scalestack, img):
     """Convolve img by the specified scalestack, returning the resulting stack
 
@@ -324,15 +570,11 @@ def convolve_scalestack(scalestack, img):
     :return: stack
     """
 
-    convolved = numpy.zeros(scalestack.shape)
-    ximg = numpy.fft.fftshift(numpy.fft.fft2(numpy.fft.fftshift(img)))
-
-    nscales = scalestack.shape[0]
-    for iscale in range(nscales):
-        xscale = numpy.fft.fftshift(numpy.fft.fft2(numpy.fft.fftshift(scalestack[iscale, :, :])))
-        xmult = ximg * numpy.conjugate(xscale)
-        convolved[iscale, :, :] = numpy.real(numpy.fft.ifftshift(numpy.fft.ifft2(numpy.fft.ifftshift(xmult))))
-    return convolved
+    nscales, nx, ny = scalestack.shape
+    # Circular convolution commutes with shifts, so img needs no centring shifts
+    ximg = rfft2(img)
+    xmult = ximg[numpy.newaxis, ...] * numpy.conjugate(scalestack_transform(scalestack))
+    return irfft2(xmult, [nx, ny])
 
 
 def convolve_convolve_scalestack(scalestack, img):
@@ -344,20 +586,11 @@ def convolve_convolve_scalestack(scalestack, img):
     """
 
     nscales, nx, ny = scalestack.shape
-    convolved_shape = [nscales, nscales, nx, ny]
-    convolved = numpy.zeros(convolved_shape)
-    ximg = numpy.fft.fftshift(numpy.fft.fft2(numpy.fft.fftshift(img)))
-
-    xscaleshape = [nscales, nx, ny]
-    xscale = numpy.zeros(xscaleshape, dtype='complex')
-    for s in range(nscales):
-        xscale[s] = numpy.fft.fftshift(numpy.fft.fft2(numpy.fft.fftshift(scalestack[s, ...])))
-
-    for s in range(nscales):
-        for p in range(nscales):
-            xmult = ximg * xscale[p] * numpy.conjugate(xscale[s])
-            convolved[s, p, ...] = numpy.real(numpy.fft.ifftshift(numpy.fft.ifft2(numpy.fft.ifftshift(xmult))))
-    return convolved
+    ximg = rfft2(img)
+    xscale = scalestack_transform(scalestack)
+    xmult = ximg[numpy.newaxis, numpy.newaxis, ...] * xscale[numpy.newaxis, ...] * \
+            numpy.conjugate(xscale[:, numpy.newaxis, ...])
+    return irfft2(xmult, [nx, ny])
 
 
 def find_max_abs_stack(stack, windowstack, couplingmatrix):
@@ -399,7 +632,7 @@ def spheroidal_function(vnu):
     """ Evaluates the PROLATE SPHEROIDAL WAVEFUNCTION
 
     m=6, alpha = 1 from Schwab, Indirect Imaging (1984).
-    This is one factor in the basis function.
+    This is one factor in the basis function. vnu may be a scalar or an array.
     """
 
     # Code adapted Anna's f90 PROFILE (gridder.f90) code
@@ -432,16 +665,9 @@ def spheroidal_function(vnu):
     q[1, 1] = 9.599102e-1
     q[1, 2] = 2.918724e-1
 
-    if (vnu >= 0.) and (vnu < 0.75):
-        part = 0
-        nuend = 0.75
-    elif (vnu >= 0.75) and (vnu <= 1.):
-        part = 1
-        nuend = 1.0
-    else:
-        value = 0.
-        # nasty fortran-esque exit statement:
-        return value
+    vnu = numpy.asarray(vnu, dtype='float')
+    part = numpy.where(vnu < 0.75, 0, 1)
+    nuend = numpy.where(vnu < 0.75, 0.75, 1.0)
 
     top = p[part, 0]
     bot = q[part, 0]
@@ -449,20 +675,19 @@ def spheroidal_function(vnu):
 
     for k in range(1, n_p + 1):
         factor = delnusq ** k
-        top += p[part, k] * factor
+        top = top + p[part, k] * factor
 
     for k in range(1, n_q + 1):
         factor = delnusq ** k
-        bot += q[part, k] * factor
-
-    if bot != 0.:
-        value = top / bot
-    else:
-        value = 0.
+        bot = bot + q[part, k] * factor
 
-    if value < 0.:
-        value = 0.
+    nonzero = bot != 0.
+    value = numpy.zeros(vnu.shape)
+    value[nonzero] = top[nonzero] / bot[nonzero]
+    value[(vnu < 0.) | (vnu > 1.) | (value < 0.)] = 0.
 
+    if value.ndim == 0:
+        return float(value)
     return value
 
 
@@ -555,6 +780,17 @@ def msmfsclean(dirty, psf, window, gain, thresh, niter, scales, fracthresh, find
     scale_counts = numpy.zeros(nscales, dtype='int')
     scale_flux = numpy.zeros(nscales)
 
+    # Cache the peaks of the objective in tiles, and update only those touched by each component. The first
+    # nscales planes hold the windowed absolute objective and the remainder the objective.
+    def objective(x0, x1, y0, y1):
+        """The windowed absolute objective and the objective in a box"""
+        box, _ = calculate_optimum_objective(hsmmpsf, ihsmmpsf, smresidual[..., x0:x1, y0:y1], findpeak)
+        if windowstack is None:
+            return numpy.concatenate([numpy.abs(box), box])
+        return numpy.concatenate([numpy.abs(box * windowstack[:, x0:x1, y0:y1]), box])
+
+    peaks = _TilePeaks(objective, [2 * nscales, smresidual.shape[2], smresidual.shape[3]])
+
     aiter = 0
     log.info('mmclean %s: Timing for setup: %.3f (s) for dirty shape %s, PSF shape %s , scales %s, %d moments' %
              (prefix, time.time() - starttime, str(dirty.shape), str(psf.shape), str(scales), nmoment))
@@ -562,8 +798,12 @@ def msmfsclean(dirty, psf, window, gain, thresh, niter, scales, fracthresh, find
     for i in range(niter):
         aiter = i + 1
 
-        # Find the optimum scale and location.
-        mscale, mx, my, mval = find_global_optimum(hsmmpsf, ihsmmpsf, smresidual, windowstack, findpeak)
+        # Find the optimum scale and location. This is the same as find_global_optimum: the scale has the
+        # largest windowed absolute objective, and the location is the maximum of the objective at that scale.
+        mscale = int(numpy.argmax(peaks.plane_max()[:nscales]))
+        mx, my = peaks.argmax(nscales + mscale)
+        mval = calculate_scale_moment_principal_solution(smresidual[..., mx:mx + 1, my:my + 1],
+                                                         ihsmmpsf)[mscale, :, 0, 0]
         scale_counts[mscale] += 1
         scale_flux[mscale] += mval[0]
 
@@ -584,6 +824,7 @@ def msmfsclean(dirty, psf, window, gain, thresh, niter, scales, fracthresh, find
         # Update model and residual image
         m_model = update_moment_model(m_model, pscalestack, lhs, rhs, gain, mscale, mval)
         smresidual = update_scale_moment_residual(smresidual, ssmmpsf, lhs, rhs, gain, mscale, mval)
+        peaks.update(*lhs)
 
     log.info("mmclean %s: End of minor cycles" % prefix)
 
@@ -602,35 +843,40 @@ def find_global_optimum(hsmmpsf, ihsmmpsf, smresidual, windowstack, findpeak):
     """Find the optimum peak using one of a number of algorithms
 
     """
+    objective, smpsol = calculate_optimum_objective(hsmmpsf, ihsmmpsf, smresidual, findpeak)
+    mx, my, mscale = find_optimum_scale_zero_moment(objective[:, numpy.newaxis, ...], windowstack)
+    mval = smpsol[mscale, :, mx, my]
+
+    return mscale, mx, my, mval
+
+
+def calculate_optimum_objective(hsmmpsf, ihsmmpsf, smresidual, findpeak):
+    """Calculate the images searched for the optimum scale and location
+
+    Each pixel depends only on the same pixel of smresidual, so this may be evaluated for part of the image.
+
+    :param hsmmpsf: scale dependent moment moment Hessian
+    :param ihsmmpsf: Inverse of scale dependent moment moment Hessian
+    :param smresidual: scale-dependent moment residual [nscales, nmoment, nx, ny]
+    :param findpeak: Method of finding peak: 'Algorithm1'|'CASA'|'ARL'
+    :return: objective [nscales, nx, ny], principal solution [nscales, nmoment, nx, ny]
+    """
+    smpsol = calculate_scale_moment_principal_solution(smresidual, ihsmmpsf)
     if findpeak == 'Algorithm1':
-        # Calculate the principal solution in moment-moment axes. This decouples the moments
-        smpsol = calculate_scale_moment_principal_solution(smresidual, ihsmmpsf)
-        # Now find the location and scale
-        mx, my, mscale = find_optimum_scale_zero_moment(smpsol, windowstack)
-        mval = smpsol[mscale, :, mx, my]
+        return smpsol[:, 0, ...], smpsol
     elif findpeak == 'CASA':
         # CASA 4.7 version
-        smpsol = calculate_scale_moment_principal_solution(smresidual, ihsmmpsf)
-        #        smpsol = calculate_scale_moment_approximate_principal_solution(smresidual, hsmmpsf)
         nscales, nmoment, nx, ny = smpsol.shape  # pylint: disable=no-member
-        dchisq = numpy.zeros([nscales, 1, nx, ny])
+        dchisq = numpy.zeros([nscales, nx, ny])
         for scale in range(nscales):
             for moment1 in range(nmoment):
-                dchisq[scale, 0, ...] += 2.0 * smpsol[scale, moment1, ...] * smresidual[scale, moment1, ...]
+                dchisq[scale, ...] += 2.0 * smpsol[scale, moment1, ...] * smresidual[scale, moment1, ...]
                 for moment2 in range(nmoment):
-                    dchisq[scale, 0, ...] -= hsmmpsf[scale, moment1, moment2] * \
+                    dchisq[scale, ...] -= hsmmpsf[scale, moment1, moment2] * \
                         smpsol[scale, moment1, ...] * smpsol[scale, moment2, ...]
-
-        mx, my, mscale = find_optimum_scale_zero_moment(dchisq, windowstack)
-        mval = smpsol[mscale, :, mx, my]
-
+        return dchisq, smpsol
     else:
-        smpsol = calculate_scale_moment_principal_solution(smresidual, ihsmmpsf)
-        mx, my, mscale = find_optimum_scale_zero_moment(smpsol * smresidual, windowstack)
-
-        mval = smpsol[mscale, :, mx, my]
-
-    return mscale, mx, my, mval
+        return smpsol[:, 0, ...] * smresidual[:, 0, ...], smpsol
 
 
 def update_scale_moment_residual(smresidual, ssmmpsf, lhs, rhs, gain, mscale, mval):
@@ -25,10 +25,13 @@ def solve_from_X(gt: GainTable, x: numpy.ndarray, xwt: numpy.ndarray, chunk, cro
         -> GainTable:
     """ Solve for gains from the point source equivalents
 
+    If chunk is an array of gaintable rows, x and xwt have a leading axis of the same length and all the solutions
+    are found together.
+
     :param gt:
     :param x: point source visibility
     :param xwt: point source weight
-    :param chunk: which chunk of the gaintable?
+    :param chunk: which chunk(s) of the gaintable?
     :param crosspol:
     :param niter:
     :param phase_only:
@@ -38,6 +41,10 @@ def solve_from_X(gt: GainTable, x: numpy.ndarray, xwt: numpy.ndarray, chunk, cro
     """
     if npol > 1:
         if crosspol:
+            if numpy.ndim(chunk) > 0:
+                for i, row in enumerate(chunk):
+                    gt = solve_from_X(gt, x[i], xwt[i], row, crosspol, niter, phase_only, tol, npol)
+                return gt
             gt.data['gain'][chunk, ...], gt.data['weight'][chunk, ...], gt.data['residual'][chunk, ...] = \
                 solve_antenna_gains_itsubs_matrix(gt.data['gain'][chunk, ...], gt.data['weight'][chunk, ...],
                                                   x, xwt, phase_only=phase_only, niter=niter,
@@ -56,6 +63,39 @@ def solve_from_X(gt: GainTable, x: numpy.ndarray, xwt: numpy.ndarray, chunk, cro
     return gt
 
 
+def _batch_shapes(gain, x, xwt):
+    """Reshape gains and point source equivalents to have a single leading solution axis
+
+    :param gain: gains [..., nants, nchan, nrec, nrec]
+    :param x: Equivalent point source visibility [..., nants, nants, nchan, npol]
+    :param xwt: Equivalent point source weight [..., nants, nants, nchan, npol]
+    :return: leading shape, gain [nsol, nants, nchan, nrec, nrec], x and xwt [nsol, nants, nants, nchan, nrec, nrec]
+    """
+    nants, nchan, nrec, _ = gain.shape[-4:]
+    lead = gain.shape[:-4]
+    gain = numpy.array(gain).reshape((-1, nants, nchan, nrec, nrec))
+    x = x.reshape((-1, nants, nants, nchan, nrec, nrec))
+    xwt = xwt.reshape((-1, nants, nants, nchan, nrec, nrec))
+    
+    # Fill the upper triangle from the lower triangle, and zero the autocorrelations
+    ant2, ant1 = numpy.tril_indices(nants, -1)
+    x[:, ant1, ant2, ...] = numpy.conjugate(x[:, ant2, ant1, ...])
+    xwt[:, ant1, ant2, ...] = xwt[:, ant2, ant1, ...]
+    x[:, numpy.arange(nants), numpy.arange(nants), ...] = 0.0
+    xwt[:, numpy.arange(nants), numpy.arange(nants), ...] = 0.0
+    return lead, gain, x, xwt
+
+
+def _max_change(gain, gainLast):
+    """Maximum change in the gain for each solution
+
+    :param gain: gains [nsol, ...]
+    :param gainLast: previous gains [nsol, ...]
+    :return: change [nsol]
+    """
+    return numpy.max(numpy.abs(gain - gainLast).reshape([gain.shape[0], -1]), axis=1)
+
+
 def solve_antenna_gains_itsubs_scalar(gain, gwt, x, xwt, niter=30, tol=1e-8, phase_only=True, refant=0,
                                       damping=0.5):
     """Solve for the antenna gains
@@ -65,6 +105,9 @@ def solve_antenna_gains_itsubs_scalar(gain, gwt, x, xwt, niter=30, tol=1e-8, pha
     This uses an iterative substitution algorithm due to Larry
     D'Addario c 1980'ish (see ThompsonDaddario1982 Appendix 1). Used
     in the original VLA Dec-10 Antsol.
+    
+    Any leading axes of gain and x are independent solutions (e.g. solution intervals) that are iterated together.
+    Each solution stops changing once it has converged.
 
     :param gain: gains
     :param gwt: gain weight
@@ -77,53 +120,57 @@ def solve_antenna_gains_itsubs_scalar(gain, gwt, x, xwt, niter=30, tol=1e-8, pha
     :return: gain [nants, ...], weight [nants, ...]
 
     """
+    lead, gain, x, xwt = _batch_shapes(gain, x, xwt)
+    gwt = numpy.array(gwt).reshape(gain.shape)
     
-    nants = x.shape[0]
-    for ant1 in range(nants):
-        x[ant1, ant1, ...] = 0.0
-        xwt[ant1, ant1, ...] = 0.0
-        for ant2 in range(ant1 + 1, nants):
-            x[ant1, ant2, ...] = numpy.conjugate(x[ant2, ant1, ...])
-            xwt[ant1, ant2, ...] = xwt[ant2, ant1, ...]
-    
+    active = numpy.arange(gain.shape[0])
     for iter in range(niter):
-        gainLast = gain
-        gain, gwt = gain_substitution_scalar(gain, x, xwt)
+        gainLast = gain[active]
+        newgain, newgwt = gain_substitution_scalar(gainLast, x[active], xwt[active])
         if phase_only:
-            mask = numpy.abs(gain) > 0.0
-            gain[mask] = gain[mask] / numpy.abs(gain[mask])
-        angles = numpy.angle(gain)
-        gain *= numpy.exp(-1j * angles)[refant, ...]
-        gain = (1.0 - damping) * gain + damping * gainLast
-        change = numpy.max(numpy.abs(gain - gainLast))
-        if change < tol:
-            return gain, gwt, solution_residual_scalar(gain, x, xwt)
-
-    return gain, gwt, solution_residual_scalar(gain, x, xwt)
+            mask = numpy.abs(newgain) > 0.0
+            newgain[mask] = newgain[mask] / numpy.abs(newgain[mask])
+        angles = numpy.angle(newgain)
+        newgain *= numpy.exp(-1j * angles)[:, refant, numpy.newaxis, ...]
+        newgain = (1.0 - damping) * newgain + damping * gainLast
+        change = _max_change(newgain, gainLast)
+        gain[active] = newgain
+        gwt[active] = newgwt
+        active = active[change >= tol]
+        if len(active) == 0:
+            break
+
+    residual = solution_residual_scalar(gain, x, xwt)
+    return gain.reshape(lead + gain.shape[1:]), gwt.reshape(lead + gwt.shape[1:]), \
+        residual.reshape(lead + residual.shape[1:])
 
 
 def gain_substitution_scalar(gain, x, xwt):
-    nants, nchan, nrec, _ = gain.shape
+    """One substitution step for scalar gains
+    
+    :param gain: gains [..., nants, nchan, 1, 1]
+    :param x: Equivalent point source visibility[..., nants, nants, nchan, ...]
+    :param xwt: Equivalent point source weight [..., nants, nants, nchan, ...]
+    :return: gain, weight
+    """
+    nants, nchan, nrec, _ = gain.shape[-4:]
+    lead = gain.shape[:-4]
     newgain = numpy.ones_like(gain, dtype='complex')
     gwt = numpy.zeros_like(gain, dtype='float')
     
-    x = x.reshape([nants, nants, nchan, nrec, nrec])
-    xwt = xwt.reshape([nants, nants, nchan, nrec, nrec])
+    x = x.reshape(lead + (nants, nants, nchan, nrec, nrec))[..., 0, 0]
+    xwt = xwt.reshape(lead + (nants, nants, nchan, nrec, nrec))[..., 0, 0]
     
-    xxwt = x[:, :, :, 0, 0] * xwt[:, :, :, 0, 0]
-    cgain = numpy.conjugate(gain)
-    gcg = gain[:, :, 0, 0] * cgain[:, :, 0, 0]
+    # Sum over antenna2 as a matrix-vector product for all antenna1, channels and solutions at once
+    lgain = gain[..., 0, 0]
+    top = numpy.einsum('...jc,...jkc->...kc', lgain, x * xwt)
+    bot = numpy.einsum('...jc,...jkc->...kc', (lgain * numpy.conjugate(lgain)).real, xwt)
     
-    for ant1 in range(nants):
-        top = numpy.sum(gain[:, :, 0, 0] * xxwt[:, ant1, :], axis=0)
-        bot = numpy.sum((gcg[:, :] * xwt[:, ant1, :, 0, 0]).real, axis=0)
-    
-        if bot.all() > 0.0:
-            newgain[ant1, :, 0, 0] = top / bot
-            gwt[ant1, :, 0, 0] = bot
-        else:
-            newgain[ant1, :, 0, 0] = 0.0
-            gwt[ant1, :, 0, 0] = 0.0
+    # An antenna is solved only if it has weight in all channels
+    good = numpy.all(bot != 0.0, axis=-1)
+    newgain[..., 0, 0][good] = top[good] / bot[good]
+    gwt[..., 0, 0][good] = bot[good]
+    newgain[..., 0, 0][~good] = 0.0
     return newgain, gwt
 
 
@@ -137,6 +184,9 @@ def solve_antenna_gains_itsubs_vector(gain, gwt, x, xwt, niter=30, tol=1e-8, pha
     J. P. Hamaker, “Understanding radio polarimetry - IV. The full-coherency analogue of
     scalar self-calibration: Self-alignment, dynamic range and polarimetric fidelity,” Astronomy
     and Astrophysics Supplement Series, vol. 143, no. 3, pp. 515–534, May 2000.
+    
+    Any leading axes of gain and x are independent solutions (e.g. solution intervals) that are iterated together.
+    Each solution stops changing once it has converged.
 
     :param gain: gains
     :param gwt: gain weight
@@ -148,41 +198,45 @@ def solve_antenna_gains_itsubs_vector(gain, gwt, x, xwt, niter=30, tol=1e-8, pha
     :param refant: Reference antenna for phase (default=0.0)
     :return: gain [nants, ...], weight [nants, ...]
     """
-    
-    nants, _, nchan, npol = x.shape
-    assert npol == 4
-    newshape = (nants, nants, nchan, 2, 2)
-    x = x.reshape(newshape)
-    xwt = xwt.reshape(newshape)
-    
-    for ant1 in range(nants):
-        x[ant1, ant1, ...] = 0.0
-        xwt[ant1, ant1, ...] = 0.0
-        for ant2 in range(ant1 + 1, nants):
-            x[ant1, ant2, ...] = numpy.conjugate(x[ant2, ant1, ...])
-            xwt[ant1, ant2, ...] = xwt[ant2, ant1, ...]
+    assert x.shape[-1] == 4
+    lead, gain, x, xwt = _batch_shapes(gain, x, xwt)
+    gwt = numpy.array(gwt).reshape(gain.shape)
     
     gain[..., 0, 1] = 0.0
     gain[..., 1, 0] = 0.0
     
+    active = numpy.arange(gain.shape[0])
     for iter in range(niter):
-        gainLast = gain
-        gain, gwt = gain_substitution_vector(gain, x, xwt)
+        gainLast = gain[active]
+        newgain, newgwt = gain_substitution_vector(gainLast, x[active], xwt[active])
         for rec in [0, 1]:
-            gain[..., rec, 1 - rec] = 0.0
+            newgain[..., rec, 1 - rec] = 0.0
             if phase_only:
-                gain[..., rec, rec] = gain[..., rec, rec] / numpy.abs(gain[..., rec, rec])
-            gain[..., rec, rec] *= numpy.conjugate(gain[refant, ..., rec, rec]) / numpy.abs(gain[refant, ..., rec, rec])
-        change = numpy.max(numpy.abs(gain - gainLast))
-        gain = 0.5 * (gain + gainLast)
-        if change < tol:
-            return gain, gwt, solution_residual_vector(gain, x, xwt)
+                newgain[..., rec, rec] = newgain[..., rec, rec] / numpy.abs(newgain[..., rec, rec])
+            refgain = newgain[:, refant, numpy.newaxis, ..., rec, rec]
+            newgain[..., rec, rec] *= numpy.conjugate(refgain) / numpy.abs(refgain)
+        change = _max_change(newgain, gainLast)
+        gain[active] = 0.5 * (newgain + gainLast)
+        gwt[active] = newgwt
+        active = active[change >= tol]
+        if len(active) == 0:
+            break
     
-    return gain, gwt, solution_residual_vector(gain, x, xwt)
+    residual = solution_residual_vector(gain, x, xwt)
+    return gain.reshape(lead + gain.shape[1:]), gwt.reshape(lead + gwt.shape[1:]), \
+        residual.reshape(lead + residual.shape[1:])
 
 
 def gain_substitution_vector(gain, x, xwt):
-    nants, nchan, nrec, _ = gain.shape
+    """One substitution step for diagonal Jones matrices
+    
+    :param gain: gains [..., nants, nchan, nrec, nrec]
+    :param x: Equivalent point source visibility[..., nants, nants, nchan, ...]
+    :param xwt: Equivalent point source weight [..., nants, nants, nchan, ...]
+    :return: gain, weight
+    """
+    nants, nchan, nrec, _ = gain.shape[-4:]
+    lead = gain.shape[:-4]
     newgain = numpy.ones_like(gain, dtype='complex')
     if nrec > 0:
         newgain[..., 0, 1] = 0.0
@@ -191,29 +245,24 @@ def gain_substitution_vector(gain, x, xwt):
     gwt = numpy.zeros_like(gain, dtype='float')
     
     # We are going to work with Jones 2x2 matrix formalism so everything has to be
-    # converted to that format
-    x = x.reshape(nants, nants, nchan, nrec, nrec)
-    xwt = xwt.reshape(nants, nants, nchan, nrec, nrec)
+    # converted to that format. Only the diagonal terms e.g. 'RR', 'LL, or 'xx', 'YY' are used.
+    x = numpy.diagonal(x.reshape(lead + (nants, nants, nchan, nrec, nrec)), axis1=-2, axis2=-1)
+    xwt = numpy.diagonal(xwt.reshape(lead + (nants, nants, nchan, nrec, nrec)), axis1=-2, axis2=-1)
     
     if nrec > 0:
         gain[..., 0, 1] = 0.0
         gain[..., 1, 0] = 0.0
     
-    for ant1 in range(nants):
-        for chan in range(nchan):
-            # Loop over e.g. 'RR', 'LL, or 'xx', 'YY' ignoring cross terms
-            for rec in range(nrec):
-                top = numpy.sum(x[:, ant1, chan, rec, rec] *
-                                gain[:, chan, rec, rec] * xwt[:, ant1, chan, rec, rec], axis=0)
-                bot = numpy.sum((gain[:, chan, rec, rec] * numpy.conjugate(gain[:, chan, rec, rec]) *
-                                 xwt[:, ant1, chan, rec, rec]).real, axis=0)
-                
-                if bot > 0.0:
-                    newgain[ant1, chan, rec, rec] = top / bot
-                    gwt[ant1, chan, rec, rec] = bot
-                else:
-                    newgain[ant1, chan, rec, rec] = 0.0
-                    gwt[ant1, chan, rec, rec] = 0.0
+    lgain = numpy.diagonal(gain, axis1=-2, axis2=-1)
+    top = numpy.einsum('...jcr,...jkcr->...kcr', lgain, x * xwt)
+    bot = numpy.einsum('...jcr,...jkcr->...kcr', (lgain * numpy.conjugate(lgain)).real, xwt)
+    
+    good = bot > 0.0
+    newdiag = numpy.zeros_like(top)
+    newdiag[good] = top[good] / bot[good]
+    for rec in range(nrec):
+        newgain[..., rec, rec] = newdiag[..., rec]
+        gwt[..., rec, rec] = numpy.where(good[..., rec], bot[..., rec], 0.0)
     
     return newgain, gwt
 
@@ -302,34 +351,27 @@ def gain_substitution_matrix(gain, x, xwt):
 def solution_residual_scalar(gain, x, xwt):
     """Calculate residual across all baselines of gain for point source equivalent visibilities
     
-    :param gain: gain [nant, ...]
-    :param x: Point source equivalent visibility [nant, ...]
-    :param xwt: Point source equivalent weight [nant, ...]
-    :return: residual[...]
+    :param gain: gain [..., nant, ...]
+    :param x: Point source equivalent visibility [..., nant, ...]
+    :param xwt: Point source equivalent weight [..., nant, ...]
+    :return: residual[..., nchan, nrec, nrec]
     """
     
-    nant, nchan, nrec, _ = gain.shape
-    x = x.reshape(nant, nant, nchan, nrec, nrec)
-    
-    xwt = xwt.reshape(nant, nant, nchan, nrec, nrec)
+    nant, nchan, nrec, _ = gain.shape[-4:]
+    lead = gain.shape[:-4]
+    x = x.reshape(lead + (nant, nant, nchan, nrec, nrec))[..., 0, 0]
+    xwt = xwt.reshape(lead + (nant, nant, nchan, nrec, nrec))[..., 0, 0]
     
-    residual = numpy.zeros([nchan, nrec, nrec])
-    sumwt = numpy.zeros([nchan, nrec, nrec])
-    
-    for chan in range(nchan):
-        lgain = gain[:, chan, 0, 0]
-        clgain = numpy.conjugate(lgain)
-        smueller = numpy.ma.outer(clgain, lgain).reshape([nant, nant])
-        error = x[:, :, chan, 0, 0] - smueller
-        for i in range(nant):
-            error[i,i]=0.0
-        residual += numpy.sum(error * xwt[:, :, chan, 0, 0] * numpy.conjugate(error)).real
-        sumwt += numpy.sum(xwt[:, :, chan, 0, 0])
-
-    residual[sumwt > 0.0] = numpy.sqrt(residual[sumwt > 0.0] / sumwt[sumwt > 0.0])
-    residual[sumwt <= 0.0] = 0.0
+    lgain = gain[..., 0, 0]
+    smueller = numpy.conjugate(lgain)[..., :, numpy.newaxis, :] * lgain[..., numpy.newaxis, :, :]
+    error = x - smueller
+    error[..., numpy.arange(nant), numpy.arange(nant), :] = 0.0
     
-    return residual
+    # The residual is summed over all channels
+    axes = (-3, -2, -1)
+    residual = numpy.sum(error * xwt * numpy.conjugate(error), axis=axes).real
+    sumwt = numpy.sum(xwt, axis=axes)
+    return _fill_residual(residual, sumwt, [nchan, nrec, nrec])
 
 
 def solution_residual_vector(gain, x, xwt):
@@ -337,37 +379,40 @@ def solution_residual_vector(gain, x, xwt):
     
     Vector case i.e. off-diagonals of gains are zero
 
-    :param gain: gain [nant, ...]
-    :param x: Point source equivalent visibility [nant, ...]
-    :param xwt: Point source equivalent weight [nant, ...]
-    :return: residual[...]
+    :param gain: gain [..., nant, ...]
+    :param x: Point source equivalent visibility [..., nant, ...]
+    :param xwt: Point source equivalent weight [..., nant, ...]
+    :return: residual[..., nchan, nrec, nrec]
     """
     
-    nants, nchan, nrec, _ = gain.shape
-    x = x.reshape(nants, nants, nchan, nrec, nrec)
-    x[..., 1, 0] = 0.0
-    x[..., 0, 1] = 0.0
-    
-    xwt = xwt.reshape(nants, nants, nchan, nrec, nrec)
-    xwt[..., 1, 0] = 0.0
-    xwt[..., 0, 1] = 0.0
-    
-    residual = numpy.zeros([nchan, nrec, nrec])
-    sumwt = numpy.zeros([nchan, nrec, nrec])
+    nants, nchan, nrec, _ = gain.shape[-4:]
+    lead = gain.shape[:-4]
+    x = numpy.diagonal(x.reshape(lead + (nants, nants, nchan, nrec, nrec)), axis1=-2, axis2=-1)
+    xwt = numpy.diagonal(xwt.reshape(lead + (nants, nants, nchan, nrec, nrec)), axis1=-2, axis2=-1)
     
-    for ant1 in range(nants):
-        for ant2 in range(nants):
-            for chan in range(nchan):
-                for rec in range(nrec):
-                    error = x[ant2, ant1, chan, rec, rec] - \
-                        gain[ant1, chan, rec, rec] * numpy.conjugate(gain[ant2, chan, rec, rec])
-                    residual += (error * xwt[ant2, ant1, chan, rec, rec] * numpy.conjugate(error)).real
-                    sumwt += xwt[ant2, ant1, chan, rec, rec]
+    lgain = numpy.diagonal(gain, axis1=-2, axis2=-1)
+    error = x - lgain[..., numpy.newaxis, :, :, :] * numpy.conjugate(lgain[..., :, numpy.newaxis, :, :])
     
+    # The residual is summed over all antennas, channels and receptors
+    axes = (-4, -3, -2, -1)
+    residual = numpy.sum((error * xwt * numpy.conjugate(error)).real, axis=axes)
+    sumwt = numpy.sum(xwt, axis=axes)
+    return _fill_residual(residual, sumwt, [nchan, nrec, nrec])
+
+
+def _fill_residual(residual, sumwt, shape):
+    """Normalise the summed residual and broadcast to the residual shape
+
+    :param residual: summed weighted squared error [...]
+    :param sumwt: sum of weights [...]
+    :param shape: shape of residual for one solution
+    :return: residual[..., shape]
+    """
+    residual = numpy.array(residual, dtype='float')
+    sumwt = numpy.array(sumwt, dtype='float')
     residual[sumwt > 0.0] = numpy.sqrt(residual[sumwt > 0.0] / sumwt[sumwt > 0.0])
     residual[sumwt <= 0.0] = 0.0
-    
-    return residual
+    return residual[..., numpy.newaxis, numpy.newaxis, numpy.newaxis] * numpy.ones(shape)
 
 
 def solution_residual_matrix(gain, x, xwt):
@@ -208,49 +208,60 @@ def frac_coord(npixel, kernel_oversampling, p):
     return flx.astype(int), fracx.astype(int)
 
 
-def weight_gridding(shape, visweights, vuvwmap, vfrequencymap, vpolarisationmap=None, weighting='uniform'):
+def weight_gridding(shape, visweights, vuvwmap, vfrequencymap, vpolarisationmap=None, weighting='uniform',
+                    robustness=0.0):
     """Reweight data using one of a number of algorithms
 
+    The density grid is summed with numpy.bincount over the flattened cell indices, counting each sample and its
+    conjugate, and read back for all samples with one gather. For robust (Briggs) weighting the weights are divided
+    by 1 + f**2 * density instead, with f**2 = (5 * 10**-robustness)**2 / (sum(density**2) / sum(density)) for each
+    channel and polarisation.
+
     :param shape:
     :param visweights: Visibility weights
     :param vuvwmap: map uvw to grid fractions
     :param vfrequencymap: map frequency to image channels
     :param vpolarisationmap: map polarisation to image polarisation
-    :param weighting: '' | 'uniform'
+    :param weighting: '' | 'uniform' | 'robust'
+    :param robustness: Briggs robustness parameter for robust weighting
     :return: visweights, density, densitygrid
     """
+    if weighting not in ['uniform', 'robust']:
+        return visweights, None, None
+
+    log.debug("weight_gridding: Performing %s weighting" % weighting)
+    inchan, inpol, ny, nx = shape
+    chan = numpy.array(vfrequencymap, dtype='int')
+
     densitygrid = numpy.zeros(shape, dtype='float')
-    if weighting == 'uniform':
-        log.debug("weight_gridding: Performing uniform weighting")
-        inchan, inpol, ny, nx = shape
-
-        wts = visweights[...]
-        # uvw -> fraction of grid mapping
-        for flip in [-1.0, 1.0]:
-            y, yf = frac_coord(ny, 1.0, flip * vuvwmap[:, 1])
-            x, xf = frac_coord(nx, 1.0, flip * vuvwmap[:, 0])
-            coords = list(vfrequencymap), x, y
-            for pol in range(inpol):
-                for vwt, chan, x, y in zip(wts, *coords):
-                    densitygrid[chan, pol, y, x] += vwt[..., pol]
-
-        # Find the total weight per sample counting redundancies with other samples
-        newvisweights = numpy.zeros_like(visweights)
-        density = numpy.zeros_like(visweights)
-        y, _ = frac_coord(ny, 1.0, vuvwmap[:, 1])
-        x, _ = frac_coord(nx, 1.0, vuvwmap[:, 0])
-        coords = list(vfrequencymap), x, y
+    # uvw -> fraction of grid mapping
+    for flip in [-1.0, 1.0]:
+        y, _ = frac_coord(ny, 1.0, flip * vuvwmap[:, 1])
+        x, _ = frac_coord(nx, 1.0, flip * vuvwmap[:, 0])
+        cells = (chan * ny + y) * nx + x
         for pol in range(inpol):
-            density[..., pol] += [densitygrid[chan, pol, y, x] for chan, x, y in zip(*coords)]
+            densitygrid[:, pol, ...] += numpy.bincount(cells, weights=visweights[..., pol],
+                                                       minlength=inchan * ny * nx).reshape([inchan, ny, nx])
+
+    # Find the total weight per sample counting redundancies with other samples
+    y, _ = frac_coord(ny, 1.0, vuvwmap[:, 1])
+    x, _ = frac_coord(nx, 1.0, vuvwmap[:, 0])
+    density = densitygrid[chan, :, y, x]
 
-        # Normalise each visibility weight to sum to one in a grid cell
-        if numpy.sum(density[:, 0] > 0.0) < visweights.shape[0]:
-            log.warning("weight_gridding: Losing samples in weighting")
+    # Normalise each visibility weight to sum to one in a grid cell
+    if numpy.sum(density[:, 0] > 0.0) < visweights.shape[0]:
+        log.warning("weight_gridding: Losing samples in weighting")
 
+    newvisweights = numpy.zeros_like(visweights)
+    if weighting == 'uniform':
         newvisweights[density > 0.0] = visweights[density > 0.0] / density[density > 0.0]
-        return newvisweights, density, densitygrid
     else:
-        return visweights, None, None
+        sumwt = numpy.sum(densitygrid, axis=(2, 3))
+        sumwt2 = numpy.sum(densitygrid ** 2, axis=(2, 3))
+        f2 = numpy.zeros_like(sumwt)
+        numpy.divide((5.0 * 10.0 ** -robustness) ** 2 * sumwt, sumwt2, out=f2, where=sumwt2 > 0.0)
+        newvisweights[density > 0.0] = visweights[density > 0.0] / (1.0 + f2[chan, :] * density)[density > 0.0]
+    return newvisweights, density, densitygrid
 
 
 def visibility_recentre(uvw, dl, dm):
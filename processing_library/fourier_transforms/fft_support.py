@@ -2,91 +2,437 @@
 
 """
 
+import collections
+import functools
+import multiprocessing
+import os
+import threading
+
 import numpy
 
 try:
     import pyfftw
-    # import multiprocessing
-    nthread = 4 #multiprocessing.cpu_count()
-    # Enable the PyFFTW cache
-    if not pyfftw.interfaces.cache.is_enabled():
-        pyfftw.interfaces.cache.enable()
-        pyfftw.interfaces.cache.set_keepalive_time(60)
 
     pyfftw_exists = True
 except ImportError:
+    import scipy.fft
+
     pyfftw_exists = False
 
 
+def fft_threads():
+    """ Number of threads to use in FFTs
+
+    This follows the CPU allocation of the process: OMP_NUM_THREADS if it is set (as done e.g. by Dask for its
+    workers), otherwise the number of CPUs the process may run on.
+
+    :return: Number of threads
+    """
+    try:
+        return max(1, int(os.environ["OMP_NUM_THREADS"]))
+    except (KeyError, ValueError):
+        pass
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return multiprocessing.cpu_count()
+
+
+nthread = fft_threads()
+
+
+def _centring_ramps(n, sign):
+    """ Phase ramps that turn an uncentred transform of length n into a centred one
+
+    The centred transform, with the zero frequency and the image centre at n // 2, is
+    fftshift(fft(ifftshift(a))) for sign=-1 and fftshift(ifft(ifftshift(a))) for sign=+1. This equals the
+    uncentred transform of a times the input ramp, times the output ramp. For even n the ramps are real (+1, -1).
+
+    :param n: Length of the axis
+    :param sign: Sign of the exponent of the transform (-1 forward, +1 inverse)
+    :return: input ramp, output ramp
+    """
+    c = n // 2
+    k = numpy.arange(n)
+    if n % 2 == 0:
+        ramp = 1.0 - 2.0 * (k % 2)
+        return ramp, ramp * (1.0 - 2.0 * (c % 2))
+    ramp = numpy.exp(-sign * 2j * numpy.pi * ((c * k) % n) / n)
+    return ramp, ramp * numpy.exp(sign * 2j * numpy.pi * ((c * c) % n) / n)
+
+
+@functools.lru_cache(maxsize=16)
+def _centring_ramps_2d(ny, nx, sign):
+    """ Phase ramps for the last two axes, see _centring_ramps
+
+    :return: input ramp, output ramp (read-only)
+    """
+    yin, yout = _centring_ramps(ny, sign)
+    xin, xout = _centring_ramps(nx, sign)
+    in_ramp = numpy.outer(yin, xin)
+    out_ramp = numpy.outer(yout, xout)
+    in_ramp.setflags(write=False)
+    out_ramp.setflags(write=False)
+    return in_ramp, out_ramp
+
+
+class FFTEngine:
+    """ Transforms of the last two axes with persistent plans and buffers
+
+    A plan, and the byte-aligned buffers it works in, are made on the first call for each (kind, shape) and kept
+    for later calls. The size of the kept buffers is bounded by max_size (GB): the least recently used plans are
+    dropped to make room, and a plan too large to keep is made with FFTW_ESTIMATE and dropped after use. The
+    centring shifts of fft and ifft are folded into phase ramps applied as the data are copied into and out of
+    the buffer, so no shifted copies are made. Without pyfftw, scipy.fft is used with the same buffers and ramps.
+
+    The complex transforms (fft, ifft) are planned with planner_effort since they are used for the repeated,
+    fixed size transforms of imaging. The real transforms (rfft2, irfft2, fft_real, ifft_real) are also used for
+    convolutions of arbitrary, often odd, shapes, so they are planned with real_planner_effort.
+
+    The buffers are reused, so an engine must not be shared between threads: use get_fft_engine to get one for
+    the current thread.
+    """
+
+    def __init__(self, threads=None, planner_effort='FFTW_MEASURE', real_planner_effort='FFTW_ESTIMATE',
+                 max_size=1.0):
+        """ Create an engine
+
+        :param threads: Number of threads per transform (def: fft_threads())
+        :param planner_effort: FFTW planner effort for complex transforms (def: FFTW_MEASURE)
+        :param real_planner_effort: FFTW planner effort for real transforms (def: FFTW_ESTIMATE)
+        :param max_size: Maximum size of the buffers of the kept plans (GB)
+        """
+        self.threads = threads if threads is not None else fft_threads()
+        self.planner_effort = planner_effort
+        self.real_planner_effort = real_planner_effort
+        self.max_size = max_size
+        self.size = 0.0
+        self.plans = collections.OrderedDict()
+
+    def _plan(self, key, size, make, effort):
+        """ Return the plan for key, making it with make(effort) if necessary
+
+        :param size: Size of the buffers of the plan (GB)
+        """
+        if key in self.plans:
+            self.plans.move_to_end(key)
+            return self.plans[key][1]
+        if size > self.max_size:
+            return make('FFTW_ESTIMATE')
+        while self.plans and self.size + size > self.max_size:
+            _, (evicted_size, _) = self.plans.popitem(last=False)
+            self.size -= evicted_size
+        plan = make(effort)
+        self.plans[key] = (size, plan)
+        self.size += size
+        return plan
+
+    def clear(self):
+        """ Drop all plans and their buffers
+        """
+        self.plans.clear()
+        self.size = 0.0
+
+    def _complex_plan(self, shape, sign):
+        size = numpy.prod(shape) * 16 / 1024.0 ** 3
+        return self._plan(('c2c', sign, shape), size, lambda effort: self._make_complex_plan(shape, sign, effort),
+                          self.planner_effort)
+
+    def _real_plan(self, shape, inverse):
+        size = (numpy.prod(shape) * 8 + numpy.prod(shape[:-1]) * (shape[-1] // 2 + 1) * 16) / 1024.0 ** 3
+        return self._plan(('c2r' if inverse else 'r2c', shape), size,
+                          lambda effort: self._make_real_plan(shape, inverse, effort), self.real_planner_effort)
+
+    def _make_complex_plan(self, shape, sign, effort):
+        ny, nx = shape[-2:]
+        in_ramp, out_ramp = _centring_ramps_2d(ny, nx, sign)
+        out_ramp = out_ramp.copy()
+        if sign > 0:
+            out_ramp /= nx * ny
+        if pyfftw_exists:
+            buffer = pyfftw.empty_aligned(shape, dtype='complex128')
+            direction = 'FFTW_FORWARD' if sign < 0 else 'FFTW_BACKWARD'
+            execute = pyfftw.FFTW(buffer, buffer, axes=(-2, -1), direction=direction,
+                                  flags=(effort,), threads=self.threads).execute
+        else:
+            buffer = numpy.empty(shape, dtype='complex128')
+            transform = scipy.fft.fft2 if sign < 0 else scipy.fft.ifft2
+            # scipy normalises the inverse transform, which the ramp also does
+            if sign > 0:
+                out_ramp *= nx * ny
+
+            def execute():
+                buffer[...] = transform(buffer, overwrite_x=True, workers=self.threads)
+        return buffer, execute, in_ramp, out_ramp
+
+    def _centred(self, a, sign):
+        buffer, execute, in_ramp, out_ramp = self._complex_plan(a.shape, sign)
+        numpy.multiply(a, in_ramp, out=buffer)
+        execute()
+        return buffer * out_ramp
+
+    def fft(self, a):
+        """ Centred transformation of the last two axes from image to grid space
+
+        Equivalent to fftshift(fft2(ifftshift(a))) on the last two axes.
+
+        :param a: image in `lm` coordinate space
+        :return: complex `uv` grid
+        """
+        return self._centred(a, -1)
+
+    def ifft(self, a):
+        """ Centred transformation of the last two axes from grid to image space
+
+        Equivalent to fftshift(ifft2(ifftshift(a))) on the last two axes.
+
+        :param a: `uv` grid to transform
+        :return: complex image in `lm` coordinate space
+        """
+        return self._centred(a, +1)
+
+    def _make_real_plan(self, shape, inverse, effort):
+        hshape = tuple(shape[:-1]) + (shape[-1] // 2 + 1,)
+        if pyfftw_exists:
+            rbuffer = pyfftw.empty_aligned(shape, dtype='float64')
+            cbuffer = pyfftw.empty_aligned(hshape, dtype='complex128')
+            if inverse:
+                execute = pyfftw.FFTW(cbuffer, rbuffer, axes=(-2, -1), direction='FFTW_BACKWARD',
+                                      flags=(effort,), threads=self.threads).execute
+            else:
+                execute = pyfftw.FFTW(rbuffer, cbuffer, axes=(-2, -1), direction='FFTW_FORWARD',
+                                      flags=(effort,), threads=self.threads).execute
+        else:
+            rbuffer = numpy.empty(shape, dtype='float64')
+            cbuffer = numpy.empty(hshape, dtype='complex128')
+            n = shape[-2] * shape[-1]
+
+            def execute():
+                if inverse:
+                    rbuffer[...] = scipy.fft.irfft2(cbuffer, shape[-2:], workers=self.threads) * n
+                else:
+                    cbuffer[...] = scipy.fft.rfft2(rbuffer, workers=self.threads)
+        return rbuffer, cbuffer, execute
+
+    @staticmethod
+    def _fill(buffer, a):
+        """ Copy a into buffer, cropping or padding the last two axes with zeroes as numpy.fft does"""
+        ny = min(buffer.shape[-2], a.shape[-2])
+        nx = min(buffer.shape[-1], a.shape[-1])
+        if (ny, nx) != buffer.shape[-2:]:
+            buffer[...] = 0.0
+        buffer[..., :ny, :nx] = a[..., :ny, :nx]
+
+    def rfft2(self, a, s=None):
+        """ Real-to-complex transformation of the last two axes
+
+        Only the non-negative frequencies of the last axis are returned. No shifts are applied.
+
+        :param a: real array
+        :param s: Shape of the transform (default is the shape of the last two axes of a)
+        :return: complex array with last axis of length s[1] // 2 + 1
+        """
+        shape = tuple(a.shape[:-2]) + (tuple(a.shape[-2:]) if s is None else tuple(s))
+        rbuffer, cbuffer, execute = self._real_plan(shape, False)
+        self._fill(rbuffer, a)
+        execute()
+        return cbuffer.copy()
+
+    def irfft2(self, a, s):
+        """ Complex-to-real inverse transformation of the last two axes
+
+        This is the inverse of rfft2. No shifts are applied.
+
+        :param a: complex array holding the non-negative frequencies of the last axis
+        :param s: Shape of the real output in the last two axes
+        :return: real array
+        """
+        shape = tuple(a.shape[:-2]) + tuple(s)
+        rbuffer, cbuffer, execute = self._real_plan(shape, True)
+        self._fill(cbuffer, a)
+        execute()
+        return rbuffer * (1.0 / (shape[-2] * shape[-1]))
+
+    def fft_real(self, a):
+        """ Centred transformation of the last two axes of a real image to grid space
+
+        This gives the same as fft(a), but only the non-negative frequencies of the last axis are transformed,
+        using a real-to-complex transform. The rest of the grid is filled by Hermitian symmetry. Odd sizes fall
+        back to fft.
+
+        :param a: real image in `lm` coordinate space
+        :return: complex `uv` grid
+        """
+        ny, nx = a.shape[-2:]
+        if ny % 2 or nx % 2:
+            return self.fft(a)
+        in_ramp, out_ramp = _centring_ramps_2d(ny, nx, -1)
+        rbuffer, cbuffer, execute = self._real_plan(a.shape, False)
+        numpy.multiply(a, in_ramp, out=rbuffer)
+        execute()
+        h = nx // 2
+        grid = numpy.empty(a.shape, dtype='complex128')
+        grid[..., :h + 1] = cbuffer
+        # The value at (-ky, -kx) is the conjugate of that at (ky, kx)
+        numpy.conjugate(cbuffer[..., 0, h - 1:0:-1], out=grid[..., 0, h + 1:])
+        numpy.conjugate(cbuffer[..., :0:-1, h - 1:0:-1], out=grid[..., 1:, h + 1:])
+        grid *= out_ramp
+        return grid
+
+    def ifft_real(self, a):
+        """ Real part of the centred transformation of the last two axes from grid to image space
+
+        This gives the same as ifft(a).real. The real part of the transform is the transform of the Hermitian part
+        of a, so a is folded onto the non-negative frequencies of the last axis and transformed using a
+        complex-to-real transform. Odd sizes fall back to ifft.
+
+        :param a: `uv` grid to transform
+        :return: real image in `lm` coordinate space
+        """
+        ny, nx = a.shape[-2:]
+        if ny % 2 or nx % 2:
+            return self.ifft(a).real
+        in_ramp, out_ramp = _centring_ramps_2d(ny, nx, +1)
+        rbuffer, cbuffer, execute = self._real_plan(a.shape, True)
+        h = nx // 2
+        # Fill with the conjugate of the value at (-ky, -kx) and add the value at (ky, kx)
+        numpy.conjugate(a[..., 0, 0], out=cbuffer[..., 0, 0])
+        numpy.conjugate(a[..., 0, :h - 1:-1], out=cbuffer[..., 0, 1:])
+        numpy.conjugate(a[..., :0:-1, 0], out=cbuffer[..., 1:, 0])
+        numpy.conjugate(a[..., :0:-1, :h - 1:-1], out=cbuffer[..., 1:, 1:])
+        cbuffer += a[..., :h + 1]
+        cbuffer *= 0.5 * in_ramp[:, :h + 1]
+        execute()
+        return rbuffer * (out_ramp / (nx * ny))
+
+
+_engines = threading.local()
+
+
+def get_fft_engine():
+    """ Return the FFTEngine of the current thread, creating it if necessary
+
+    :return: FFTEngine
+    """
+    engine = getattr(_engines, "engine", None)
+    if engine is None:
+        engine = FFTEngine()
+        _engines.engine = engine
+    return engine
+
+
+def set_fft_engine_threads(threads):
+    """ Set the number of threads per transform of the FFTEngine of the current thread
+
+    This is used when several threads or processes transform at once, so that together they do not use more
+    threads than there are CPUs. The plans of the engine are dropped if the number changes.
+
+    :param threads: Number of threads per transform
+    """
+    engine = get_fft_engine()
+    threads = max(1, int(threads))
+    if engine.threads != threads:
+        engine.clear()
+        engine.threads = threads
+
+
+def clear_fft_engine():
+    """ Drop the FFTEngine of the current thread, releasing its plans and buffers
+
+    A new engine is made on the next transform in this thread.
+    """
+    engine = getattr(_engines, "engine", None)
+    if engine is not None:
+        engine.clear()
+        _engines.engine = None
+
+
 def fft(a):
     """ Fourier transformation from image to grid space
-    
+
     .. note::
-    
-        If there are four axes then the last outer axes are not transformed
+
+        Only the last two axes are transformed
 
     :param a: image in `lm` coordinate space
     :return: `uv` grid
     """
-
-    if pyfftw_exists == False:
-        if (len(a.shape) == 4):
-            return numpy.fft.fftshift(numpy.fft.fft2(numpy.fft.ifftshift(a, axes=[2, 3])), axes=[2, 3])
-        if (len(a.shape) == 5):
-            return numpy.fft.fftshift(numpy.fft.fft2(numpy.fft.ifftshift(a, axes=[3, 4])), axes=[3, 4])
-        else:
-            return numpy.fft.fftshift(numpy.fft.fft2(numpy.fft.ifftshift(a)))
-    else:
-        if (len(a.shape) == 4):
-            b = pyfftw.interfaces.numpy_fft.fftshift(
-                pyfftw.interfaces.numpy_fft.fft2(pyfftw.interfaces.numpy_fft.ifftshift(a, axes=[2, 3]),
-                                                 auto_align_input=False, planner_effort='FFTW_MEASURE', threads=nthread), axes=[2, 3])
-        if (len(a.shape) == 5):
-            b = pyfftw.interfaces.numpy_fft.fftshift(
-                pyfftw.interfaces.numpy_fft.fft2(pyfftw.interfaces.numpy_fft.ifftshift(a, axes=[3, 4]),
-                                                 auto_align_input=False, planner_effort='FFTW_MEASURE', threads=nthread), axes=[3, 4])
-        else:
-            b = pyfftw.interfaces.numpy_fft.fftshift(
-                pyfftw.interfaces.numpy_fft.fft2(pyfftw.interfaces.numpy_fft.ifftshift(a), auto_align_input=False, threads=nthread,
-                                                 planner_effort='FFTW_MEASURE'))
-        return b
+    return get_fft_engine().fft(a)
 
 
 def ifft(a):
     """ Fourier transformation from grid to image space
 
     .. note::
-    
-        If there are four axes then the last outer axes are not transformed
+
+        Only the last two axes are transformed
 
     :param a: `uv` grid to transform
     :return: an image in `lm` coordinate space
     """
+    return get_fft_engine().ifft(a)
+
+
+def ifft_axis(a, axis=-1):
+    """ Inverse Fourier transformation along one axis
+
+    No shifts are applied. A new plan is made with FFTW_ESTIMATE for each call, rather than taken from an
+    FFTEngine, since the shapes vary between calls and this may be called from several threads at once.
+
+    :param a: array to transform
+    :param axis: Axis to transform
+    :return: complex array
+    """
     if pyfftw_exists == False:
-        if (len(a.shape) == 4):
-            return numpy.fft.fftshift(numpy.fft.ifft2(numpy.fft.ifftshift(a, axes=[2, 3])), axes=[2, 3])
-        elif (len(a.shape) == 5):
-            return numpy.fft.fftshift(numpy.fft.ifft2(numpy.fft.ifftshift(a, axes=[2, 3, 4])), axes=[2, 3, 4])
-        else:
-            return numpy.fft.fftshift(numpy.fft.ifft2(numpy.fft.ifftshift(a)))
+        return scipy.fft.ifft(a, axis=axis, workers=nthread)
     else:
-        # a = pyfftw.byte_align(a)
-        b = pyfftw.interfaces.numpy_fft.fftshift(
-            pyfftw.interfaces.numpy_fft.ifft2(pyfftw.interfaces.numpy_fft.ifftshift(a, axes=[2, 3]),
-                                              auto_align_input=False, planner_effort='FFTW_MEASURE'),
-            axes=[2, 3])
-        if (len(a.shape) == 4):
-            pass
-        elif (len(a.shape) == 5):
-            b = pyfftw.interfaces.numpy_fft.fftshift(
-                pyfftw.interfaces.numpy_fft.ifft2(pyfftw.interfaces.numpy_fft.ifftshift(a, axes=[2, 3, 4]),
-                                                  auto_align_input=False, planner_effort='FFTW_MEASURE'),
-                axes=[2, 3, 4])
-        else:
-            b = pyfftw.interfaces.numpy_fft.fftshift(
-                pyfftw.interfaces.numpy_fft.ifft2(pyfftw.interfaces.numpy_fft.ifftshift(a), auto_align_input=False,
-                                                  planner_effort='FFTW_MEASURE'))
-        return b
+        return pyfftw.builders.ifft(a, axis=axis, auto_align_input=False, avoid_copy=True, threads=nthread,
+                                    planner_effort='FFTW_ESTIMATE')()
+
+
+def rfft2(a, s=None):
+    """ Real-to-complex Fourier transformation of the last two axes
+
+    Only the non-negative frequencies of the last axis are returned. No shifts are applied.
+
+    :param a: real array
+    :param s: Shape of the transform (default is the shape of the last two axes of a)
+    :return: complex array with last axis of length s[1] // 2 + 1
+    """
+    return get_fft_engine().rfft2(a, s)
+
+
+def irfft2(a, s):
+    """ Complex-to-real inverse Fourier transformation of the last two axes
+
+    This is the inverse of rfft2. No shifts are applied.
+
+    :param a: complex array holding the non-negative frequencies of the last axis
+    :param s: Shape of the real output in the last two axes
+    :return: real array
+    """
+    return get_fft_engine().irfft2(a, s)
+
+
+def fft_real(a):
+    """ Fourier transformation of a real image to grid space
+
+    This is the same as fft(a) but uses real-to-complex transforms where possible.
+
+    :param a: real image in `lm` coordinate space
+    :return: `uv` grid
+    """
+    return get_fft_engine().fft_real(a)
+
+
+def ifft_real(a):
+    """ Real part of the Fourier transformation from grid to image space
+
+    This is the same as ifft(a).real but uses complex-to-real transforms where possible.
+
+    :param a: `uv` grid to transform
+    :return: real image in `lm` coordinate space
+    """
+    return get_fft_engine().ifft_real(a)
 
 
 def pad_mid(ff, npixel):
@@ -26,7 +26,9 @@ from processing_components.calibration.pointing import create_pointingtable_from
 from processing_components.imaging.base import predict_skycomponent_visibility
 from processing_components.simulation.testing_support import simulate_gaintable, create_test_image, simulate_pointingtable
 from processing_components.simulation.configurations import create_named_configuration
-from processing_components.visibility.base import create_visibility, create_blockvisibility
+from processing_components.visibility.base import create_visibility, create_blockvisibility, \
+    create_visibility_from_rows
+from processing_components.visibility.iterators import vis_timeslice_iter
 from processing_components.griddata.operations import create_griddata_from_image
 from processing_components.griddata.convolution_functions import create_convolutionfunction_from_image
 
@@ -97,6 +99,66 @@ class TestDataModelHelpers(unittest.TestCase):
         assert numpy.abs(newvis.configuration.location.z.value - self.vis.configuration.location.z.value) < 1e-15
         assert numpy.max(numpy.abs(newvis.configuration.xyz - self.vis.configuration.xyz)) < 1e-15
 
+    def test_readwriteblockvisibility_compact(self):
+        self.vis = create_blockvisibility(self.mid, self.times, self.frequency,
+                                          channel_bandwidth=self.channel_bandwidth,
+                                          phasecentre=self.phasecentre,
+                                          polarisation_frame=PolarisationFrame("linear"),
+                                          weight=1.0, compact=True)
+        self.vis = predict_skycomponent_visibility(self.vis, self.comp)
+        export_blockvisibility_to_hdf5(self.vis, '%s/test_data_model_helpers_blockvisibility_compact.hdf' % self.dir)
+        newvis = import_blockvisibility_from_hdf5('%s/test_data_model_helpers_blockvisibility_compact.hdf' % self.dir)
+
+        assert newvis.compact
+        assert numpy.array_equal(newvis.antenna1, self.vis.antenna1)
+        assert numpy.array_equal(newvis.antenna2, self.vis.antenna2)
+        for key in self.vis.data.dtype.fields:
+            assert numpy.max(numpy.abs(newvis.data[key]-self.vis.data[key])) < 1e-15
+        assert newvis.data.shape == self.vis.data.shape
+
+    def test_readwriteblockvisibility_lazy(self):
+        self.vis = create_blockvisibility(self.mid, self.times, self.frequency,
+                                          channel_bandwidth=self.channel_bandwidth,
+                                          phasecentre=self.phasecentre,
+                                          polarisation_frame=PolarisationFrame("linear"),
+                                          weight=1.0)
+        self.vis = predict_skycomponent_visibility(self.vis, self.comp)
+        export_blockvisibility_to_hdf5(self.vis, '%s/test_data_model_helpers_blockvisibility_chunked.hdf' % self.dir,
+                                       chunk_timeslices=1, compression='gzip')
+        newvis = import_blockvisibility_from_hdf5('%s/test_data_model_helpers_blockvisibility_chunked.hdf' %
+                                                  self.dir, lazy=True)
+        assert not isinstance(newvis.data, numpy.ndarray)
+        assert newvis.nvis == self.vis.nvis
+        assert newvis.nchan == self.vis.nchan
+        assert newvis.nants == self.vis.nants
+        with newvis.data:
+            for rows in vis_timeslice_iter(newvis):
+                visslice = create_visibility_from_rows(newvis, rows)
+                assert isinstance(visslice.data, numpy.ndarray)
+                assert numpy.max(numpy.abs(visslice.vis - self.vis.vis[rows])) < 1e-15
+                assert numpy.max(numpy.abs(visslice.uvw - self.vis.uvw[rows])) < 1e-15
+                visslice.data['vis'][...] = 0.0
+            # Writes to the lazy data would be lost, so they raise
+            with self.assertRaises(ValueError):
+                newvis.data['vis'][...] = 0.0
+            with self.assertRaises(ValueError):
+                newvis.data['vis'] = 0.0
+
+    def test_readwritevisibility_mmap(self):
+        self.vis = create_visibility(self.mid, self.times, self.frequency,
+                                     channel_bandwidth=self.channel_bandwidth,
+                                     phasecentre=self.phasecentre,
+                                     polarisation_frame=PolarisationFrame("linear"),
+                                     weight=1.0)
+        self.vis = predict_skycomponent_visibility(self.vis, self.comp)
+        export_visibility_to_hdf5(self.vis, '%s/test_data_model_helpers_visibility_mmap.hdf' % self.dir)
+        newvis = import_visibility_from_hdf5('%s/test_data_model_helpers_visibility_mmap.hdf' % self.dir, mmap=True)
+        assert isinstance(newvis.data, numpy.memmap)
+        for key in self.vis.data.dtype.fields:
+            assert numpy.max(numpy.abs(newvis.data[key]-self.vis.data[key])) < 1e-15
+        with self.assertRaises(ValueError):
+            newvis.data['vis'][...] = 0.0
+
     def test_readwritegaintable(self):
         self.vis = create_blockvisibility(self.mid, self.times, self.frequency,
                                           channel_bandwidth=self.channel_bandwidth,
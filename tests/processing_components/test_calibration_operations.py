@@ -17,7 +17,8 @@ from processing_components.calibration.operations import gaintable_summary, appl
     create_gaintable_from_rows
 from processing_components.simulation.testing_support import simulate_gaintable
 from processing_components.simulation.configurations import create_named_configuration
-from processing_components.visibility.base import copy_visibility, create_blockvisibility
+from processing_components.visibility.base import copy_visibility, create_blockvisibility, \
+    convert_blockvisibility_to_compact
 from processing_components.imaging.base import predict_skycomponent_visibility
 
 log = logging.getLogger(__name__)
@@ -124,6 +125,41 @@ class TestCalibrationOperations(unittest.TestCase):
             error = numpy.max(numpy.abs(vis.vis - original.vis))
             assert error < 1e-12, "Error = %s" % (error)
 
+    def test_apply_gaintable_polarised_leakage(self):
+        self.actualSetup('stokesIQUV', 'linear')
+        gt = create_gaintable_from_blockvisibility(self.vis, timeslice='auto')
+        gt = simulate_gaintable(gt, phase_error=0.1, amplitude_error=0.1, leakage=0.1)
+        gt.data['weight'][:, 3, ...] = 0.0
+        original = copy_visibility(self.vis)
+        vis = apply_gaintable(copy_visibility(self.vis), gt)
+        for a1, a2 in [(0, 1), (2, 7), (3, 5)]:
+            mueller = numpy.kron(gt.gain[0, a1, 1], numpy.conjugate(gt.gain[0, a2, 1]))
+            expected = numpy.matmul(mueller, original.vis[0, a2, a1, 1])
+            if a1 == 3:
+                expected[0] = 0.0
+            error = numpy.max(numpy.abs(vis.vis[0, a2, a1, 1] - expected))
+            assert error < 1e-12, "Error = %s" % (error)
+        gt.data['weight'][...] = 1.0
+        vis = apply_gaintable(copy_visibility(self.vis), gt)
+        vis = apply_gaintable(vis, gt, inverse=True)
+        error = numpy.max(numpy.abs(vis.vis - original.vis))
+        assert error < 1e-12, "Error = %s" % (error)
+
+    def test_apply_gaintable_compact(self):
+        for spf, dpf in[('stokesI', 'stokesI'), ('stokesIQUV', 'linear')]:
+            self.actualSetup(spf, dpf)
+            gt = create_gaintable_from_blockvisibility(self.vis, timeslice='auto')
+            gt = simulate_gaintable(gt, phase_error=0.1, amplitude_error=0.1)
+            compact = convert_blockvisibility_to_compact(self.vis)
+            original = copy_visibility(compact)
+            vis = apply_gaintable(copy_visibility(self.vis), gt)
+            compact = apply_gaintable(compact, gt)
+            error = numpy.max(numpy.abs(compact.vis - vis.vis[:, compact.antenna2, compact.antenna1, ...]))
+            assert error < 1e-12, "Error = %s" % (error)
+            compact = apply_gaintable(compact, gt, inverse=True)
+            error = numpy.max(numpy.abs(compact.vis - original.vis))
+            assert error < 1e-12, "Error = %s" % (error)
+
     def test_apply_gaintable_null(self):
         for spf, dpf in[('stokesI', 'stokesI'), ('stokesIQUV', 'linear'), ('stokesIQUV', 'circular')]:
             self.actualSetup(spf, dpf)
@@ -17,7 +17,8 @@ from processing_components.calibration.operations import apply_gaintable, create
 from processing_components.imaging.base import predict_skycomponent_visibility
 from processing_components.simulation.testing_support import simulate_gaintable
 from processing_components.simulation.configurations import create_named_configuration
-from processing_components.visibility.base import copy_visibility, create_blockvisibility
+from processing_components.visibility.base import copy_visibility, create_blockvisibility, \
+    convert_blockvisibility_to_compact, create_visibility_from_rows
 from processing_components.visibility.operations import divide_visibility
 
 log = logging.getLogger(__name__)
@@ -64,6 +65,21 @@ class TestCalibrationSolvers(unittest.TestCase):
         assert residual < 3e-8, "Max residual = %s" % (residual)
         assert numpy.max(numpy.abs(gtsol.gain - 1.0)) > 0.1
 
+    def test_solve_gaintable_scalar_compact(self):
+        self.actualSetup('stokesI', 'stokesI', f=[100.0])
+        gt = create_gaintable_from_blockvisibility(self.vis)
+        gt = simulate_gaintable(gt, phase_error=10.0, amplitude_error=0.0)
+        original = convert_blockvisibility_to_compact(self.vis)
+        self.vis = apply_gaintable(self.vis, gt)
+        gtsol = solve_gaintable(self.vis, None, phase_only=True, niter=200)
+        compact = apply_gaintable(copy_visibility(original), gt)
+        assert compact.compact
+        cgtsol = solve_gaintable(compact, None, phase_only=True, niter=200)
+        assert numpy.max(numpy.abs(cgtsol.gain - gtsol.gain)) < 1e-12
+        cgtsol = solve_gaintable(compact, original, phase_only=True, niter=200)
+        residual = numpy.max(cgtsol.residual)
+        assert residual < 3e-8, "Max residual = %s" % (residual)
+
     def test_solve_gaintable_scalar_timeslice(self):
         self.actualSetup('stokesI', 'stokesI', f=[100.0], ntimes=10)
         gt = create_gaintable_from_blockvisibility(self.vis, timeslice=120.0)
@@ -76,6 +92,22 @@ class TestCalibrationSolvers(unittest.TestCase):
         assert residual < 3e-8, "Max residual = %s" % (residual)
         assert numpy.max(numpy.abs(gtsol.gain - 1.0)) > 0.1
 
+    def test_solve_gaintable_intervals_independent(self):
+        for spf, dpf in [('stokesI', 'stokesI'), ('stokesIQUV', 'linear')]:
+            self.actualSetup(spf, dpf, ntimes=4)
+            gt = create_gaintable_from_blockvisibility(self.vis)
+            gt = simulate_gaintable(gt, phase_error=10.0, amplitude_error=0.1)
+            original = copy_visibility(self.vis)
+            self.vis = apply_gaintable(self.vis, gt)
+            gtsol = solve_gaintable(self.vis, original, phase_only=False, niter=200)
+            # Each solution interval must converge exactly as if solved on its own
+            for row, time in enumerate(self.vis.time):
+                rows = self.vis.time == time
+                gtrow = solve_gaintable(create_visibility_from_rows(self.vis, rows),
+                                        create_visibility_from_rows(original, rows), phase_only=False, niter=200)
+                assert numpy.max(numpy.abs(gtrow.gain[0] - gtsol.gain[row])) < 1e-12
+                assert numpy.max(numpy.abs(gtrow.residual[0] - gtsol.residual[row])) < 1e-12
+
     def test_solve_gaintable_scalar_normalise(self):
         self.actualSetup('stokesI', 'stokesI', f=[100.0])
         gt = create_gaintable_from_blockvisibility(self.vis)
@@ -18,7 +18,7 @@ from processing_components.griddata.convolution_functions import convert_convolu
 from processing_components.griddata.gridding import grid_visibility_to_griddata, \
     fft_griddata_to_image, fft_image_to_griddata, \
     degrid_visibility_from_griddata, grid_weight_to_griddata, griddata_merge_weights, griddata_reweight, \
-    grid_visibility_to_griddata_fast
+    grid_visibility_to_griddata_fast, grid_visibility_to_griddata_batch, create_gridding_plan
 from processing_components.griddata.operations import create_griddata_from_image
 from processing_components.image.operations import export_image_to_fits
 from processing_components.image.operations import smooth_image
@@ -125,6 +125,31 @@ class TestGridDataGridding(unittest.TestCase):
             export_image_to_fits(im, '%s/test_gridding_dirty_pswf_w.fits' % self.dir)
         self.check_peaks(im, 97.01838776845877, tol=1e-7)
     
+    def test_griddata_invert_pswf_batch(self):
+        self.actualSetUp(zerow=False)
+        gcf, cf = create_pswf_convolutionfunction(self.model, support=6, oversampling=32)
+        griddata = create_griddata_from_image(self.model)
+        griddata, sumwt = grid_visibility_to_griddata_batch(self.vis, griddata=griddata, cf=cf)
+        im = fft_griddata_to_image(griddata, gcf)
+        im = normalize_sumwt(im, sumwt)
+        self.check_peaks(im, 97.01838776845877, tol=1e-7)
+        loop_griddata = create_griddata_from_image(self.model)
+        loop_griddata, loop_sumwt = grid_visibility_to_griddata(self.vis, griddata=loop_griddata, cf=cf)
+        numpy.testing.assert_array_almost_equal(griddata.data, loop_griddata.data, 7)
+        numpy.testing.assert_array_almost_equal(sumwt, loop_sumwt, 7)
+    
+    def test_griddata_invert_awterm_batch(self):
+        self.actualSetUp(zerow=False)
+        gcf, cf = create_awterm_convolutionfunction(self.model, nw=21, wstep=40.0, oversampling=4, support=16,
+                                                    use_aaf=True)
+        griddata = create_griddata_from_image(self.model, nw=21, wstep=40.0)
+        griddata, sumwt = grid_visibility_to_griddata_batch(self.vis, griddata=griddata, cf=cf,
+                                                            max_elements=2 ** 16)
+        loop_griddata = create_griddata_from_image(self.model, nw=21, wstep=40.0)
+        loop_griddata, loop_sumwt = grid_visibility_to_griddata(self.vis, griddata=loop_griddata, cf=cf)
+        numpy.testing.assert_array_almost_equal(griddata.data, loop_griddata.data, 7)
+        numpy.testing.assert_array_almost_equal(sumwt, loop_sumwt, 7)
+
     def test_griddata_invert_aterm(self):
         self.actualSetUp(zerow=True)
         make_pb = functools.partial(create_pb_generic, diameter=35.0, blockage=0.0, use_local=False)
@@ -231,6 +256,18 @@ class TestGridDataGridding(unittest.TestCase):
         qa = qa_visibility(newvis)
         assert qa.data['rms'] < 0.7, str(qa)
     
+    def test_griddata_predict_edge(self):
+        self.actualSetUp(zerow=True)
+        # The longest baselines put the kernel across the edge of the grid
+        umax = numpy.max(numpy.abs(numpy.concatenate([self.vis.u, self.vis.v])))
+        model = create_unittest_model(self.vis, self.image_pol, cellsize=0.49 / umax, npixel=64, nchan=1)
+        gcf, cf = create_pswf_convolutionfunction(model, support=8, oversampling=8)
+        griddata = create_griddata_from_image(model)
+        with self.assertRaises(AssertionError):
+            degrid_visibility_from_griddata(self.vis, griddata=griddata, cf=cf)
+        with self.assertRaises(AssertionError):
+            grid_visibility_to_griddata_batch(self.vis, griddata=griddata, cf=cf)
+
     def test_griddata_predict_box(self):
         self.actualSetUp(zerow=True)
         gcf, cf = create_box_convolutionfunction(self.model)
@@ -294,6 +331,32 @@ class TestGridDataGridding(unittest.TestCase):
             export_image_to_fits(im, '%s/test_gridding_dirty_2d_uniform.fits' % self.dir)
         self.check_peaks(im, 99.40822097133994)
     
+    def test_griddata_plan(self):
+        self.actualSetUp(zerow=True)
+        gcf, cf = create_pswf_convolutionfunction(self.model, support=6, oversampling=32)
+        griddata = create_griddata_from_image(self.model)
+        plan = create_gridding_plan(self.vis, griddata, cf)
+        mapping = plan.mapping
+        
+        plan_griddata, plan_sumwt = grid_visibility_to_griddata(self.vis, griddata=griddata, cf=cf, plan=plan)
+        loop_griddata = create_griddata_from_image(self.model)
+        loop_griddata, loop_sumwt = grid_visibility_to_griddata(self.vis, griddata=loop_griddata, cf=cf)
+        numpy.testing.assert_array_equal(plan_griddata.data, loop_griddata.data)
+        
+        griddata = create_griddata_from_image(self.model)
+        griddata = fft_image_to_griddata(self.model, griddata, gcf)
+        plan_vis = degrid_visibility_from_griddata(self.vis, griddata=griddata, cf=cf, plan=plan)
+        newvis = degrid_visibility_from_griddata(self.vis, griddata=griddata, cf=cf)
+        numpy.testing.assert_array_equal(plan_vis.vis, newvis.vis)
+        assert plan.mapping is mapping
+        
+        # Changing the uvw invalidates the plan
+        self.vis.data['uvw'][0, 0] += 1.0
+        assert not plan.is_valid(self.vis, griddata, cf)
+        degrid_visibility_from_griddata(self.vis, griddata=griddata, cf=cf, plan=plan)
+        assert plan.mapping is not mapping
+        assert plan.is_valid(self.vis, griddata, cf)
+    
     def plot_vis(self, newvis, title=''):
         if self.doplot:
             import matplotlib.pyplot as plt
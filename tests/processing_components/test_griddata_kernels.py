@@ -14,7 +14,8 @@ from data_models.polarisation import PolarisationFrame
 
 from processing_library.image.operations import create_image
 from processing_components.griddata.kernels  import create_pswf_convolutionfunction, \
-    create_awterm_convolutionfunction, create_box_convolutionfunction
+    create_awterm_convolutionfunction, create_box_convolutionfunction, cached_pswf_convolutionfunction, \
+    cached_awterm_convolutionfunction, convolutionfunction_cache, ConvolutionFunctionCache
 from processing_components.griddata.convolution_functions import convert_convolutionfunction_to_image, \
     create_convolutionfunction_from_image, apply_bounding_box_convolutionfunction, \
     calculate_bounding_box_convolutionfunction
@@ -295,6 +296,14 @@ class TestGridDataKernels(unittest.TestCase):
         p2 = (0, 0, 55+30, 4, 4, 35, 35)
         assert numpy.abs(cf.data[p1] - numpy.conjugate(cf.data[p2])) < 1e-15
 
+    def test_fill_wterm_chunks_workers(self):
+        _, cf = create_awterm_convolutionfunction(self.image, nw=11, wstep=8, oversampling=8, support=30)
+        # One w plane per chunk, calculated serially and in threads
+        for max_workers in [1, 4]:
+            _, cf_chunked = create_awterm_convolutionfunction(self.image, nw=11, wstep=8, oversampling=8, support=30,
+                                                              max_elements=1, max_workers=max_workers)
+            numpy.testing.assert_array_equal(cf.data, cf_chunked.data)
+
     def test_fill_aterm_to_convolutionfunction_noover(self):
         make_pb = functools.partial(create_pb_generic, diameter=35.0, blockage=0.0, use_local=False)
         pb = make_pb(self.image)
@@ -326,6 +335,55 @@ class TestGridDataKernels(unittest.TestCase):
         peak_location = numpy.unravel_index(numpy.argmax(numpy.abs(cf_clipped.data)), cf_clipped.shape)
         assert peak_location == (0, 0, 0, 0, 0, 5, 5), peak_location
 
+    def test_cached_pswf_convolutionfunction(self):
+        convolutionfunction_cache.clear()
+        gcf, cf = create_pswf_convolutionfunction(self.image, oversampling=8, support=6)
+        cached_gcf, cached_cf = cached_pswf_convolutionfunction(self.image, oversampling=8, support=6)
+        assert convolutionfunction_cache.misses == 1, convolutionfunction_cache.info()
+        assert convolutionfunction_cache.hits == 0, convolutionfunction_cache.info()
+        numpy.testing.assert_array_equal(cf.data, cached_cf.data)
+        numpy.testing.assert_array_equal(gcf.data, cached_gcf.data)
+        
+        # A facet with a different phasecentre but the same shape and cellsize shares the kernel
+        facet = create_image(npixel=512, cellsize=0.0005, polarisation_frame=PolarisationFrame("stokesI"),
+                             phasecentre=SkyCoord(ra=+181.0 * u.deg, dec=-60.0 * u.deg, frame='icrs',
+                                                  equinox='J2000'))
+        facet_gcf, facet_cf = cached_pswf_convolutionfunction(facet, oversampling=8, support=6)
+        assert convolutionfunction_cache.hits == 1, convolutionfunction_cache.info()
+        assert facet_cf.data is cached_cf.data
+        assert facet_cf.projection_wcs.wcs.crval[0] == facet.wcs.wcs.crval[0]
+        
+        cached_pswf_convolutionfunction(self.image, oversampling=16, support=6)
+        assert convolutionfunction_cache.misses == 2, convolutionfunction_cache.info()
+        assert convolutionfunction_cache.info()['entries'] == 2, convolutionfunction_cache.info()
+        convolutionfunction_cache.clear()
+    
+    def test_cached_awterm_convolutionfunction(self):
+        convolutionfunction_cache.clear()
+        _, cf = create_awterm_convolutionfunction(self.image, nw=11, wstep=8.0, oversampling=4, support=16)
+        for i in range(3):
+            _, cached_cf = cached_awterm_convolutionfunction(self.image, nw=11, wstep=8.0, oversampling=4,
+                                                             support=16)
+            numpy.testing.assert_array_equal(cf.data, cached_cf.data)
+        assert convolutionfunction_cache.hits == 2, convolutionfunction_cache.info()
+        assert convolutionfunction_cache.misses == 1, convolutionfunction_cache.info()
+        convolutionfunction_cache.clear()
+    
+    def test_convolutionfunction_cache_eviction(self):
+        gcfcf = create_pswf_convolutionfunction(self.image, oversampling=8, support=6)
+        size = gcfcf[1].size()
+        cache = ConvolutionFunctionCache(max_size=2.5 * size)
+        cache.put('a', gcfcf)
+        cache.put('b', gcfcf)
+        assert cache.get('a') is not None
+        cache.put('c', gcfcf)
+        assert cache.get('b') is None
+        assert cache.get('a') is not None
+        assert cache.get('c') is not None
+        assert cache.info()['entries'] == 2, cache.info()
+        assert cache.hits == 3 and cache.misses == 1, cache.info()
+        numpy.testing.assert_almost_equal(cache.size, 2 * size)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -12,7 +12,7 @@ from astropy.coordinates import SkyCoord
 from data_models.polarisation import PolarisationFrame
 
 from processing_library.arrays.cleaners import overlapIndices
-from processing_library.image.operations import create_image_from_array
+from processing_library.image.operations import create_image_from_array, copy_image
 
 from processing_components.image.deconvolution import deconvolve_cube, restore_cube
 from processing_components.image.operations import export_image_to_fits
@@ -78,6 +78,14 @@ class TestImageDeconvolution(unittest.TestCase):
         export_image_to_fits(self.cmodel, "%s/test_deconvolve_hogbom-clean.fits" % (self.dir))
         assert numpy.max(self.residual.data) < 1.2
 
+    def test_deconvolve_clark(self):
+        self.comp, self.residual = deconvolve_cube(self.dirty, self.psf, niter=10000, gain=0.1, algorithm='clark',
+                                                   threshold=0.01)
+        export_image_to_fits(self.residual, "%s/test_deconvolve_clark-residual.fits" % (self.dir))
+        self.cmodel = restore_cube(self.comp, self.psf, self.residual)
+        export_image_to_fits(self.cmodel, "%s/test_deconvolve_clark-clean.fits" % (self.dir))
+        assert numpy.max(self.residual.data) < 1.2
+
     def test_deconvolve_msclean(self):
         self.comp, self.residual = deconvolve_cube(self.dirty, self.psf, niter=1000, gain=0.7, algorithm='msclean',
                                                    scales=[0, 3, 10, 30], threshold=0.01)
@@ -97,6 +105,26 @@ class TestImageDeconvolution(unittest.TestCase):
         export_image_to_fits(self.cmodel, "%s/test_deconvolve_msclean_1scale-clean.fits" % (self.dir))
         assert numpy.max(self.residual.data) < 1.2
 
+    def test_deconvolve_parallel_planes(self):
+        # Make a four channel cube with different planes
+        scale = numpy.array([1.0, 0.5, 2.0, 0.0])
+        dirty = copy_image(self.dirty)
+        dirty.data = scale[:, numpy.newaxis, numpy.newaxis, numpy.newaxis] * self.dirty.data
+        psf = copy_image(self.psf)
+        psf.data = numpy.repeat(self.psf.data, 4, axis=0)
+        psf.data[3] = 0.0
+        for algorithm in ['hogbom', 'msclean']:
+            comp, residual = deconvolve_cube(dirty, copy_image(psf), niter=100, gain=0.1, algorithm=algorithm,
+                                             scales=[0, 3], threshold=0.01, window_shape='quarter')
+            for executor in ['thread', 'process']:
+                pcomp, presidual = deconvolve_cube(dirty, copy_image(psf), niter=100, gain=0.1,
+                                                   algorithm=algorithm, scales=[0, 3], threshold=0.01,
+                                                   window_shape='quarter', max_workers=4, executor=executor)
+                numpy.testing.assert_array_equal(comp.data, pcomp.data)
+                numpy.testing.assert_array_equal(residual.data, presidual.data)
+            assert numpy.max(numpy.abs(comp.data[3])) == 0.0
+            assert numpy.max(numpy.abs(comp.data[0])) > 0.0
+
     def test_deconvolve_hogbom_no_edge(self):
         self.comp, self.residual = deconvolve_cube(self.dirty, self.psf, window_shape='no_edge', niter=10000,
                                                    gain=0.1, algorithm='hogbom', threshold=0.01)
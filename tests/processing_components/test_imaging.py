@@ -22,7 +22,8 @@ from processing_components.skycomponent.operations import find_skycomponents, fi
 from processing_components.imaging.primary_beams import create_pb_generic
 from processing_components.imaging.weighting import taper_visibility_gaussian, taper_visibility_tukey, \
     weight_visibility
-from processing_components.griddata.kernels import create_awterm_convolutionfunction
+from processing_components.griddata.kernels import create_awterm_convolutionfunction, cached_pswf_convolutionfunction
+from processing_components.imaging.wprojection import wprojection_gcfcf
 
 log = logging.getLogger(__name__)
 
@@ -167,6 +168,20 @@ class TestImaging(unittest.TestCase):
                                                     oversampling=8, support=100, use_aaf=True)
         self._invert_base(name='invert_wterm', positionthreshold=35.0, check_components=False, gcfcf = gcfcf)
 
+    def test_wprojection_gcfcf(self):
+        self.actualSetUp(zerow=False)
+        # The plain PSWF kernel is replaced by w-projection kernels
+        for gcfcf in [None, cached_pswf_convolutionfunction(self.model)]:
+            gcf, cf = wprojection_gcfcf(self.vis, self.model, gcfcf)
+            assert cf.shape[2] > 1
+        # Other kernels without w planes are used as given
+        make_pb = functools.partial(create_pb_generic, diameter=35.0, blockage=0.0, use_local=False)
+        gcfcf = create_awterm_convolutionfunction(self.model, make_pb=make_pb, nw=1, oversampling=4, support=16,
+                                                  use_aaf=False)
+        with self.assertLogs('processing_components.imaging.wprojection', level='WARNING'):
+            gcf, cf = wprojection_gcfcf(self.vis, self.model, gcfcf)
+        assert cf is gcfcf[1]
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -57,6 +57,28 @@ class TestNoise(unittest.TestCase):
         actual = numpy.std(numpy.abs(self.vis.vis - original.vis))
         assert abs(actual - 0.01077958403015586) < 1e-4, actual
 
+    def test_addnoise_blockvisibility_compact(self):
+        self.vis = create_blockvisibility(self.config, self.times, self.frequency, phasecentre=self.phasecentre,
+                                          weight=1.0, polarisation_frame=PolarisationFrame('stokesIQUV'),
+                                          channel_bandwidth=self.channel_bandwidth, compact=True)
+        assert self.vis.compact
+        original = copy_visibility(self.vis)
+        self.vis = addnoise_visibility(self.vis, seed=1234)
+        actual = numpy.std(numpy.abs(self.vis.vis - original.vis))
+        assert abs(actual - 0.01077958403015586) < 1e-4, actual
+
+    def test_addnoise_blockvisibility_seed(self):
+        self.vis = create_blockvisibility(self.config, self.times, self.frequency, phasecentre=self.phasecentre,
+                                          weight=1.0, polarisation_frame=PolarisationFrame('stokesIQUV'),
+                                          channel_bandwidth=self.channel_bandwidth)
+        # Chunks seeded from children of one SeedSequence are reproducible and independent
+        seeds = numpy.random.SeedSequence(1234).spawn(2) + numpy.random.SeedSequence(1234).spawn(1)
+        noise = [addnoise_visibility(copy_visibility(self.vis, zero=True), seed=seed).vis for seed in seeds]
+        numpy.testing.assert_array_equal(noise[0], noise[2])
+        assert numpy.max(numpy.abs(noise[0] - noise[1])) > 0.0
+        ant2, ant1 = numpy.tril_indices(self.vis.nants, -1)
+        numpy.testing.assert_array_equal(noise[0][:, ant1, ant2], numpy.conjugate(noise[0][:, ant2, ant1]))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -15,7 +15,8 @@ from processing_components.imaging.base import create_image_from_visibility
 from processing_components.simulation.configurations import create_named_configuration
 from processing_components.visibility.coalesce import coalesce_visibility, decoalesce_visibility, \
     convert_blockvisibility_to_visibility
-from processing_components.visibility.base import create_blockvisibility, create_visibility_from_rows
+from processing_components.visibility.base import create_blockvisibility, create_visibility_from_rows, \
+    convert_blockvisibility_to_compact, convert_blockvisibility_to_square
 from processing_components.visibility.iterators import vis_timeslice_iter
 from processing_components.imaging.weighting import weight_visibility
 
@@ -66,6 +67,72 @@ class TestCoalesce(unittest.TestCase):
         dvis = decoalesce_visibility(cvis)
         assert dvis.nvis == self.blockvis.nvis
 
+    def test_convert_decoalesce_values(self):
+        blockvis = create_blockvisibility(self.lowcore, self.times, self.frequency, phasecentre=self.phasecentre,
+                                          weight=1.0, polarisation_frame=PolarisationFrame('linear'),
+                                          channel_bandwidth=self.channel_bandwidth, compact=True)
+        blockvis.data['vis'] = numpy.random.standard_normal(blockvis.vis.shape)
+        blockvis.data['weight'] = numpy.random.uniform(size=blockvis.vis.shape)
+        cvis = convert_blockvisibility_to_visibility(blockvis)
+        cvis.data['vis'] *= 2.0
+        dvis = decoalesce_visibility(cvis)
+        assert numpy.array_equal(dvis.vis, 2.0 * blockvis.vis)
+        assert numpy.array_equal(dvis.weight, blockvis.weight)
+
+    def test_convert_compact(self):
+        compact = convert_blockvisibility_to_compact(self.blockvis)
+        assert compact.compact
+        assert compact.nants == self.blockvis.nants
+        assert compact.nbaselines == self.blockvis.nants * (self.blockvis.nants - 1) // 2
+        assert compact.size() < 0.5 * self.blockvis.size()
+        square = convert_blockvisibility_to_square(compact)
+        assert not square.compact
+        assert numpy.array_equal(square.uvw, self.blockvis.uvw)
+        
+        created = create_blockvisibility(self.lowcore, self.times, self.frequency, phasecentre=self.phasecentre,
+                                         weight=1.0, polarisation_frame=PolarisationFrame('stokesI'),
+                                         channel_bandwidth=self.channel_bandwidth, compact=True)
+        assert numpy.array_equal(created.antenna1, compact.antenna1)
+        assert numpy.array_equal(created.antenna2, compact.antenna2)
+        assert numpy.max(numpy.abs(created.uvw - compact.uvw)) < 1e-12
+
+    def test_convert_decoalesce_compact(self):
+        cvis = convert_blockvisibility_to_visibility(self.blockvis)
+        compact = convert_blockvisibility_to_compact(self.blockvis)
+        ccvis = convert_blockvisibility_to_visibility(compact)
+        assert ccvis.nvis == cvis.nvis
+        assert numpy.array_equal(ccvis.antenna1, cvis.antenna1)
+        assert numpy.array_equal(ccvis.antenna2, cvis.antenna2)
+        assert numpy.array_equal(ccvis.uvw, cvis.uvw)
+        dvis = decoalesce_visibility(ccvis)
+        assert dvis.compact
+        assert dvis.nvis == compact.nvis
+
+    def test_coalesce_decoalesce_compact(self):
+        compact = convert_blockvisibility_to_compact(self.blockvis)
+        cvis = coalesce_visibility(compact, time_coal=1.0, frequency_coal=1.0)
+        assert numpy.min(cvis.frequency) == numpy.min(self.frequency)
+        assert numpy.all(cvis.antenna2 > cvis.antenna1)
+        assert cvis.nvis < convert_blockvisibility_to_visibility(compact).nvis
+        dvis = decoalesce_visibility(cvis)
+        assert dvis.compact
+        assert dvis.nvis == compact.nvis
+
+    def test_coalesce_index(self):
+        compact = convert_blockvisibility_to_compact(self.blockvis)
+        cvis = coalesce_visibility(compact, time_coal=1.0, frequency_coal=1.0)
+        ntimes, nbaselines, nchan, _ = compact.vis.shape
+        rows = cvis.cindex.reshape([ntimes, nbaselines, nchan])
+        # Each sample points to a row of its own baseline, holding the average of the samples pointing to it
+        assert numpy.array_equal(cvis.antenna1[rows], numpy.broadcast_to(compact.antenna1[:, numpy.newaxis],
+                                                                          rows.shape))
+        assert numpy.array_equal(cvis.antenna2[rows], numpy.broadcast_to(compact.antenna2[:, numpy.newaxis],
+                                                                          rows.shape))
+        count = numpy.bincount(cvis.cindex, minlength=cvis.nvis)
+        assert numpy.min(count) > 0
+        times = numpy.broadcast_to(compact.time[:, numpy.newaxis, numpy.newaxis], rows.shape).flatten()
+        numpy.testing.assert_allclose(numpy.bincount(cvis.cindex, weights=times) / count, cvis.time, atol=1e-9)
+
     def test_coalesce_decoalesce(self):
         cvis = coalesce_visibility(self.blockvis, time_coal=1.0, frequency_coal=1.0)
         assert numpy.min(cvis.frequency) == numpy.min(self.frequency)
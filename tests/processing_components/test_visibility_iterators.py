@@ -76,5 +76,28 @@ class TestVisibilityIterators(unittest.TestCase):
             assert numpy.sum(visslice.nvis) < self.vis.nvis
         assert total_rows == self.vis.nvis, "Total rows iterated %d, Original rows %d" % (total_rows, self.vis.nvis)
 
+    def test_vis_timeslice_iterator_indices(self):
+        self.actualSetUp()
+        nchunks = vis_timeslices(self.vis, timeslice='auto')
+        for rows, indices in zip(vis_timeslice_iter(self.vis, nchunks), vis_timeslice_iter(self.vis, nchunks,
+                                                                                          indices=True)):
+            # The times are sorted so the rows are a contiguous slice
+            assert isinstance(indices, slice)
+            numpy.testing.assert_array_equal(numpy.where(rows)[0], numpy.arange(self.vis.nvis)[indices])
+            visslice = create_visibility_from_rows(self.vis, indices, view=True)
+            assert numpy.shares_memory(visslice.data, self.vis.data)
+            numpy.testing.assert_array_equal(visslice.data, create_visibility_from_rows(self.vis, rows).data)
+
+    def test_vis_wslice_iterator_indices(self):
+        self.actualSetUp()
+        nchunks = 11
+        wmaxabs = numpy.max(numpy.abs(self.vis.w))
+        boxes = numpy.linspace(-wmaxabs, wmaxabs, nchunks)
+        for box, rows, indices in zip(boxes, vis_wslice_iter(self.vis, nchunks),
+                                      vis_wslice_iter(self.vis, nchunks, indices=True)):
+            expected = numpy.abs(self.vis.w - box) < 0.5 * (boxes[1] - boxes[0])
+            numpy.testing.assert_array_equal(rows, expected)
+            numpy.testing.assert_array_equal(indices, numpy.where(expected)[0])
+
 if __name__ == '__main__':
     unittest.main()
@@ -10,7 +10,8 @@ import numpy
 
 from data_models.parameters import arl_path
 
-from processing_components.visibility.base import create_blockvisibility_from_ms, create_visibility_from_ms
+from processing_components.visibility.base import create_blockvisibility_from_ms, create_visibility_from_ms, \
+    iterate_blockvisibility_from_ms
 from processing_components.visibility.operations import integrate_visibility_by_channel
 
 log = logging.getLogger(__name__)
@@ -42,6 +43,23 @@ class TestCreateMS(unittest.TestCase):
             assert v.vis.data.shape[-1] == 4
             assert v.polarisation_frame.type == "circular"
 
+    def test_iterate_blockvisibility(self):
+        
+        if not self.casacore_available:
+            return
+        
+        msfile = arl_path("data/vis/ASKAP_example.ms")
+        vis = create_blockvisibility_from_ms(msfile, start_chan=0, end_chan=15)[0]
+        chunks = list(iterate_blockvisibility_from_ms(msfile, time_chunk=2, start_chan=0, end_chan=15))
+        
+        assert len(chunks) == (vis.vis.shape[0] + 1) // 2
+        for v in chunks:
+            assert v.vis.shape[0] <= 2
+            assert v.vis.shape[-2] == 16
+            assert v.polarisation_frame.type == "linear"
+        numpy.testing.assert_array_equal(numpy.concatenate([v.vis for v in chunks]), vis.vis)
+        numpy.testing.assert_array_equal(numpy.concatenate([v.time for v in chunks]), vis.time)
+
     def test_create_list_spectral(self):
         if not self.casacore_available:
             return
@@ -14,12 +14,16 @@ from data_models.polarisation import PolarisationFrame
 
 from processing_library.image.operations import fft_image
 
+from processing_components.griddata.gridding import grid_weight_to_sparse, sparse_weights_merge, \
+    sparse_weights_select, sparse_weights_reweight
+from processing_components.griddata.kernels import cached_pswf_convolutionfunction
+from processing_components.griddata.operations import create_griddata_from_image
 from processing_components.image.operations import export_image_to_fits
 from processing_components.imaging.base import invert_2d
 from processing_components.imaging.base import create_image_from_visibility
 from processing_components.imaging.weighting import weight_visibility, taper_visibility_gaussian, taper_visibility_tukey
 from processing_components.simulation.configurations import create_named_configuration
-from processing_components.visibility.base import create_visibility
+from processing_components.visibility.base import create_visibility, copy_visibility, create_visibility_from_rows
 
 log = logging.getLogger(__name__)
 
@@ -75,6 +79,46 @@ class TestWeighting(unittest.TestCase):
                                                   nchan=len(self.frequency),
                                                   polarisation_frame=self.image_pol)
 
+    def test_weighting_robust(self):
+        self.actualSetUp(dopol=True)
+        natural = self.componentvis.imaging_weight
+        uniform = weight_visibility(copy_visibility(self.componentvis), self.model,
+                                    weighting='uniform').imaging_weight
+        assert numpy.std(uniform) > 0.0
+        # Robust weighting goes from uniform (up to a scale) to natural as the robustness increases
+        for robustness, expected in [(-10.0, uniform), (10.0, natural)]:
+            robust = weight_visibility(copy_visibility(self.componentvis), self.model, weighting='robust',
+                                       robustness=robustness).imaging_weight
+            numpy.testing.assert_allclose(robust / numpy.max(robust), expected / numpy.max(expected), rtol=1e-6)
+        robust = weight_visibility(copy_visibility(self.componentvis), self.model, weighting='robust',
+                                   robustness=0.0).imaging_weight
+        assert numpy.std(uniform / numpy.max(uniform)) > numpy.std(robust / numpy.max(robust)) > 0.0
+
+    def test_weighting_sparse(self):
+        self.actualSetUp(dopol=True)
+        gcf, cf = cached_pswf_convolutionfunction(self.model)
+        griddata = create_griddata_from_image(self.model)
+        rows_list = [numpy.arange(start, self.componentvis.nvis, 3) for start in range(3)]
+        vis_list = [create_visibility_from_rows(self.componentvis, rows) for rows in rows_list]
+        merged = sparse_weights_merge([sparse_weights_merge([grid_weight_to_sparse(vis, griddata, cf)
+                                                             for vis in vis_list[:2]]),
+                                       grid_weight_to_sparse(vis_list[2], griddata, cf), None])
+        numpy.testing.assert_allclose(numpy.sum(merged.sumwt, axis=0),
+                                      numpy.sum(self.componentvis.imaging_weight, axis=0))
+        for weighting in ['uniform', 'robust']:
+            dense = weight_visibility(copy_visibility(self.componentvis), self.model, weighting=weighting,
+                                      robustness=0.5)
+            for rows, vis in zip(rows_list, vis_list):
+                swg = sparse_weights_select(merged, grid_weight_to_sparse(vis, griddata, cf))
+                assert swg.size() < merged.size()
+                sparse = sparse_weights_reweight(copy_visibility(vis), swg, griddata, cf, weighting=weighting,
+                                                 robustness=0.5)
+                numpy.testing.assert_allclose(sparse.imaging_weight, dense.imaging_weight[rows], rtol=1e-12)
+        # The weights selected for one visibility do not cover the cells of another
+        swg = sparse_weights_select(merged, grid_weight_to_sparse(vis_list[0], griddata, cf))
+        with self.assertRaises(ValueError):
+            sparse_weights_reweight(copy_visibility(vis_list[1]), swg, griddata, cf)
+
     def test_tapering_Gaussian(self):
         self.actualSetUp()
         size_required = 0.010
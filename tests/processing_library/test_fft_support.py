@@ -7,7 +7,8 @@ import unittest
 
 from numpy.testing import assert_allclose
 
-from processing_library.fourier_transforms.fft_support import extract_mid, pad_mid, extract_oversampled
+from processing_library.fourier_transforms.fft_support import extract_mid, pad_mid, extract_oversampled, \
+    FFTEngine, fft, ifft, fft_real, ifft_real, get_fft_engine, set_fft_engine_threads
 from processing_library.fourier_transforms.convolutional_gridding import coordinates2
 
 
@@ -39,6 +40,56 @@ class TestFFTSupport(unittest.TestCase):
             ex = extract_oversampled(a, 0, 0, kernel_oversampling, npixel) / kernel_oversampling ** 2
             assert_allclose(ex, 1 + self._pattern(npixel))
 
+    def test_engine_centred(self):
+        for shape in [(2, 1, 64, 64), (2, 3, 63, 65), (5, 8)]:
+            a = numpy.random.standard_normal(shape) + 1j * numpy.random.standard_normal(shape)
+            axes = (-2, -1)
+            expected = numpy.fft.fftshift(numpy.fft.fft2(numpy.fft.ifftshift(a, axes=axes)), axes=axes)
+            assert_allclose(fft(a), expected, atol=1e-12)
+            expected = numpy.fft.fftshift(numpy.fft.ifft2(numpy.fft.ifftshift(a, axes=axes)), axes=axes)
+            assert_allclose(ifft(a), expected, atol=1e-12)
+            assert_allclose(ifft(fft(a)), a, atol=1e-12)
+
+    def test_engine_real_plans(self):
+        # Room for the buffers of the last two plans (about 84kB) but not all three (about 132kB)
+        engine = FFTEngine(max_size=1e-4)
+        a = numpy.random.standard_normal([3, 32, 30])
+        for s in [None, (40, 36), (16, 16)]:
+            assert_allclose(engine.rfft2(a, s), numpy.fft.rfft2(a, s), atol=1e-12)
+        assert len(engine.plans) == 2
+        assert engine.size <= engine.max_size
+        # Plans too large to keep are still made
+        assert_allclose(engine.rfft2(a, (128, 128)), numpy.fft.rfft2(a, (128, 128)), atol=1e-12)
+        assert len(engine.plans) == 2
+        engine.clear()
+        assert len(engine.plans) == 0 and engine.size == 0.0
+        first = engine.rfft2(a)
+        assert_allclose(engine.irfft2(first, a.shape[-2:]), a, atol=1e-12)
+        # Results are copies, not the reused buffers
+        second = engine.rfft2(2.0 * a)
+        assert_allclose(second, 2.0 * first, atol=1e-12)
+
+    def test_engine_threads(self):
+        a = numpy.random.standard_normal([32, 32])
+        expected = fft(a)
+        engine = get_fft_engine()
+        threads = engine.threads
+        try:
+            set_fft_engine_threads(threads + 1)
+            assert get_fft_engine() is engine and engine.threads == threads + 1
+            assert len(engine.plans) == 0
+            assert_allclose(fft(a), expected, atol=1e-12)
+        finally:
+            set_fft_engine_threads(threads)
+
+    def test_real_transforms(self):
+        for shape in [(2, 1, 64, 32), (3, 65, 64), (6, 8)]:
+            r = numpy.random.standard_normal(shape)
+            a = r + 1j * numpy.random.standard_normal(shape)
+            assert_allclose(fft_real(r), fft(r), atol=1e-12)
+            assert_allclose(ifft_real(a), ifft(a).real, atol=1e-12)
+            assert_allclose(ifft_real(fft_real(r)), r, atol=1e-12)
+
 
 if __name__ == '__main__':
     unittest.main()
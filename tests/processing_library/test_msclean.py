@@ -7,7 +7,7 @@ import numpy
 import logging
 
 from processing_library.arrays.cleaners import create_scalestack, convolve_scalestack, convolve_convolve_scalestack,\
-    argmax
+    argmax, hogbom, clark, find_max_abs_stack, _TilePeaks
 
 log = logging.getLogger(__name__)
 
@@ -46,3 +46,65 @@ class TestImageMSClean(unittest.TestCase):
         # convolution
         numpy.testing.assert_array_almost_equal(result[1, 1, 75, 31], self.scalestack[2, self.npixel // 2,
                                                                                       self.npixel // 2], 2)
+
+    def test_scalestack_cache(self):
+        # The stacks are cached, and convolution with an uncached copy gives the same result
+        scalestack = create_scalestack(self.stackshape, self.scales)
+        assert scalestack is self.scalestack
+        assert not scalestack.flags.writeable
+        img = numpy.zeros([self.npixel, self.npixel])
+        img[75, 31] = 1.0
+        numpy.testing.assert_array_almost_equal(convolve_scalestack(self.scalestack, img),
+                                                convolve_scalestack(numpy.array(self.scalestack), img), 12)
+        numpy.testing.assert_array_almost_equal(convolve_convolve_scalestack(self.scalestack, img),
+                                                convolve_convolve_scalestack(numpy.array(self.scalestack), img), 12)
+
+    def test_tile_peaks(self):
+        # The tile cache must find the same peak as find_max_abs_stack after a box is changed
+        numpy.random.seed(180555)
+        stack = numpy.random.normal(size=self.stackshape)
+        coupling_matrix = numpy.diag([1.0, 2.0, 0.5])
+        diagonal = numpy.diag(coupling_matrix)[:, numpy.newaxis, numpy.newaxis]
+        peaks = _TilePeaks(lambda x0, x1, y0, y1: numpy.abs(stack[:, x0:x1, y0:y1] / diagonal), stack.shape, 24)
+        for box in [None, (40, 90, 100, 130), (0, 5, 250, 256)]:
+            if box is not None:
+                stack[:, box[0]:box[1], box[2]:box[3]] *= 10.0
+                peaks.update(*box)
+            mx, my, mscale = find_max_abs_stack(stack, None, coupling_matrix)
+            assert peaks.argmax() == (mscale, mx, my)
+
+    def test_hogbom_tiles(self):
+        # The tiled peak cache must find the same components as a search over a single tile
+        numpy.random.seed(180555)
+        dirty = numpy.random.normal(size=[self.npixel, self.npixel])
+        psf = self.scalestack[1, self.npixel // 2 - 32:self.npixel // 2 + 32,
+                              self.npixel // 2 - 32:self.npixel // 2 + 32]
+        psf = psf / numpy.max(psf)
+        window = numpy.zeros_like(dirty)
+        window[32:200, 16:240] = 1.0
+        for w in [None, window]:
+            comps, res = hogbom(dirty, psf, w, 0.1, 0.0, 200, 0.0, tile_size=self.npixel)
+            tcomps, tres = hogbom(dirty, psf, w, 0.1, 0.0, 200, 0.0, tile_size=24)
+            numpy.testing.assert_array_equal(comps, tcomps)
+            numpy.testing.assert_array_equal(res, tres)
+
+    def test_clark(self):
+        # Point sources convolved with a compact PSF, cleaned with a PSF patch smaller than the PSF
+        psf = self.scalestack[2, self.npixel // 2 - 32:self.npixel // 2 + 32,
+                              self.npixel // 2 - 32:self.npixel // 2 + 32]
+        psf = psf / numpy.max(psf)
+        sky = numpy.zeros([self.npixel, self.npixel])
+        sky[75, 51] = 1.0
+        sky[80, 60] = 0.5
+        sky[200, 150] = 2.0
+        dirty = numpy.zeros_like(sky)
+        for x, y in zip(*numpy.nonzero(sky)):
+            dirty[x - 32:x + 32, y - 32:y + 32] += sky[x, y] * psf
+        comps, res = clark(dirty, psf, None, 0.1, 0.001, 10000, 0.0, psf_patch=4)
+        assert numpy.max(numpy.abs(res)) < 0.002
+        numpy.testing.assert_almost_equal(numpy.sum(comps), numpy.sum(sky), 2)
+        # The residual is the dirty image less the components convolved with the full PSF
+        model = numpy.zeros_like(sky)
+        for x, y in zip(*numpy.nonzero(comps)):
+            model[x - 32:x + 32, y - 32:y + 32] += comps[x, y] * psf
+        numpy.testing.assert_array_almost_equal(res, dirty - model, 12)
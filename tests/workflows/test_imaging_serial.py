@@ -229,6 +229,10 @@ class TestImaging(unittest.TestCase):
         self._predict_base(context='2d', extra='_wprojection_clipped', fluxthreshold=1.0,
                            gcfcf=self.gcfcf_clipped)
     
+    def test_predict_wprojection_context(self):
+        self.actualSetUp()
+        self._predict_base(context='wprojection', extra='_context', fluxthreshold=1.5)
+    
     def test_predict_wstack(self):
         self.actualSetUp()
         self._predict_base(context='wstack', fluxthreshold=1.0, vis_slices=101)
@@ -302,6 +306,10 @@ class TestImaging(unittest.TestCase):
         self._invert_base(context='2d', extra='_wprojection_clipped', positionthreshold=2.0,
                           gcfcf=self.gcfcf_clipped)
     
+    def test_invert_wprojection_context(self):
+        self.actualSetUp()
+        self._invert_base(context='wprojection', extra='_context', positionthreshold=1.0)
+    
     def test_invert_wprojection_wstack(self):
         self.actualSetUp(makegcfcf=True)
         self._invert_base(context='wstack', extra='_wprojection', positionthreshold=1.0, vis_slices=11,
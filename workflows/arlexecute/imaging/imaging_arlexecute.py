@@ -23,8 +23,9 @@ from workflows.shared.imaging.imaging_shared import remove_sumwt, sum_predict_re
 from processing_components.visibility.coalesce import convert_blockvisibility_to_visibility, \
     convert_visibility_to_blockvisibility
 from wrappers.arlexecute.execution_support.arlexecute import arlexecute
-from wrappers.arlexecute.griddata.gridding import grid_weight_to_griddata, griddata_reweight, griddata_merge_weights
-from wrappers.arlexecute.griddata.kernels import create_pswf_convolutionfunction
+from wrappers.arlexecute.griddata.gridding import grid_weight_to_sparse, sparse_weights_merge, \
+    sparse_weights_select, sparse_weights_reweight
+from wrappers.arlexecute.griddata.kernels import cached_pswf_convolutionfunction
 from wrappers.arlexecute.griddata.operations import create_griddata_from_image
 from wrappers.arlexecute.image.deconvolution import deconvolve_cube, restore_cube
 from wrappers.arlexecute.image.gather_scatter import image_scatter_facets, image_gather_facets, \
@@ -81,7 +82,7 @@ def predict_list_arlexecute_workflow(vis_list, model_imagelist, context, vis_sli
             return None
     
     if gcfcf is None:
-        gcfcf = [arlexecute.execute(create_pswf_convolutionfunction)(m) for m in model_imagelist]
+        gcfcf = [arlexecute.execute(cached_pswf_convolutionfunction)(m) for m in model_imagelist]
     
     # Loop over all frequency windows
     if facets == 1:
@@ -199,7 +200,7 @@ def invert_list_arlexecute_workflow(vis_list, template_model_imagelist, context,
     
     # If we are doing facets, we need to create the gcf for each image
     if gcfcf is None and facets == 1:
-        gcfcf = [arlexecute.execute(create_pswf_convolutionfunction)(template_model_imagelist[0])]
+        gcfcf = [arlexecute.execute(cached_pswf_convolutionfunction)(template_model_imagelist[0])]
     
     # Loop over all vis_lists independently
     results_vislist = list()
@@ -511,18 +512,23 @@ def weight_list_arlexecute_workflow(vis_list, model_imagelist, gcfcf=None, weigh
     """ Weight the visibility data
     
     This is done collectively so the weights are summed over all vis_lists and then
-    corrected
+    corrected. Each vis is gridded onto a sparse weight grid holding only the cells it occupies. These are summed
+    in a tree reduction, and each reweighting task receives only the merged weights of the cells of its own vis.
 
     :param vis_list:
     :param model_imagelist: Model required to determine weighting parameters
-    :param weighting: Type of weighting
+    :param weighting: Type of weighting: 'uniform' | 'robust' | 'natural'
+    :param robustness: Briggs robustness parameter for robust weighting (def: 0.0)
+    :param weight_merge_fanin: Number of weight grids summed in each task of the tree reduction (def: 4)
     :param kwargs: Parameters for functions in graphs
     :return: List of vis_graphs
    """
     centre = len(model_imagelist) // 2
+    robustness = get_parameter(kwargs, "robustness", 0.0)
+    fanin = max(2, get_parameter(kwargs, "weight_merge_fanin", 4))
     
     if gcfcf is None:
-        gcfcf = [arlexecute.execute(create_pswf_convolutionfunction)(model_imagelist[centre])]
+        gcfcf = [arlexecute.execute(cached_pswf_convolutionfunction)(model_imagelist[centre])]
         
     def to_vis(v):
         if isinstance(v, BlockVisibility):
@@ -537,8 +543,7 @@ def weight_list_arlexecute_workflow(vis_list, model_imagelist, gcfcf=None, weigh
         if vis is not None:
             if model is not None:
                 griddata = create_griddata_from_image(model)
-                griddata = grid_weight_to_griddata(vis, griddata, g[0][1])
-                return griddata
+                return grid_weight_to_sparse(vis, griddata, g[0][1])
             else:
                 return None
         else:
@@ -548,25 +553,29 @@ def weight_list_arlexecute_workflow(vis_list, model_imagelist, gcfcf=None, weigh
                                                                   gcfcf)
                    for i in range(len(vis_list))]
     
-    merged_weight_grid = arlexecute.execute(griddata_merge_weights, nout=1)(weight_list)
-    merged_weight_grid = arlexecute.persist(merged_weight_grid, broadcast=True)
+    merged_weight_grid = weight_list
+    while len(merged_weight_grid) > 1:
+        merged_weight_grid = [arlexecute.execute(sparse_weights_merge, nout=1)(merged_weight_grid[i:i + fanin])
+                              for i in range(0, len(merged_weight_grid), fanin)]
+    merged_weight_grid = merged_weight_grid[0]
     
-    def re_weight(vis, model, gd, g):
-        if gd is not None:
+    def re_weight(vis, model, swg, g):
+        if swg is not None:
             if vis is not None:
-                # Ensure that the griddata has the right axes so that the convolution
-                # function mapping works
+                # The griddata template gives the axes needed by the convolution function mapping
                 agd = create_griddata_from_image(model)
-                agd.data = gd[0].data
-                vis = griddata_reweight(vis, agd, g[0][1])
+                vis = sparse_weights_reweight(vis, swg, agd, g[0][1], weighting=weighting, robustness=robustness)
                 return vis
             else:
                 return None
         else:
             return vis
     
-    avis_list = [arlexecute.execute(re_weight, nout=1)(v, model_imagelist[i], merged_weight_grid, gcfcf)
-              for i, v in enumerate(avis_list)]
+    avis_list = [arlexecute.execute(re_weight, nout=1)(v, model_imagelist[i],
+                                                       arlexecute.execute(sparse_weights_select, nout=1)(
+                                                           merged_weight_grid, weight_list[i]),
+                                                       gcfcf)
+                 for i, v in enumerate(avis_list)]
 
     def to_bvis(v, ov):
         if isinstance(ov, BlockVisibility):
@@ -5,7 +5,7 @@ import logging
 
 from data_models.parameters import get_parameter
 from wrappers.arlexecute.execution_support.arlexecute import arlexecute
-from wrappers.arlexecute.griddata.kernels import create_pswf_convolutionfunction
+from wrappers.arlexecute.griddata.kernels import cached_pswf_convolutionfunction
 from wrappers.arlexecute.visibility.base import copy_visibility
 from ..calibration.calibration_arlexecute import calibrate_list_arlexecute_workflow
 from ..imaging.imaging_arlexecute import invert_list_arlexecute_workflow, residual_list_arlexecute_workflow, \
@@ -31,7 +31,7 @@ def ical_list_arlexecute_workflow(vis_list, model_imagelist, context, vis_slices
     gt_list = list()
     
     if gcfcf is None:
-        gcfcf = [arlexecute.execute(create_pswf_convolutionfunction)(model_imagelist[0])]
+        gcfcf = [arlexecute.execute(cached_pswf_convolutionfunction)(model_imagelist[0])]
     
     psf_imagelist = invert_list_arlexecute_workflow(vis_list, model_imagelist, dopsf=True, context=context,
                                                     vis_slices=vis_slices, facets=facets, gcfcf=gcfcf, **kwargs)
@@ -123,7 +123,7 @@ def continuum_imaging_list_arlexecute_workflow(vis_list, model_imagelist, contex
     :return:
     """
     if gcfcf is None:
-        gcfcf = [arlexecute.execute(create_pswf_convolutionfunction)(model_imagelist[0])]
+        gcfcf = [arlexecute.execute(cached_pswf_convolutionfunction)(model_imagelist[0])]
     
     psf_imagelist = invert_list_arlexecute_workflow(vis_list, model_imagelist, context=context, dopsf=True,
                                                     vis_slices=vis_slices, facets=facets, gcfcf=gcfcf, **kwargs)
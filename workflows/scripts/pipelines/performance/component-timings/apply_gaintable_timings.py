@@ -0,0 +1,73 @@
+# Apply gaintable timings
+#
+# This times apply_gaintable and its inverse on full-polarisation BlockVisibility for LOW- and MID-sized arrays,
+# reporting visibilities per second.
+#
+import time
+
+import numpy
+from astropy import units as u
+from astropy.coordinates import SkyCoord
+
+from data_models.polarisation import PolarisationFrame
+from processing_components.calibration.operations import apply_gaintable, create_gaintable_from_blockvisibility
+from processing_components.simulation.configurations import create_named_configuration
+from processing_components.simulation.testing_support import simulate_gaintable
+from processing_components.visibility.base import create_blockvisibility, convert_blockvisibility_to_compact
+
+
+def trial_case(results, config='LOWBD2', rmax=750.0, ntimes=10, nchan=8, polarisation='linear', compact=False):
+    """ Single trial for apply_gaintable timings
+
+    :param results: dictionary to fill
+    :return: results
+    """
+    conf = create_named_configuration(config, rmax=rmax)
+    times = numpy.linspace(-3.0, +3.0, ntimes) * numpy.pi / 12.0
+    frequency = numpy.linspace(0.9e8, 1.1e8, nchan)
+    channel_bandwidth = numpy.array(nchan * [frequency[1] - frequency[0]])
+    phasecentre = SkyCoord(ra=+180.0 * u.deg, dec=-60.0 * u.deg, frame='icrs', equinox='J2000')
+    vis = create_blockvisibility(conf, times, frequency, channel_bandwidth=channel_bandwidth,
+                                 phasecentre=phasecentre, weight=1.0, polarisation_frame=PolarisationFrame(polarisation),
+                                 elevation_limit=None)
+    vis.data['vis'][...] = 1.0
+    if compact:
+        vis = convert_blockvisibility_to_compact(vis)
+    gt = create_gaintable_from_blockvisibility(vis)
+    gt = simulate_gaintable(gt, phase_error=0.1, amplitude_error=0.1, leakage=0.01)
+
+    nvis = vis.vis.size // vis.vis.shape[-1]
+    results['nants'] = vis.nants
+    results['nvis'] = nvis
+    for name, inverse in [('forward', False), ('inverse', True)]:
+        start = time.time()
+        vis = apply_gaintable(vis, gt, inverse=inverse)
+        elapsed = time.time() - start
+        results['time %s' % name] = elapsed
+        results['vis per second %s' % name] = nvis / elapsed
+    return results
+
+
+def main(args):
+    for config, rmax in [('LOWBD2', args.rmax_low), ('MID', args.rmax_mid)]:
+        results = trial_case({}, config=config, rmax=rmax, ntimes=args.ntimes, nchan=args.nchan,
+                             polarisation=args.polarisation, compact=args.compact)
+        print("%s, %d antennas, %d visibilities: forward %.3g vis/s, inverse %.3g vis/s" %
+              (config, results['nants'], results['nvis'], results['vis per second forward'],
+               results['vis per second inverse']))
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark apply_gaintable')
+    parser.add_argument('--rmax_low', type=float, default=750.0, help='Maximum baseline for LOW (m)')
+    parser.add_argument('--rmax_mid', type=float, default=1e5, help='Maximum baseline for MID (m)')
+    parser.add_argument('--ntimes', type=int, default=10, help='Number of hour angles')
+    parser.add_argument('--nchan', type=int, default=8, help='Number of channels')
+    parser.add_argument('--polarisation', type=str, default='linear', help='Polarisation frame')
+    parser.add_argument('--compact', action='store_true', help='Use the compact BlockVisibility layout')
+
+    main(parser.parse_args())
+
+    exit()
@@ -0,0 +1,80 @@
+# Clean timings
+#
+# This compares the Hogbom and Clark minor cycles in deconvolve_cube on the dirty image and PSF of the
+# deconvolution unit tests, reporting the time, number of components, total flux and residual.
+#
+import time
+
+import numpy
+from astropy import units as u
+from astropy.coordinates import SkyCoord
+
+from data_models.polarisation import PolarisationFrame
+from processing_components.image.deconvolution import deconvolve_cube
+from processing_components.imaging.base import predict_2d, invert_2d, create_image_from_visibility
+from processing_components.simulation.configurations import create_named_configuration
+from processing_components.simulation.testing_support import create_test_image
+from processing_components.visibility.base import create_visibility
+
+
+def create_dirty_psf(npixel=512, cellsize=0.001, model='m31', ncomponents=100):
+    """ Make the dirty image and PSF of the deconvolution unit tests
+
+    :param model: 'm31' for the M31 test image or 'points' for randomly placed point sources
+    :return: dirty, psf
+    """
+    lowcore = create_named_configuration('LOWBD2-CORE')
+    times = (numpy.pi / 12.0) * numpy.linspace(-3.0, 3.0, 7)
+    frequency = numpy.array([1e8])
+    channel_bandwidth = numpy.array([1e6])
+    phasecentre = SkyCoord(ra=+180.0 * u.deg, dec=-60.0 * u.deg, frame='icrs', equinox='J2000')
+    vis = create_visibility(lowcore, times, frequency, channel_bandwidth=channel_bandwidth,
+                            phasecentre=phasecentre, weight=1.0, polarisation_frame=PolarisationFrame('stokesI'),
+                            zerow=True)
+    image = create_image_from_visibility(vis, npixel=npixel, cellsize=cellsize,
+                                         polarisation_frame=PolarisationFrame('stokesI'))
+    if model == 'm31':
+        sky = create_test_image(cellsize=cellsize, phasecentre=phasecentre, frequency=frequency)
+    elif model == 'points':
+        sky = create_image_from_visibility(vis, npixel=npixel, cellsize=cellsize,
+                                           polarisation_frame=PolarisationFrame('stokesI'))
+        numpy.random.seed(180555)
+        x, y = numpy.random.randint(npixel // 8, 7 * npixel // 8, [2, ncomponents])
+        sky.data[0, 0, y, x] = numpy.random.uniform(0.1, 10.0, ncomponents)
+    else:
+        raise ValueError("Unknown model %s" % model)
+    vis = predict_2d(vis, sky)
+    dirty, sumwt = invert_2d(vis, image)
+    psf, sumwt = invert_2d(vis, image, dopsf=True)
+    return dirty, psf
+
+
+def main(args):
+    dirty, psf = create_dirty_psf(npixel=args.npixel, model=args.model)
+    for algorithm in args.algorithm:
+        start = time.time()
+        comp, residual = deconvolve_cube(dirty, psf, algorithm=algorithm, niter=args.niter, gain=args.gain,
+                                         threshold=args.threshold, fractional_threshold=args.fractional_threshold,
+                                         psf_patch=args.psf_patch)
+        elapsed = time.time() - start
+        print("%s: %.2f (s), %d components, flux %.3f, max residual %.4f, rms residual %.4f" %
+              (algorithm, elapsed, numpy.count_nonzero(comp.data), numpy.sum(comp.data),
+               numpy.max(numpy.abs(residual.data)), numpy.std(residual.data)))
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark Hogbom and Clark clean')
+    parser.add_argument('--npixel', type=int, default=512, help='Number of pixels on each axis')
+    parser.add_argument('--model', type=str, default='m31', help="Sky model: 'm31' or 'points'")
+    parser.add_argument('--algorithm', type=str, nargs='+', default=['hogbom', 'clark'], help='Algorithms')
+    parser.add_argument('--niter', type=int, default=10000, help='Maximum number of iterations')
+    parser.add_argument('--gain', type=float, default=0.1, help='Loop gain')
+    parser.add_argument('--threshold', type=float, default=0.01, help='Clean threshold (Jy/beam)')
+    parser.add_argument('--fractional_threshold', type=float, default=0.001, help='Fractional threshold')
+    parser.add_argument('--psf_patch', type=int, default=32, help='Half-width of the Clark PSF patch')
+
+    main(parser.parse_args())
+
+    exit()
@@ -0,0 +1,82 @@
+# Gridding timings
+#
+# This compares the per-row loop gridder grid_visibility_to_griddata with the batched gridder
+# grid_visibility_to_griddata_batch, reporting rows per second for a range of kernel supports.
+#
+import time
+
+import numpy
+from astropy import units as u
+from astropy.coordinates import SkyCoord
+
+from data_models.polarisation import PolarisationFrame
+from processing_components.griddata.gridding import grid_visibility_to_griddata, \
+    grid_visibility_to_griddata_batch
+from processing_components.griddata.kernels import create_pswf_convolutionfunction
+from processing_components.griddata.operations import create_griddata_from_image
+from processing_components.imaging.base import create_image_from_visibility
+from processing_components.simulation.configurations import create_named_configuration
+from processing_components.simulation.testing_support import ingest_unittest_visibility
+
+
+def trial_case(results, rmax=750.0, ntimes=60, nchan=1, npixel=512, support=6, oversampling=128,
+               polarisation='stokesI'):
+    """ Single trial for gridding timings
+
+    :param results: dictionary to fill
+    :return: results
+    """
+    low = create_named_configuration('LOWBD2', rmax=rmax)
+    times = numpy.linspace(-3.0, +3.0, ntimes) * numpy.pi / 12.0
+    frequency = numpy.linspace(0.9e8, 1.1e8, nchan)
+    if nchan > 1:
+        channel_bandwidth = numpy.array(nchan * [frequency[1] - frequency[0]])
+    else:
+        channel_bandwidth = numpy.array([1e7])
+    phasecentre = SkyCoord(ra=+180.0 * u.deg, dec=-60.0 * u.deg, frame='icrs', equinox='J2000')
+    pol_frame = PolarisationFrame(polarisation)
+    vis = ingest_unittest_visibility(low, frequency, channel_bandwidth, times, pol_frame, phasecentre,
+                                     block=False, zerow=True)
+    model = create_image_from_visibility(vis, npixel=npixel, nchan=nchan, polarisation_frame=pol_frame)
+    gcf, cf = create_pswf_convolutionfunction(model, support=support, oversampling=oversampling)
+
+    results['nvis'] = vis.nvis
+    results['support'] = support
+
+    for name, gridder in [('loop', grid_visibility_to_griddata), ('batch', grid_visibility_to_griddata_batch)]:
+        griddata = create_griddata_from_image(model)
+        start = time.time()
+        griddata, sumwt = gridder(vis, griddata=griddata, cf=cf)
+        elapsed = time.time() - start
+        results['time %s' % name] = elapsed
+        results['rows per second %s' % name] = vis.nvis / elapsed
+        results['grid %s' % name] = griddata.data
+
+    results['max difference'] = numpy.max(numpy.abs(results.pop('grid loop') - results.pop('grid batch')))
+    return results
+
+
+def main(args):
+    for support in args.support:
+        results = trial_case({}, rmax=args.rmax, ntimes=args.ntimes, nchan=args.nchan, npixel=args.npixel,
+                             support=support, oversampling=args.oversampling, polarisation=args.polarisation)
+        print("support %d, nvis %d: loop %.0f rows/s, batch %.0f rows/s, speedup %.1f, max difference %.3g" %
+              (support, results['nvis'], results['rows per second loop'], results['rows per second batch'],
+               results['time loop'] / results['time batch'], results['max difference']))
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark loop and batched gridders')
+    parser.add_argument('--rmax', type=float, default=750.0, help='Maximum baseline (m)')
+    parser.add_argument('--ntimes', type=int, default=60, help='Number of hour angles')
+    parser.add_argument('--nchan', type=int, default=1, help='Number of channels')
+    parser.add_argument('--npixel', type=int, default=512, help='Number of pixels on each axis')
+    parser.add_argument('--oversampling', type=int, default=128, help='Oversampling of convolution function')
+    parser.add_argument('--support', type=int, nargs='+', default=[6, 8, 16], help='Support of convolution function')
+    parser.add_argument('--polarisation', type=str, default='stokesI', help='Polarisation frame')
+
+    main(parser.parse_args())
+
+    exit()
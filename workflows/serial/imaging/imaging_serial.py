@@ -23,8 +23,9 @@ from processing_library.image.operations import copy_image, create_empty_image_l
 from workflows.shared.imaging.imaging_shared import imaging_context
 from workflows.shared.imaging.imaging_shared import sum_invert_results, remove_sumwt, sum_predict_results, \
     threshold_list
-from wrappers.serial.griddata.gridding import grid_weight_to_griddata, griddata_reweight, griddata_merge_weights
-from wrappers.serial.griddata.kernels import create_pswf_convolutionfunction
+from wrappers.serial.griddata.gridding import grid_weight_to_griddata, griddata_reweight, griddata_merge_weights, \
+    GriddingPlan
+from wrappers.serial.griddata.kernels import cached_pswf_convolutionfunction
 from wrappers.serial.griddata.operations import create_griddata_from_image
 from wrappers.serial.image.deconvolution import deconvolve_cube, restore_cube
 from wrappers.serial.image.gather_scatter import image_scatter_facets, image_gather_facets, \
@@ -78,7 +79,7 @@ def predict_list_serial_workflow(vis_list, model_imagelist, context, vis_slices=
             return None
     
     if gcfcf is None:
-        gcfcf = [create_pswf_convolutionfunction(m) for m in model_imagelist]
+        gcfcf = [cached_pswf_convolutionfunction(m) for m in model_imagelist]
     
     # Loop over all frequency windows
     if facets == 1:
@@ -173,7 +174,7 @@ def invert_list_serial_workflow(vis_list, template_model_imagelist, dopsf=False,
     
     # If we are doing facets, we need to create the gcf for each image
     if gcfcf is None and facets == 1:
-        gcfcf = [create_pswf_convolutionfunction(template_model_imagelist[0])]
+        gcfcf = [cached_pswf_convolutionfunction(template_model_imagelist[0])]
     
     # Loop over all vis_lists independently
     results_vislist = list()
@@ -431,45 +432,50 @@ def weight_list_serial_workflow(vis_list, model_imagelist, gcfcf=None, weighting
 
     :param vis_list:
     :param model_imagelist: Model required to determine weighting parameters
-    :param weighting: Type of weighting
+    :param weighting: Type of weighting: 'uniform' | 'robust' | 'natural'
+    :param robustness: Briggs robustness parameter for robust weighting (def: 0.0)
     :param kwargs: Parameters for functions in graphs
     :return: List of vis_graphs
    """
     centre = len(model_imagelist) // 2
+    robustness = get_parameter(kwargs, "robustness", 0.0)
     
     if gcfcf is None:
-        gcfcf = [create_pswf_convolutionfunction(model_imagelist[centre])]
+        gcfcf = [cached_pswf_convolutionfunction(model_imagelist[centre])]
     
-    def grid_wt(vis, model, g):
+    # The convolution mapping for each visibility is shared between gridding and reweighting
+    plans = [GriddingPlan() for v in vis_list]
+    
+    def grid_wt(vis, model, g, plan):
         if vis is not None:
             if model is not None:
                 griddata = create_griddata_from_image(model)
-                griddata = grid_weight_to_griddata(vis, griddata, g[0][1])
+                griddata = grid_weight_to_griddata(vis, griddata, g[0][1], plan=plan)
                 return griddata
             else:
                 return None
         else:
             return None
     
-    weight_list = [grid_wt(vis_list[i], model_imagelist[i], gcfcf) for i in range(len(vis_list))]
+    weight_list = [grid_wt(vis_list[i], model_imagelist[i], gcfcf, plans[i]) for i in range(len(vis_list))]
     
     merged_weight_grid = griddata_merge_weights(weight_list)
     
-    def re_weight(vis, model, gd, g):
+    def re_weight(vis, model, gd, g, plan):
         if gd is not None:
             if vis is not None:
                 # Ensure that the griddata has the right axes so that the convolution
                 # function mapping works
                 agd = create_griddata_from_image(model)
                 agd.data = gd[0].data
-                vis = griddata_reweight(vis, agd, g[0][1])
+                vis = griddata_reweight(vis, agd, g[0][1], plan=plan, weighting=weighting, robustness=robustness)
                 return vis
             else:
                 return None
         else:
             return vis
     
-    return [re_weight(v, model_imagelist[i], merged_weight_grid, gcfcf)
+    return [re_weight(v, model_imagelist[i], merged_weight_grid, gcfcf, plans[i])
             for i, v in enumerate(vis_list)]
 
 
@@ -2,7 +2,7 @@
 completeness. Use arlexecute versions pipelines/components.py for speed.
 """
 from data_models.parameters import get_parameter
-from wrappers.serial.griddata.kernels import create_pswf_convolutionfunction
+from wrappers.serial.griddata.kernels import cached_pswf_convolutionfunction
 from wrappers.serial.visibility.base import copy_visibility
 
 from ..calibration.calibration_serial import calibrate_list_serial_workflow
@@ -26,7 +26,7 @@ def ical_list_serial_workflow(vis_list, model_imagelist, context, vis_slices=1,
     gt_list = list()
 
     if gcfcf is None:
-        gcfcf = [create_pswf_convolutionfunction(model_imagelist[0])]
+        gcfcf = [cached_pswf_convolutionfunction(model_imagelist[0])]
     
     psf_imagelist = invert_list_serial_workflow(vis_list, model_imagelist, dopsf=True, context=context,
                                                 vis_slices=vis_slices, facets=facets, gcfcf=gcfcf, **kwargs)
@@ -108,7 +108,7 @@ def continuum_imaging_list_serial_workflow(vis_list, model_imagelist, context, g
     :return:
     """
     if gcfcf is None:
-        gcfcf = [create_pswf_convolutionfunction(model_imagelist[0])]
+        gcfcf = [cached_pswf_convolutionfunction(model_imagelist[0])]
     
     psf_imagelist = invert_list_serial_workflow(vis_list, model_imagelist, context=context, dopsf=True,
                                                 vis_slices=vis_slices, facets=facets, gcfcf=gcfcf, **kwargs)
@@ -15,6 +15,7 @@ from processing_components.imaging.base import predict_2d, invert_2d
 from processing_components.visibility.iterators import vis_null_iter, vis_timeslice_iter, vis_wslice_iter
 from processing_components.imaging.timeslice_single import predict_timeslice_single, invert_timeslice_single
 from processing_components.imaging.wstack_single import predict_wstack_single, invert_wstack_single
+from processing_components.imaging.wprojection import predict_wprojection, invert_wprojection
 from processing_components.image.operations import create_empty_image_like
 
 
@@ -38,8 +39,8 @@ def imaging_contexts():
                     'ng': {'predict': predict_ng,
                            'invert': invert_ng,
                            'vis_iterator': vis_null_iter},
-                    'wprojection': {'predict': predict_2d,
-                           'invert': invert_2d,
+                    'wprojection': {'predict': predict_wprojection,
+                           'invert': invert_wprojection,
                            'vis_iterator': vis_null_iter},
                     'wsnapshots': {'predict': predict_timeslice_single,
                            'invert': invert_timeslice_single,
@@ -63,8 +64,8 @@ def imaging_contexts():
         contexts = {'2d': {'predict': predict_2d,
                            'invert': invert_2d,
                            'vis_iterator': vis_null_iter},
-                    'wprojection': {'predict': predict_2d,
-                           'invert': invert_2d,
+                    'wprojection': {'predict': predict_wprojection,
+                           'invert': invert_wprojection,
                            'vis_iterator': vis_null_iter},
                     'wsnapshots': {'predict': predict_timeslice_single,
                            'invert': invert_timeslice_single,
@@ -19,5 +19,7 @@ from processing_components.visibility.operations import copy_visibility
 log = logging.getLogger(__name__)
 
 from processing_components.griddata.gridding import convolution_mapping, grid_visibility_to_griddata, \
-    grid_visibility_to_griddata_fast, grid_weight_to_griddata, degrid_visibility_from_griddata, \
-    fft_griddata_to_image, fft_image_to_griddata, griddata_reweight, griddata_merge_weights
+    grid_visibility_to_griddata_batch, grid_visibility_to_griddata_fast, grid_weight_to_griddata, \
+    degrid_visibility_from_griddata, fft_griddata_to_image, fft_image_to_griddata, griddata_reweight, \
+    griddata_merge_weights, GriddingPlan, create_gridding_plan, SparseWeightGrid, grid_weight_to_sparse, \
+    sparse_weights_merge, sparse_weights_select, sparse_weights_reweight
@@ -3,4 +3,5 @@ Functions that define and manipulate kernels
 
 """
 from processing_components.griddata.kernels import create_pswf_convolutionfunction, \
-    create_awterm_convolutionfunction, create_box_convolutionfunction
\ No newline at end of file
+    create_awterm_convolutionfunction, create_box_convolutionfunction, \
+    cached_pswf_convolutionfunction, cached_awterm_convolutionfunction, convolutionfunction_cache
\ No newline at end of file
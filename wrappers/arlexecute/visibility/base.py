@@ -5,8 +5,11 @@ from processing_components.visibility.base import vis_summary
 from processing_components.visibility.base import copy_visibility
 from processing_components.visibility.base import create_visibility
 from processing_components.visibility.base import create_blockvisibility
+from processing_components.visibility.base import convert_blockvisibility_to_compact
+from processing_components.visibility.base import convert_blockvisibility_to_square
 from processing_components.visibility.base import create_visibility_from_rows
 from processing_components.visibility.base import phaserotate_visibility
 from processing_components.visibility.base import create_blockvisibility_from_ms
+from processing_components.visibility.base import iterate_blockvisibility_from_ms
 from processing_components.visibility.base import create_visibility_from_ms
 from processing_components.visibility.base import create_blockvisibility_from_uvfits
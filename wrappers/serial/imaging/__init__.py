@@ -1 +1 @@
-__all__ = ['base', 'primary_beams', 'timeslice_single', 'weighting', 'wstack_single']
+__all__ = ['base', 'primary_beams', 'timeslice_single', 'weighting', 'wprojection', 'wstack_single']
@@ -0,0 +1,8 @@
+"""
+W-projection processing"""
+
+from processing_components.imaging.wprojection import create_wprojection_convolutionfunction
+from processing_components.imaging.wprojection import wprojection_gcfcf
+from processing_components.imaging.wprojection import wprojection_kernel_groups
+from processing_components.imaging.wprojection import predict_wprojection
+from processing_components.imaging.wprojection import invert_wprojection